@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+precompile_macros.py
+Предварительная компиляция всех .atlas макросов (прогрев кэша при деплое)
+
+Каждый .atlas из macros/production, macros/examples и macro-queues/
+разбирается в отдельном процессе (ProcessPoolExecutor), результат пишется
+в .cache/compiled/*.atlc в том же виде, что сохраняет MacroRunner -
+первый запуск макроса в production берет его из кэша.
+
+Проверяется:
+- ошибки разбора (неизвестные команды, битые блоки)
+- ненайденные DSL переменные
+- шаги src/core/atlas_validator: шаблоны на диске, селекторы,
+  неподдерживаемые действия, недостижимые шаги
+
+Использование:
+    python3 scripts/precompile_macros.py
+    python3 scripts/precompile_macros.py macros/production --workers 4
+    python3 scripts/precompile_macros.py --check   # только проверка, без записи
+    python3 scripts/precompile_macros.py --force   # перекомпилировать все
+
+Код выхода 1 - есть ошибки (деплой можно остановить).
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List
+
+# Корень проекта
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+# Папки макросов по умолчанию
+DEFAULT_DIRS = ['macros/production', 'macros/examples', 'macro-queues']
+
+
+def find_macros(paths: List[str]) -> List[str]:
+    """Все .atlas в папках (или сами файлы), относительно корня проекта"""
+    macros = []
+    for path in map(Path, paths):
+        if path.is_file():
+            macros.append(str(path))
+        elif path.is_dir():
+            macros.extend(str(p) for p in sorted(path.rglob('*.atlas')))
+        else:
+            print(f"⚠️  Не найдено: {path}")
+    return list(dict.fromkeys(macros))
+
+
+def _iter_steps(steps: List[Dict[str, Any]]):
+    """Все шаги с вложенными (repeat, try/catch)"""
+    for step in steps:
+        yield step
+        for key in ('steps', 'try_steps', 'catch_steps'):
+            nested = step.get(key)
+            if isinstance(nested, list):
+                yield from _iter_steps(nested)
+
+
+def compile_macro(path: str, check_only: bool = False, force: bool = False) -> Dict[str, Any]:
+    """
+    Компиляция одного .atlas (выполняется в процессе пула)
+    
+    Returns:
+        {'path', 'status' (compiled | cached | checked | failed), 'seconds',
+         'steps', 'errors', 'warnings'}
+    """
+    from src.core.atlas_dsl_parser import AtlasDSLParser
+    from src.core.atlas_grammar import SEVERITY_ERROR
+    from src.core.atlas_validator import validate_steps
+    from src.core.compile_cache import CompileCache
+    
+    started = time.perf_counter()
+    result = {'path': path, 'status': 'failed', 'seconds': 0.0, 'steps': 0, 'errors': [], 'warnings': []}
+    cache = CompileCache()
+    
+    if not force and not check_only:
+        cached = cache.load(path)
+        if cached is not None:
+            sequence = next(iter(cached.get('sequences', {}).values()), {})
+            result['steps'] = sum(1 for _ in _iter_steps(sequence.get('steps', [])))
+            result['status'] = 'cached'
+            result['seconds'] = time.perf_counter() - started
+            return result
+    
+    parser = AtlasDSLParser()
+    try:
+        # Вывод парсера (развертывание переменных и т.п.) не смешиваем между процессами
+        with contextlib.redirect_stdout(io.StringIO()):
+            parsed = parser.parse_file(path)
+    except Exception as e:
+        result['errors'].append(f"❌ {e}")
+        result['seconds'] = time.perf_counter() - started
+        return result
+    
+    for diagnostic in parser.diagnostics:
+        target = result['errors'] if diagnostic.severity == SEVERITY_ERROR else result['warnings']
+        if diagnostic.severity == SEVERITY_ERROR or diagnostic.filename == path:
+            target.append(str(diagnostic))
+    for issue in validate_steps(parsed['steps'], Path(path).stem):
+        target = result['errors'] if issue.severity == SEVERITY_ERROR else result['warnings']
+        target.append(str(issue))
+    result['steps'] = sum(1 for _ in _iter_steps(parsed['steps']))
+    
+    if check_only:
+        result['status'] = 'checked'
+    elif result['errors']:
+        # Без записи: следующий прогон снова покажет ошибки и вернет код 1
+        result['status'] = 'failed'
+    else:
+        # Та же структура, что MacroRunner._load_config сохраняет для .atlas
+        config = {
+            'sequences': {Path(path).stem: parsed},
+            'settings': {}
+        }
+        cache.save(path, config, parser.get_dependencies())
+        result['status'] = 'compiled'
+    
+    result['seconds'] = time.perf_counter() - started
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Предварительная компиляция .atlas макросов в кэш')
+    parser.add_argument('paths', nargs='*', default=DEFAULT_DIRS,
+                        help=f'Папки или файлы .atlas (по умолчанию: {" ".join(DEFAULT_DIRS)})')
+    parser.add_argument('--workers', type=int, default=None, help='Число процессов (по умолчанию - число ядер)')
+    parser.add_argument('--check', action='store_true', help='Только проверка, без записи в кэш')
+    parser.add_argument('--force', action='store_true', help='Перекомпилировать даже актуальные записи')
+    args = parser.parse_args()
+    
+    # Пути шаблонов и кэша в манифестах относительные - как при запуске runner'а
+    os.chdir(PROJECT_ROOT)
+    
+    macros = find_macros(args.paths)
+    if not macros:
+        print("❌ .atlas файлы не найдены")
+        return 1
+    
+    print("="*60)
+    print(f"🔨 Компиляция макросов: {len(macros)}")
+    print("="*60)
+    
+    started = time.perf_counter()
+    icons = {'compiled': '✅', 'cached': '💾', 'checked': '🔍', 'failed': '❌'}
+    results = []
+    
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = [pool.submit(compile_macro, path, args.check, args.force) for path in macros]
+        for future in futures:
+            result = future.result()
+            results.append(result)
+            
+            icon = '❌' if result['errors'] else icons[result['status']]
+            print(f"{icon} {result['seconds'] * 1000:8.1f} мс  {result['steps']:5} шагов  {result['path']}")
+            for message in result['errors']:
+                print(f"      {message}")
+            for message in result['warnings']:
+                print(f"      {message}")
+    
+    elapsed = time.perf_counter() - started
+    failed = [r for r in results if r['errors']]
+    total_parse = sum(r['seconds'] for r in results)
+    
+    print("="*60)
+    print(f"📊 Файлов: {len(results)}  "
+          f"скомпилировано: {sum(r['status'] == 'compiled' for r in results)}  "
+          f"из кэша: {sum(r['status'] == 'cached' for r in results)}  "
+          f"с ошибками: {len(failed)}")
+    print(f"⏱️  Время: {elapsed:.2f}с (сумма по файлам {total_parse:.2f}с)")
+    print("="*60)
+    
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+actions.py
+Реестр действий шагов (click, wait, repeat, ...)
+
+Вместо цепочки if/elif по строке action - таблица: имя → обработчик и
+нормализатор параметров. MacroRunner при создании связывает обработчики
+с собой (bind_actions) и дальше выполняет шаг одним поиском в dict.
+
+Нормализатор приводит параметры шага к типам обработчика один раз до
+запуска (normalize_steps): '5' → 5, 'Down' → 'down', и т.п. Внутри
+repeat 1000: обработчик получает готовые значения.
+
+Плагины регистрируют свои действия тем же декоратором:
+    
+    from src.core.actions import register_action
+    
+    @register_action('beep')
+    def beep(runner, step):
+        print('\\a')
+        return True
+
+resources - чем шаг пользуется (src/core/resource_scheduler): ввод
+(RESOURCE_INPUT) выполняется под общей блокировкой экземпляров, шаги DOM
+и AI идут параллельно.
+"""
+
+from dataclasses import dataclass
+from types import MethodType
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Union
+
+# Встроенные действия MacroRunner (регистрируются при импорте macro_sequence)
+BUILTIN_ACTIONS = frozenset({
+    'repeat', 'try', 'log', 'abort', 'click', 'wait', 'type', 'key', 'hotkey', 'scroll',
+    'selenium_init', 'selenium_connect', 'selenium_navigate', 'selenium_find',
+    'selenium_extract', 'selenium_get_coordinates', 'selenium_click', 'selenium_type',
+    'selenium_scroll', 'selenium_close', 'ai_extract_text', 'ai_generate',
+})
+
+# Вложенные списки шагов (блоки)
+NESTED_KEYS = ('steps', 'try_steps', 'catch_steps')
+
+# Ресурсы шагов (src/core/resource_scheduler)
+RESOURCE_INPUT = 'input'      # Физические мышь и клавиатура - одни на все экземпляры
+RESOURCE_DOM = 'dom'          # WebDriver экземпляра
+RESOURCE_NETWORK = 'network'  # AI и сетевые вызовы
+
+Resources = Union[FrozenSet[str], Callable[[dict], FrozenSet[str]]]
+
+
+class MacroAborted(Exception):
+    """Шаг abort: выполнение последовательности прекращается (catch его не перехватывает)"""
+
+
+@dataclass(frozen=True)
+class ActionSpec:
+    """Описание действия"""
+    name: str
+    handler: Callable[[Any, dict], bool]  # handler(runner, step) -> успех
+    normalize: Optional[Callable[[dict], dict]] = None
+    skippable: bool = True  # Пропускается при variables['_skip_steps']
+    resources: Resources = frozenset()  # Ресурсы шага или resources(step) -> ресурсы
+
+
+_REGISTRY: Dict[str, ActionSpec] = {}
+
+
+def register_action(name: str, handler: Optional[Callable] = None, *,
+                    normalize: Optional[Callable[[dict], dict]] = None,
+                    skippable: bool = True, resources: Union[Iterable[str], Callable] = (),
+                    replace: bool = False):
+    """
+    Регистрация действия (функция или декоратор)
+    
+    Args:
+        name: Значение action в шаге
+        handler: handler(runner, step) -> bool
+        normalize: Приведение параметров шага (вызывается один раз до запуска)
+        skippable: False - выполняется даже при _skip_steps (selenium_extract)
+        resources: Ресурсы шага (RESOURCE_INPUT, ...) или resources(step) -> ресурсы
+        replace: Разрешить замену уже зарегистрированного действия
+    
+    Raises:
+        ValueError: Действие уже зарегистрировано (без replace=True)
+    """
+    spec_resources = resources if callable(resources) else frozenset(resources)
+    
+    def decorator(func: Callable) -> Callable:
+        current = _REGISTRY.get(name)
+        if current is not None and not replace and not _same_function(current.handler, func):
+            raise ValueError(f"Действие уже зарегистрировано: {name}")
+        _REGISTRY[name] = ActionSpec(name, func, normalize, skippable, spec_resources)
+        return func
+    
+    if handler is not None:
+        return decorator(handler)
+    return decorator
+
+
+def _same_function(a: Callable, b: Callable) -> bool:
+    """Та же функция (в том числе после повторного импорта модуля)"""
+    return a is b or (getattr(a, '__module__', None) == getattr(b, '__module__', None)
+                      and getattr(a, '__qualname__', None) == getattr(b, '__qualname__', None))
+
+
+def unregister_action(name: str):
+    """Удаление действия из реестра (плагины, тесты)"""
+    _REGISTRY.pop(name, None)
+
+
+def get_action(name: str) -> Optional[ActionSpec]:
+    return _REGISTRY.get(name)
+
+
+def known_actions() -> FrozenSet[str]:
+    """Встроенные и зарегистрированные действия (для atlas_validator)"""
+    return BUILTIN_ACTIONS | frozenset(_REGISTRY)
+
+
+def unskippable_actions() -> FrozenSet[str]:
+    """Действия, которые выполняются даже при variables['_skip_steps']"""
+    return frozenset(name for name, spec in _REGISTRY.items() if not spec.skippable)
+
+
+def step_resources(step: dict) -> FrozenSet[str]:
+    """Ресурсы, которые займет шаг (пустое множество - блокировки не нужны)"""
+    spec = _REGISTRY.get(step.get('action'))
+    if spec is None:
+        return frozenset()
+    if callable(spec.resources):
+        return spec.resources(step)
+    return spec.resources
+
+
+def bind_actions(runner: Any) -> Dict[str, Callable[[dict], bool]]:
+    """Обработчики, связанные с runner: {action: handler(step)}"""
+    return {name: MethodType(spec.handler, runner) for name, spec in _REGISTRY.items()}
+
+
+def normalize_step(step: Any) -> Any:
+    """
+    Копия шага с нормализованными параметрами (рекурсивно для блоков)
+    
+    Неверные значения остаются как есть - ошибку сообщит обработчик.
+    """
+    if not isinstance(step, dict):
+        return step
+    
+    step = dict(step)
+    for key in NESTED_KEYS:
+        if isinstance(step.get(key), list):
+            step[key] = normalize_steps(step[key])
+    
+    spec = _REGISTRY.get(step.get('action'))
+    if spec is not None and spec.normalize is not None:
+        try:
+            step = spec.normalize(step)
+        except (TypeError, ValueError):
+            pass
+    return step
+
+
+def normalize_steps(steps: List[Any]) -> List[Any]:
+    return [normalize_step(step) for step in steps]
+
+
+# ==================== Нормализаторы встроенных действий ====================
+
+def _is_variable(value: Any) -> bool:
+    """'{name}' - подставляется из variables во время выполнения"""
+    return isinstance(value, str) and value.startswith('{') and value.endswith('}')
+
+
+def _to_int(step: dict, key: str):
+    value = step.get(key)
+    if isinstance(value, (str, float)) and not isinstance(value, bool) and not _is_variable(value):
+        step[key] = int(float(value))
+
+
+def _to_float(step: dict, key: str):
+    value = step.get(key)
+    if isinstance(value, (str, int)) and not isinstance(value, bool) and not _is_variable(value):
+        step[key] = float(value)
+
+
+def normalize_repeat(step: dict) -> dict:
+    _to_int(step, 'times')
+    return step
+
+
+def normalize_click(step: dict) -> dict:
+    for key in ('clicks', 'index'):
+        _to_int(step, key)
+    for key in ('interval', 'timeout'):
+        _to_float(step, key)
+    if step.get('position') == 'absolute':
+        _to_int(step, 'x')
+        _to_int(step, 'y')
+    return step
+
+
+def normalize_wait(step: dict) -> dict:
+    _to_float(step, 'duration')
+    return step
+
+
+def normalize_key(step: dict) -> dict:
+    if isinstance(step.get('key'), str):
+        step['key'] = step['key'].strip()
+    return step
+
+
+def normalize_hotkey(step: dict) -> dict:
+    keys = step.get('keys')
+    if isinstance(keys, str):
+        step['keys'] = [k.strip() for k in keys.split('+')]
+    return step
+
+
+def normalize_scroll(step: dict) -> dict:
+    if isinstance(step.get('direction'), str):
+        step['direction'] = step['direction'].strip().lower()
+    _to_int(step, 'amount')
+    _to_int(step, 'clicks')
+    return step
+
+
+# ==================== Ресурсы встроенных действий ====================
+
+def selenium_click_resources(step: dict) -> FrozenSet[str]:
+    """selenium_click: humanlike двигает реальный курсор"""
+    if step.get('humanlike'):
+        return frozenset({RESOURCE_DOM, RESOURCE_INPUT})
+    return frozenset({RESOURCE_DOM})
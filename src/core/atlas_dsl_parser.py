@@ -16,28 +16,77 @@ atlas_dsl_parser.py
         wait 1s
 """
 
+import copy
+import os
 import re
+import sys
 import yaml
 import json
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Union
+
+# Корень проекта в sys.path (запуск как скрипта: python3 src/core/atlas_dsl_parser.py)
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.core.compile_cache import file_signature, dir_signature
+from src.core.template_index import TemplateIndex
+from src.core.atlas_grammar import (
+    AtlasSyntaxError, Command, Diagnostic, Node, Program, Repeat, Try, VariableRef,
+    CODE_UNKNOWN_VARIABLE, KEYWORD_CATCH, KEYWORD_END, SEVERITY_ERROR, SEVERITY_WARNING, SLOT_RE, VARIABLE_RE,
+    bind, fill_slots, iter_program, parse_program,
+)
+
+# Версия парсера: увеличивать при любом изменении результата парсинга
+# (инвалидирует кэш скомпилированных .atlas, см. compile_cache.py)
+PARSER_VERSION = '5'
+
+_VARIABLE_HEADER_RE = re.compile(r'^\$\{(\w+)\}$')
+_COORD_RE = re.compile(r'\((\d+),\s*(\d+)\)')
+
+
+def _unquote(text: str) -> str:
+    """Убирает парные кавычки вокруг текста"""
+    if (text.startswith('"') and text.endswith('"')) or \
+       (text.startswith("'") and text.endswith("'")):
+        return text[1:-1]
+    return text
 
 
 class AtlasDSLParser:
     """Парсер DSL для Macro AI"""
     
-    def __init__(self, templates_base_path: str = "templates", dom_selectors_path: str = "dom_selectors"):
+    def __init__(self, templates_base_path: str = "templates", dom_selectors_path: str = "dom_selectors",
+                 strict: bool = False):
+        """
+        Args:
+            templates_base_path: Папка шаблонов
+            dom_selectors_path: Папка DOM селекторов
+            strict: True - первая синтаксическая ошибка бросает AtlasSyntaxError,
+                False - ошибки с позициями собираются в self.diagnostics
+        """
         self.templates_base_path = templates_base_path
         self.dom_selectors_path = dom_selectors_path
-        self.template_map = self._build_template_map()
-        self.dom_selectors = self._load_dom_selectors()
+        self.strict = strict
+        # Ошибки и предупреждения последнего parse()
+        self.diagnostics: List[Diagnostic] = []
+        # Входы, прочитанные парсером (для кэша): путь → сигнатура на момент чтения
+        self._dependencies = {'files': {}, 'dirs': {}}
         self.current_indent = 0
         self.indent_stack = []
         
-        # Загрузка DSL переменных
-        self.variables = self._load_dsl_variables()
-        if self.variables:
-            print(f"✅ Загружено {len(self.variables)} DSL переменных")
+        # Шаблоны, DOM селекторы и DSL переменные загружаются при первом обращении
+        self._template_index = None
+        self._dom_selectors = None
+        self._dom_selectors_casefold = None
+        self._variables = None
+        
+        # Развертывание переменных: AST тел, готовые шаги по (переменная, параметры)
+        self._variable_templates: Dict[str, Program] = {}
+        self._expansion_cache: Dict[tuple, List[Dict[str, Any]]] = {}
+        self._expansion_stack: List[str] = []
+        self.expansion_stats = {'parsed': 0, 'hits': 0, 'misses': 0}
         
         # НОВОЕ: Поддержка системных команд
         self.system_commands_whitelist = {
@@ -46,43 +95,64 @@ class AtlasDSLParser:
             'list_processes', 'switch_desktop', 'get_current_app'
         }
     
-    def _build_template_map(self) -> Dict[str, str]:
-        """
-        Строит карту коротких имен → полные пути к шаблонам
-        Читает structure.txt файлы из папок
+    @property
+    def template_index(self) -> TemplateIndex:
+        """Индекс имен шаблонов (.cache/template_index.json, обновляется по mtime папок)"""
+        if self._template_index is None:
+            self._template_index = TemplateIndex(self.templates_base_path)
+            # Папки шаблонов - зависимости кэша компиляции (mtime на момент обновления индекса)
+            self._dependencies['dirs'][str(self.templates_base_path)] = dir_signature(str(self.templates_base_path))
+            self._dependencies['dirs'].update(self._template_index.dir_mtimes())
+        return self._template_index
+    
+    @property
+    def template_map(self) -> Dict[str, str]:
+        """Карта коротких имен → полные пути к шаблонам"""
+        return self.template_index.as_map()
+    
+    @property
+    def dom_selectors(self) -> Dict[str, Dict]:
+        """DOM селекторы из dom_selectors/*/selectors.json"""
+        if self._dom_selectors is None:
+            self._dom_selectors = self._load_dom_selectors()
+            self._dom_selectors_casefold = {}
+            for key in self._dom_selectors:
+                self._dom_selectors_casefold.setdefault(key.casefold(), key)
+        return self._dom_selectors
+    
+    @property
+    def variables(self) -> Dict[str, Dict[str, str]]:
+        """DSL переменные (DSL_VARIABLES.txt, USER_VARIABLES.txt)"""
+        if self._variables is None:
+            self._variables = self._load_dsl_variables()
+            if self._variables:
+                print(f"✅ Загружено {len(self._variables)} DSL переменных")
+        return self._variables
+    
+    def _track_file(self, path):
+        """Запомнить прочитанный файл (в т.ч. отсутствующий - его появление тоже важно)"""
+        self._dependencies['files'][str(path)] = file_signature(str(path))
+    
+    def _track_dir_tree(self, root):
+        """Запомнить папку и все подпапки (добавление/удаление файлов меняет их mtime)"""
+        root = str(root)
+        self._dependencies['dirs'][root] = dir_signature(root)
+        for dirpath, dirnames, _ in os.walk(root):
+            for dirname in dirnames:
+                path = os.path.join(dirpath, dirname)
+                self._dependencies['dirs'][path] = dir_signature(path)
+    
+    def get_dependencies(self) -> Dict[str, dict]:
         """
-        template_map = {}
-        
-        # Сканируем templates/ рекурсивно
-        templates_dir = Path(self.templates_base_path)
-        if not templates_dir.exists():
-            return template_map
+        Манифест входов парсера для кэша компиляции
         
-        # Находим все .png файлы
-        for png_file in templates_dir.rglob("*.png"):
-            # Полный путь относительно templates/
-            full_path = str(png_file)
-            
-            # Короткое имя (без расширения и путей)
-            short_name = png_file.stem
-            
-            # Убираем префиксы типа "Chrome-TikTok-"
-            clean_name = short_name
-            for prefix in ["Chrome-TikTok-", "Chrome-YouTube-", "Chrome-", "Atlas-"]:
-                if clean_name.startswith(prefix):
-                    clean_name = clean_name[len(prefix):]
-            
-            # Убираем суффиксы типа "-btn"
-            clean_name = clean_name.replace("-btn", "").replace("_btn", "")
-            
-            # Сохраняем оба варианта
-            template_map[short_name] = full_path
-            template_map[clean_name] = full_path
-            
-            # Также сохраняем с заменой дефисов на подчеркивания
-            template_map[clean_name.replace("-", "_")] = full_path
-            
-        return template_map
+        Returns:
+            {'files': {путь: [mtime_ns, size] | None}, 'dirs': {путь: mtime_ns | None}}
+        """
+        return {
+            'files': dict(self._dependencies['files']),
+            'dirs': dict(self._dependencies['dirs']),
+        }
     
     def _load_dom_selectors(self) -> Dict[str, Dict]:
         """
@@ -94,11 +164,13 @@ class AtlasDSLParser:
         dom_map = {}
         
         dom_dir = Path(self.dom_selectors_path)
+        self._track_dir_tree(dom_dir)
         if not dom_dir.exists():
             return dom_map
         
         # Находим все selectors.json файлы
         for json_file in dom_dir.rglob("selectors.json"):
+            self._track_file(json_file)
             try:
                 with open(json_file, 'r', encoding='utf-8') as f:
                     selectors = json.load(f)
@@ -140,6 +212,7 @@ class AtlasDSLParser:
         ]
         
         for var_file in var_files:
+            self._track_file(var_file)
             if not var_file.exists():
                 continue
             
@@ -156,18 +229,20 @@ class AtlasDSLParser:
                 current_var = None
                 current_code = []
                 in_code_section = False
+                lines = content.split('\n')
                 
-                for line in content.split('\n'):
-                    # Начало новой переменной: ${...}
-                    if line.strip().startswith('${') and line.strip().endswith('}'):
+                for i, line in enumerate(lines):
+                    # Начало новой переменной: ${VarName} и сразу разделитель ----
+                    # (${...} внутри кода и в ИСПОЛЬЗОВАНИЕ - ссылки, не заголовки)
+                    if self._is_variable_header(lines, i):
                         # Сохраняем предыдущую переменную
                         if current_var and current_code:
                             code_text = '\n'.join(current_code).strip()
                             # Извлекаем параметры из кода (например {site_url})
-                            params = re.findall(r'\{(\w+)\}', code_text)
+                            params = SLOT_RE.findall(code_text)
                             variables[current_var] = {
                                 'code': code_text,
-                                'params': list(set(params))
+                                'params': list(dict.fromkeys(params))
                             }
                         
                         # Начинаем новую переменную
@@ -176,9 +251,9 @@ class AtlasDSLParser:
                         current_code = []
                         in_code_section = False
                     
-                    # Разделитель (----)
+                    # Разделитель (----): после заголовка открывает код, иначе закрывает
                     elif line.strip().startswith('---'):
-                        in_code_section = True
+                        in_code_section = current_var is not None and not current_code and not in_code_section
                     
                     # Секция ИСПОЛЬЗОВАНИЕ или пустая строка после кода
                     elif line.strip().startswith('ИСПОЛЬЗОВАНИЕ:') or \
@@ -196,10 +271,10 @@ class AtlasDSLParser:
                 # Сохраняем последнюю переменную
                 if current_var and current_code:
                     code_text = '\n'.join(current_code).strip()
-                    params = re.findall(r'\{(\w+)\}', code_text)
+                    params = SLOT_RE.findall(code_text)
                     variables[current_var] = {
                         'code': code_text,
-                        'params': list(set(params))
+                        'params': list(dict.fromkeys(params))
                     }
                 
             except Exception as e:
@@ -209,7 +284,10 @@ class AtlasDSLParser:
     
     def _expand_variable(self, var_name: str, params: Dict[str, str] = None) -> List[str]:
         """
-        Разворачивает переменную в список строк DSL кода
+        Разворачивает переменную в список строк DSL кода (текст, без разбора)
+        
+        Парсер использует готовые шаги из _lower_variable; этот метод - для
+        просмотра кода переменной с подставленными параметрами.
         
         Args:
             var_name: Имя переменной (без ${})
@@ -222,21 +300,40 @@ class AtlasDSLParser:
             print(f"⚠️  Переменная ${{{var_name}}} не найдена")
             return []
         
-        var_data = self.variables[var_name]
-        code = var_data['code']
-        
-        # Подстановка параметров
-        if params:
-            for param_name, param_value in params.items():
-                code = code.replace(f'{{{param_name}}}', param_value)
+        code = fill_slots(self.variables[var_name]['code'], params or {})
         
         # Проверка на неподставленные параметры
-        missing_params = re.findall(r'\{(\w+)\}', code)
+        missing_params = SLOT_RE.findall(code)
         if missing_params:
             print(f"⚠️  Переменная ${{{var_name}}} требует параметры: {', '.join(missing_params)}")
         
         return code.split('\n')
     
+    @staticmethod
+    def _is_variable_header(lines: List[str], index: int) -> bool:
+        """Строка - заголовок переменной: ${VarName}, следующая непустая - разделитель ----"""
+        if not _VARIABLE_HEADER_RE.match(lines[index].strip()):
+            return False
+        for line in lines[index + 1:]:
+            if line.strip():
+                return line.strip().startswith('---')
+        return False
+    
+    def _variable_params(self, var_name: str, argument: Optional[str]) -> Dict[str, str]:
+        """Параметры ${VarName:value}: значение привязывается к первому параметру переменной"""
+        if argument is None:
+            return {}
+        
+        param_value = argument.strip()
+        # Определяем имя параметра из определения переменной
+        if var_name in self.variables:
+            var_params = self.variables[var_name]['params']
+            if var_params:
+                # Используем первый параметр
+                return {var_params[0]: param_value}
+        
+        return {'value': param_value}
+    
     def _parse_variable_line(self, line: str) -> Optional[tuple]:
         """
         Парсит строку с переменной: ${VarName} или ${VarName:param1,param2}
@@ -244,41 +341,17 @@ class AtlasDSLParser:
         Returns:
             (var_name, params_dict) или None
         """
-        line = line.strip()
-        
-        # Формат: ${VarName}
-        simple_match = re.match(r'^\$\{(\w+)\}$', line)
-        if simple_match:
-            return (simple_match.group(1), {})
-        
-        # Формат: ${VarName:value}
-        single_param_match = re.match(r'^\$\{(\w+):(.+)\}$', line)
-        if single_param_match:
-            var_name = single_param_match.group(1)
-            param_value = single_param_match.group(2).strip()
-            
-            # Определяем имя параметра из определения переменной
-            if var_name in self.variables:
-                var_params = self.variables[var_name]['params']
-                if var_params:
-                    # Используем первый параметр
-                    return (var_name, {var_params[0]: param_value})
-            
-            return (var_name, {'value': param_value})
-        
-        return None
+        match = VARIABLE_RE.match(line.strip())
+        if not match:
+            return None
+        return (match.group(1), self._variable_params(match.group(1), match.group(2)))
     
     def _resolve_template(self, name: str) -> Optional[str]:
         """Находит полный путь к шаблону по короткому имени"""
-        # Прямое совпадение
-        if name in self.template_map:
-            return self.template_map[name]
-        
-        # Поиск без учета регистра
-        name_lower = name.lower()
-        for key, value in self.template_map.items():
-            if key.lower() == name_lower:
-                return value
+        # Прямое совпадение или без учета регистра (O(1) по индексу)
+        path = self.template_index.resolve(name)
+        if path is not None:
+            return path
         
         # Если не найдено, возвращаем как есть (возможно это полный путь)
         return f"{self.templates_base_path}/{name}.png"
@@ -294,383 +367,502 @@ class AtlasDSLParser:
         else:
             return float(duration_str)
     
-    def _parse_line(self, line: str) -> Optional[Dict[str, Any]]:
-        """Парсит одну строку DSL"""
-        line = line.strip()
-        
-        # Пустая строка или комментарий
-        if not line or line.startswith('#'):
+    def _parse_region(self, value) -> Optional[List[int]]:
+        """Парсит область поиска: 'x,y,w,h' → [x, y, w, h]"""
+        parts = str(value).strip('()').split(',')
+        if len(parts) != 4:
+            print(f"⚠️  Неверный region: {value} (нужно x,y,w,h)")
             return None
+        try:
+            return [int(float(p)) for p in parts]
+        except ValueError:
+            print(f"⚠️  Неверный region: {value} (нужно x,y,w,h)")
+            return None
+    
+    def _parse_params(self, parts: List[str]) -> Dict[str, Any]:
+        """Параметры key=value (числа → float)"""
+        params = {}
+        for part in parts:
+            if '=' in part:
+                key, value = part.split('=', 1)
+                try:
+                    params[key] = float(value)
+                except ValueError:
+                    params[key] = value
+        return params
+    
+    def _apply_search_params(self, result: Dict[str, Any], params: Dict[str, Any]):
+        """Параметры поиска шаблона (region и передаваемые как есть)"""
+        if 'region' in params:
+            region = self._parse_region(params['region'])
+            if region:
+                result['region'] = region
+        for key in ('match_mode', 'roi', 'multiscale', 'poll_min', 'poll_max', 'change_threshold',
+                    'match_workers'):
+            if key in params:
+                result[key] = params[key]
+    
+    def _apply_retry_params(self, result: Dict[str, Any], params: Dict[str, Any]):
+        """Политика повтора: retry=3 backoff=0.5 retry_timeout=20 (см. retry_policy.py)"""
+        if 'retry' not in params:
+            return
+        retry = {'attempts': int(params['retry'])}
+        if 'backoff' in params:
+            retry['backoff'] = params['backoff']
+        if 'retry_timeout' in params:
+            retry['timeout'] = params['retry_timeout']
+        result['retry'] = retry
+    
+    # ==================== Команды ====================
+    
+    def _cmd_system(self, name: str, text: str) -> Dict[str, Any]:
+        """@system команда"""
+        return self._parse_system_command(f'@system {text}')
+    
+    def _cmd_open(self, name: str, text: str) -> Dict[str, Any]:
+        """OPEN - запуск приложения: open ChromeApp threshold=0.7"""
+        parts = text.split()
+        template_name = parts[0]
+        params = self._parse_params(parts[1:])
+        
+        template_path = self._resolve_template(template_name)
+        result = {
+            'action': 'click',
+            'template': template_path,
+            'clicks': 1,
+            'wait_for_appear': True,
+            'timeout': 3.0,
+            'description': f'Запуск {template_name}'
+        }
         
-        # ПЕРЕМЕННАЯ: ${VarName} или ${VarName:params}
-        if line.startswith('${'):
-            var_data = self._parse_variable_line(line)
-            if var_data:
-                var_name, params = var_data
-                # Возвращаем специальный маркер для развертывания
-                return {
-                    'action': 'expand_variable',
-                    'variable': var_name,
-                    'params': params
-                }
-        
-        # НОВОЕ: @SYSTEM команды
-        if line.startswith('@system '):
-            return self._parse_system_command(line)
-        
-        # OPEN - запуск приложения
-        if line.startswith('open '):
-            rest = line[5:].strip()
-            # Парсим параметры (например: open ChromeApp threshold=0.7)
-            parts = rest.split()
-            template_name = parts[0]
-            
-            # Извлекаем параметры
-            params = {}
-            for part in parts[1:]:
-                if '=' in part:
-                    key, value = part.split('=', 1)
-                    try:
-                        params[key] = float(value)
-                    except ValueError:
-                        params[key] = value
-            
-            template_path = self._resolve_template(template_name)
-            result = {
-                'action': 'click',
-                'template': template_path,
-                'clicks': 1,
-                'wait_for_appear': True,
-                'timeout': 3.0,
-                'description': f'Запуск {template_name}'
-            }
-            
-            # Добавляем параметры если есть
-            if 'threshold' in params:
-                result['threshold'] = params['threshold']
-            if 'timeout' in params:
-                result['timeout'] = params['timeout']
-            
-            return result
+        # Добавляем параметры если есть
+        if 'threshold' in params:
+            result['threshold'] = params['threshold']
+        if 'timeout' in params:
+            result['timeout'] = params['timeout']
+        self._apply_search_params(result, params)
+        self._apply_retry_params(result, params)
         
-        # CLICK - клик по кнопке
-        if line.startswith('click '):
-            rest = line[6:].strip()
-            
-            # Проверка на координаты: click (500, 300)
-            coord_match = re.match(r'\((\d+),\s*(\d+)\)', rest)
-            if coord_match:
-                x, y = coord_match.groups()
-                return {
-                    'action': 'click',
-                    'position': 'absolute',
-                    'x': int(x),
-                    'y': int(y),
-                    'clicks': 1,
-                    'description': f'Клик в ({x}, {y})'
-                }
-            
-            # Парсим параметры (например: click Button threshold=0.8)
-            parts = rest.split()
-            template_name = parts[0]
-            
-            # Извлекаем параметры
-            params = {}
-            for part in parts[1:]:
-                if '=' in part:
-                    key, value = part.split('=', 1)
-                    try:
-                        params[key] = float(value)
-                    except ValueError:
-                        params[key] = value
-            
-            # Проверка на DOM селектор (case-insensitive)
-            dom_key = None
-            if template_name in self.dom_selectors:
-                dom_key = template_name
-            else:
-                # Поиск без учета регистра
-                template_lower = template_name.lower()
-                for key in self.dom_selectors.keys():
-                    if key.lower() == template_lower:
-                        dom_key = key
-                        break
-            
-            if dom_key:
-                dom_data = self.dom_selectors[dom_key]
-                return {
-                    'action': 'selenium_click',
-                    'selector': dom_data['selector'],
-                    'index': 0,
-                    'description': f'Клик по {template_name} (DOM: {dom_data["selector"]})'
-                }
-            
-            # Fallback на Vision template
-            template_path = self._resolve_template(template_name)
-            result = {
+        return result
+    
+    def _cmd_click(self, name: str, text: str) -> Dict[str, Any]:
+        """CLICK - клик по кнопке: click Button threshold=0.8 / click (500, 300)"""
+        # Проверка на координаты: click (500, 300)
+        coord_match = _COORD_RE.match(text)
+        if coord_match:
+            x, y = coord_match.groups()
+            return {
                 'action': 'click',
-                'template': template_path,
+                'position': 'absolute',
+                'x': int(x),
+                'y': int(y),
                 'clicks': 1,
-                'description': f'Клик по {template_name}'
+                'description': f'Клик в ({x}, {y})'
             }
-            
-            # Добавляем параметры если есть
-            if 'threshold' in params:
-                result['threshold'] = params['threshold']
-            if 'timeout' in params:
-                result['timeout'] = params['timeout']
-            if 'index' in params:
-                result['index'] = int(params['index'])
-            
-            return result
         
-        # DOUBLE_CLICK - двойной клик
-        if line.startswith('double_click ') or line.startswith('dclick '):
-            prefix_len = 13 if line.startswith('double_click') else 7
-            template_name = line[prefix_len:].strip()
-            template_path = self._resolve_template(template_name)
-            return {
-                'action': 'click',
-                'template': template_path,
-                'clicks': 2,
-                'interval': 0.3,
-                'description': f'Двойной клик по {template_name}'
-            }
+        parts = text.split()
+        template_name = parts[0]
+        params = self._parse_params(parts[1:])
+        
+        # Проверка на DOM селектор (case-insensitive)
+        dom_key = None
+        if template_name in self.dom_selectors:
+            dom_key = template_name
+        else:
+            # Поиск без учета регистра
+            dom_key = self._dom_selectors_casefold.get(template_name.casefold())
         
-        # TYPE - ввод текста
-        if line.startswith('type '):
-            text = line[5:].strip()
-            # Убираем кавычки если есть
-            if (text.startswith('"') and text.endswith('"')) or \
-               (text.startswith("'") and text.endswith("'")):
-                text = text[1:-1]
+        if dom_key:
+            dom_data = self.dom_selectors[dom_key]
             return {
-                'action': 'type',
-                'text': text,
-                'description': f'Ввод текста'
+                'action': 'selenium_click',
+                'selector': dom_data['selector'],
+                'index': 0,
+                'description': f'Клик по {template_name} (DOM: {dom_data["selector"]})'
             }
         
-        # PRESS - нажатие клавиши
-        if line.startswith('press '):
-            key = line[6:].strip().lower()
+        # Fallback на Vision template
+        template_path = self._resolve_template(template_name)
+        result = {
+            'action': 'click',
+            'template': template_path,
+            'clicks': 1,
+            'description': f'Клик по {template_name}'
+        }
+        
+        # Добавляем параметры если есть
+        if 'threshold' in params:
+            result['threshold'] = params['threshold']
+        if 'timeout' in params:
+            result['timeout'] = params['timeout']
+        if 'index' in params:
+            result['index'] = int(params['index'])
+        self._apply_search_params(result, params)
+        self._apply_retry_params(result, params)
+        
+        return result
+    
+    def _cmd_double_click(self, name: str, text: str) -> Dict[str, Any]:
+        """DOUBLE_CLICK / DCLICK - двойной клик"""
+        template_path = self._resolve_template(text)
+        return {
+            'action': 'click',
+            'template': template_path,
+            'clicks': 2,
+            'interval': 0.3,
+            'description': f'Двойной клик по {text}'
+        }
+    
+    def _cmd_type(self, name: str, text: str) -> Dict[str, Any]:
+        """TYPE - ввод текста"""
+        return {
+            'action': 'type',
+            'text': _unquote(text),
+            'description': f'Ввод текста'
+        }
+    
+    def _cmd_press(self, name: str, text: str) -> Dict[str, Any]:
+        """PRESS - нажатие клавиши"""
+        key = text.lower()
+        return {
+            'action': 'key',
+            'key': key,
+            'description': f'Нажатие {key}'
+        }
+    
+    def _cmd_hotkey(self, name: str, text: str) -> Dict[str, Any]:
+        """HOTKEY - комбинация клавиш"""
+        keys = [k.strip() for k in text.split('+')]
+        return {
+            'action': 'hotkey',
+            'keys': keys,
+            'description': f'Комбинация {"+".join(keys)}'
+        }
+    
+    def _cmd_wait(self, name: str, text: str) -> Dict[str, Any]:
+        """WAIT - пауза"""
+        duration = self._parse_duration(text)
+        return {
+            'action': 'wait',
+            'duration': duration,
+            'description': f'Пауза {duration}с'
+        }
+    
+    def _cmd_scroll(self, name: str, text: str) -> Dict[str, Any]:
+        """SCROLL - скролл: scroll down 10"""
+        parts = text.lower().split()
+        direction = parts[0]
+        amount = int(parts[1]) if len(parts) > 1 else 5
+        
+        return {
+            'action': 'scroll',
+            'direction': direction,
+            'amount': amount,
+            'clicks': 1,
+            'description': f'Скролл {direction}'
+        }
+    
+    def _cmd_log(self, name: str, text: str) -> Dict[str, Any]:
+        """LOG - сообщение в лог выполнения"""
+        message = _unquote(text)
+        return {
+            'action': 'log',
+            'message': message,
+            'description': f'Лог: {message}'
+        }
+    
+    def _cmd_abort(self, name: str, text: str) -> Dict[str, Any]:
+        """ABORT - прервать выполнение макроса"""
+        message = _unquote(text) if text else None
+        return {
+            'action': 'abort',
+            'message': message,
+            'description': 'Прервать выполнение'
+        }
+    
+    def _cmd_selenium_init(self, name: str, text: str) -> Dict[str, Any]:
+        """SELENIUM_INIT - инициализация Selenium: selenium_init url=https://example.com"""
+        url = None
+        if 'url=' in text:
+            url = text.split('url=')[1].strip()
+        return {
+            'action': 'selenium_init',
+            'url': url,
+            'description': 'Selenium init'
+        }
+    
+    def _cmd_selenium_connect(self, name: str, text: str) -> Dict[str, Any]:
+        """SELENIUM_CONNECT - подключение к существующему браузеру"""
+        return {
+            'action': 'selenium_connect',
+            'description': 'Selenium connect'
+        }
+    
+    def _cmd_selenium_close(self, name: str, text: str) -> Dict[str, Any]:
+        """SELENIUM_CLOSE - закрытие Selenium"""
+        return {
+            'action': 'selenium_close',
+            'description': 'Selenium close'
+        }
+    
+    # Таблица диспетчеризации: первое слово строки → обработчик
+    COMMANDS = {
+        '@system': _cmd_system,
+        'open': _cmd_open,
+        'click': _cmd_click,
+        'double_click': _cmd_double_click,
+        'dclick': _cmd_double_click,
+        'type': _cmd_type,
+        'press': _cmd_press,
+        'hotkey': _cmd_hotkey,
+        'wait': _cmd_wait,
+        'scroll': _cmd_scroll,
+        'log': _cmd_log,
+        'abort': _cmd_abort,
+        'selenium_init': _cmd_selenium_init,
+        'selenium_connect': _cmd_selenium_connect,
+        'selenium_close': _cmd_selenium_close,
+    }
+    
+    # Команды без аргумента
+    NO_ARGUMENT_COMMANDS = {'abort', 'selenium_init', 'selenium_connect', 'selenium_close'}
+    
+    # ==================== AST → шаги ====================
+    
+    def _report(self, severity: str, message: str, node: Node, filename: Optional[str], code: str = ''):
+        """Ошибка с позицией: strict - исключение, иначе запись в diagnostics"""
+        if self.strict and severity == SEVERITY_ERROR:
+            raise AtlasSyntaxError(message, node.line, node.column, node.source, filename)
+        self.diagnostics.append(Diagnostic(severity, message, node.line, node.column,
+                                           node.source.strip(), filename, code))
+    
+    def _lower_command(self, node: Command, filename: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Команда → шаг (обработчик из таблицы COMMANDS)"""
+        if not node.text and node.name not in self.NO_ARGUMENT_COMMANDS:
+            self._report(SEVERITY_ERROR, f"команда {node.name} требует аргумент", node, filename)
+            return None
+        
+        handler = self.COMMANDS[node.name]
+        try:
+            return handler(self, node.name, node.text)
+        except AtlasSyntaxError:
+            raise
+        except (ValueError, IndexError) as e:
+            # Неверное значение аргумента (wait abc, scroll down x, @system ...)
+            column = node.column + len(node.name) + 1
+            raise AtlasSyntaxError(str(e), node.line, column, node.source, filename) from e
+    
+    def _lower_node(self, node: Node, filename: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Узел AST → шаг (блоки - с вложенными шагами)"""
+        if isinstance(node, Command):
+            return self._lower_command(node, filename)
+        
+        if isinstance(node, VariableRef):
+            # Маркер развертывания (развертывается в _lower_body)
             return {
-                'action': 'key',
-                'key': key,
-                'description': f'Нажатие {key}'
+                'action': 'expand_variable',
+                'variable': node.name,
+                'params': self._variable_params(node.name, node.argument)
             }
         
-        # HOTKEY - комбинация клавиш
-        if line.startswith('hotkey '):
-            keys_str = line[7:].strip()
-            keys = [k.strip() for k in keys_str.split('+')]
+        if isinstance(node, Repeat):
+            if node.times_slot is not None:
+                self._report(SEVERITY_ERROR, f"repeat {{{node.times_slot}}}: нужно число (параметр не задан)",
+                             node, filename)
+                return None
             return {
-                'action': 'hotkey',
-                'keys': keys,
-                'description': f'Комбинация {"+".join(keys)}'
+                'action': 'repeat',
+                'times': node.times,
+                'steps': self._lower_body(node.body, filename),
+                'description': f'Повторить {node.times} раз',
+                'indent': node.indent
             }
         
-        # WAIT - пауза
-        if line.startswith('wait '):
-            duration_str = line[5:].strip()
-            duration = self._parse_duration(duration_str)
+        if isinstance(node, Try):
             return {
-                'action': 'wait',
-                'duration': duration,
-                'description': f'Пауза {duration}с'
+                'action': 'try',
+                'try_steps': self._lower_body(node.body, filename),
+                'catch_steps': self._lower_body(node.catch_body, filename),
+                'description': 'Попытка (try/catch)'
             }
         
-        # SCROLL - скролл
-        if line.startswith('scroll '):
-            direction = line[7:].strip().lower()
+        return None
+    
+    def _lower_body(self, nodes: List[Node], filename: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Список узлов → список шагов (переменные разворачиваются на месте)"""
+        steps = []
+        for node in nodes:
+            if isinstance(node, VariableRef):
+                steps.extend(self._lower_variable(node, filename))
+                continue
+            
+            step = self._lower_node(node, filename)
+            if step:
+                steps.append(step)
+        return steps
+    
+    def _variable_template(self, var_name: str) -> Optional[Program]:
+        """AST тела переменной со слотами {param} (разбирается один раз)"""
+        if var_name in self._variable_templates:
+            return self._variable_templates[var_name]
+        if var_name not in self.variables:
+            return None
+        
+        # Загрузчик переменных захватывает и текст описаний (ПРАВИЛО, ✅ ...),
+        # поэтому ошибки в теле переменной - только предупреждения
+        program = parse_program(self.variables[var_name]['code'], self.COMMANDS, f'${{{var_name}}}')
+        for diagnostic in program.diagnostics:
+            diagnostic.severity = SEVERITY_WARNING
+        self.diagnostics.extend(program.diagnostics)
+        
+        self._variable_templates[var_name] = program
+        self.expansion_stats['parsed'] += 1
+        return program
+    
+    def _lower_variable(self, node: VariableRef, filename: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        РАЗВЕРТЫВАНИЕ ПЕРЕМЕННОЙ
+        
+        Тело переменной разбирается один раз (_variable_template), параметры
+        подставляются в готовые узлы (bind), шаги кэшируются по паре
+        (переменная, параметры). Каждое использование получает свою копию.
+        Вложенные ${...} разворачиваются рекурсивно, цикл - ошибка.
+        """
+        if node.name in self._expansion_stack:
+            chain = ' → '.join(f'${{{name}}}' for name in self._expansion_stack + [node.name])
+            self._report(SEVERITY_ERROR, f"циклическая ссылка на переменную: {chain}", node, filename)
+            return []
+        
+        template = self._variable_template(node.name)
+        if template is None:
+            print(f"⚠️  Переменная ${{{node.name}}} не найдена")
+            self._report(SEVERITY_WARNING, f"переменная ${{{node.name}}} не найдена", node, filename,
+                         code=CODE_UNKNOWN_VARIABLE)
+            return []
+        
+        params = self._variable_params(node.name, node.argument)
+        key = (node.name, tuple(sorted(params.items())))
+        steps = self._expansion_cache.get(key)
+        
+        if steps is None:
+            self.expansion_stats['misses'] += 1
+            missing_params = [p for p in self.variables[node.name]['params'] if p not in params]
+            if missing_params:
+                print(f"⚠️  Переменная ${{{node.name}}} требует параметры: {', '.join(missing_params)}")
             
-            # Парсим: scroll down 10
-            parts = direction.split()
-            direction = parts[0]
-            amount = int(parts[1]) if len(parts) > 1 else 5
+            self._expansion_stack.append(node.name)
+            try:
+                steps = self._lower_body(bind(template.body, params), template.filename)
+            finally:
+                self._expansion_stack.pop()
             
-            return {
-                'action': 'scroll',
-                'direction': direction,
-                'amount': amount,
-                'clicks': 1,
-                'description': f'Скролл {direction}'
-            }
+            self._expansion_cache[key] = steps
+            print(f"🔄 Развертывание ${{{node.name}}} → {len(steps)} шагов")
+        else:
+            self.expansion_stats['hits'] += 1
         
-        # REPEAT - повторение (обрабатывается отдельно)
-        if line.startswith('repeat '):
-            match = re.match(r'repeat\s+(\d+):', line)
-            if match:
-                times = int(match.group(1))
-                return {
-                    'action': 'repeat',
-                    'times': times,
-                    'steps': [],
-                    'description': f'Повторить {times} раз'
-                }
-        
-        # END - конец блока repeat
-        if line == 'end':
+        return copy.deepcopy(steps)
+    
+    def _parse_line(self, line: str, line_num: int = 1) -> Optional[Dict[str, Any]]:
+        """
+        Парсит одну строку DSL (без блоков)
+        
+        Для целого файла используйте parse(): блоки repeat/try собираются
+        только там. Здесь заголовок блока возвращается с пустым телом,
+        ${...} - маркером expand_variable.
+        """
+        line = line.strip()
+        if line == KEYWORD_END:
             return {
                 'action': 'end',
                 'description': 'Конец блока'
             }
-        
-        # SELENIUM_INIT - инициализация Selenium
-        if line.startswith('selenium_init'):
-            # Парсим: selenium_init url=https://example.com
-            url = None
-            if 'url=' in line:
-                url = line.split('url=')[1].strip()
-            return {
-                'action': 'selenium_init',
-                'url': url,
-                'description': 'Selenium init'
-            }
-        
-        # SELENIUM_CONNECT - подключение к существующему браузеру
-        if line.startswith('selenium_connect'):
+        if line == KEYWORD_CATCH:
             return {
-                'action': 'selenium_connect',
-                'description': 'Selenium connect'
+                'action': 'catch',
+                'description': 'Обработчик ошибок'
             }
         
-        # SELENIUM_CLOSE - закрытие Selenium
-        if line.startswith('selenium_close'):
-            return {
-                'action': 'selenium_close',
-                'description': 'Selenium close'
-            }
+        program = parse_program(line, self.COMMANDS, strict=self.strict)
+        self.diagnostics.extend(program.diagnostics)
+        if not program.body:
+            return None
         
-        # Неизвестная команда
-        return None
+        node = program.body[0]
+        node.line = line_num
+        return self._lower_node(node)
     
-    def parse(self, dsl_content: str) -> Dict[str, Any]:
+    def parse(self, dsl_content: str, filename: Optional[str] = None) -> Dict[str, Any]:
         """
         Парсит DSL контент и возвращает YAML структуру
         
+        Один проход грамматики (atlas_grammar.parse_program) строит AST с
+        позициями строк, затем узлы превращаются в шаги через таблицу COMMANDS.
+        Неизвестные команды и битые блоки попадают в self.diagnostics
+        (strict=True - AtlasSyntaxError на первой ошибке).
+        
         Args:
             dsl_content: Содержимое .atlas файла
+            filename: Имя файла для сообщений об ошибках
         
         Returns:
             Dict с последовательностью в формате YAML
         """
-        lines = dsl_content.split('\n')
-        steps = []
-        block_stack = []  # Стек для вложенных блоков (repeat, try)
+        self.diagnostics = []
         
-        for line_num, line in enumerate(lines, 1):
-            original_line = line
-            line = line.rstrip()
-            
-            # Пустая строка или комментарий
-            if not line.strip() or line.strip().startswith('#'):
-                continue
-            
-            # Определяем уровень отступа
-            indent = len(line) - len(line.lstrip())
-            
-            # Если отступ уменьшился, выходим из блоков
-            while block_stack and indent <= block_stack[-1]['indent']:
-                block_stack.pop()
-            
-            # Парсим строку
-            step = self._parse_line(line)
-            
-            if step:
-                action = step['action']
-                
-                # РАЗВЕРТЫВАНИЕ ПЕРЕМЕННОЙ
-                if action == 'expand_variable':
-                    var_name = step['variable']
-                    var_params = step['params']
-                    
-                    # Разворачиваем переменную в строки кода
-                    expanded_lines = self._expand_variable(var_name, var_params)
-                    
-                    if expanded_lines:
-                        print(f"🔄 Развертывание ${{{var_name}}} → {len(expanded_lines)} строк")
-                        
-                        # Рекурсивно парсим каждую строку развернутого кода
-                        for exp_line in expanded_lines:
-                            exp_step = self._parse_line(exp_line)
-                            if exp_step:
-                                # Добавляем развернутые шаги
-                                if block_stack:
-                                    self._add_to_current_block(block_stack[-1], exp_step)
-                                else:
-                                    steps.append(exp_step)
-                    continue
-                
-                # TRY блок
-                if action == 'try':
-                    step['indent'] = indent
-                    step['in_catch'] = False
-                    
-                    # Добавляем в текущий контекст
-                    if block_stack:
-                        self._add_to_current_block(block_stack[-1], step)
-                    else:
-                        steps.append(step)
-                    
-                    # Добавляем в стек
-                    block_stack.append({
-                        'indent': indent,
-                        'step': step,
-                        'type': 'try'
-                    })
-                
-                # CATCH блок
-                elif action == 'catch':
-                    if block_stack and block_stack[-1]['type'] == 'try':
-                        block_stack[-1]['step']['in_catch'] = True
-                
-                # END блок
-                elif action == 'end':
-                    if block_stack:
-                        block_stack.pop()
-                
-                # REPEAT блок
-                elif action == 'repeat':
-                    step['indent'] = indent
-                    
-                    # Добавляем в текущий контекст
-                    if block_stack:
-                        self._add_to_current_block(block_stack[-1], step)
-                    else:
-                        steps.append(step)
-                    
-                    # Добавляем в стек
-                    block_stack.append({
-                        'indent': indent,
-                        'step': step,
-                        'type': 'repeat'
-                    })
-                
-                # Обычный шаг
-                else:
-                    if block_stack:
-                        self._add_to_current_block(block_stack[-1], step)
-                    else:
-                        steps.append(step)
+        program = parse_program(dsl_content, self.COMMANDS, filename, self.strict)
+        self.diagnostics.extend(program.diagnostics)
+        steps = self._lower_body(program.body, filename)
+        
+        # Ошибки грамматики и команд - в порядке строк
+        self.diagnostics.sort(key=lambda d: (d.filename != filename, d.line, d.column))
+        self._print_diagnostics(filename)
         
         return {'steps': steps}
     
-    def _add_to_current_block(self, block, step):
-        """Добавляет шаг в текущий блок (try/catch или repeat)"""
-        if block['type'] == 'try':
-            if block['step']['in_catch']:
-                block['step']['catch_steps'].append(step)
-            else:
-                block['step']['try_steps'].append(step)
-        elif block['type'] == 'repeat':
-            block['step']['steps'].append(step)
+    def _print_diagnostics(self, filename: Optional[str], start: int = 0) -> int:
+        """Вывод диагностики файла и ошибок в переменных (с индекса start)"""
+        for diagnostic in self.diagnostics[start:]:
+            if diagnostic.filename == filename or diagnostic.severity == SEVERITY_ERROR:
+                print(diagnostic)
+        return len(self.diagnostics)
+    
+    def iter_parse(self, source: Union[str, Iterable[str]],
+                   filename: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Потоковый разбор: шаги верхнего уровня по мере закрытия блоков
+        
+        Первый шаг доступен до того, как разобран остальной файл, в памяти
+        только открытый блок. Ошибки выводятся по ходу разбора.
+        
+        Args:
+            source: Текст или итератор строк (открытый файл)
+            filename: Имя файла для сообщений об ошибках
+        
+        Yields:
+            Шаги (как элементы parse()['steps'])
+        """
+        self.diagnostics = []
+        printed = 0
+        
+        for node in iter_program(source, self.COMMANDS, self.diagnostics, filename, self.strict):
+            steps = self._lower_body([node], filename)
+            printed = self._print_diagnostics(filename, printed)
+            yield from steps
+        
+        self._print_diagnostics(filename, printed)
+    
+    def iter_parse_file(self, filepath: str) -> Iterator[Dict[str, Any]]:
+        """Потоковый разбор .atlas файла (читается построчно)"""
+        with open(filepath, 'r', encoding='utf-8') as f:
+            yield from self.iter_parse(f, filename=str(filepath))
     
     def parse_file(self, filepath: str) -> Dict[str, Any]:
         """Парсит .atlas файл"""
         with open(filepath, 'r', encoding='utf-8') as f:
             content = f.read()
         
-        result = self.parse(content)
+        result = self.parse(content, filename=str(filepath))
         
         # Добавляем метаданные из имени файла
         filename = Path(filepath).stem
@@ -726,8 +918,6 @@ class AtlasDSLParser:
 
 def main():
     """Тестирование парсера"""
-    import sys
-    
     if len(sys.argv) < 2:
         print("Использование:")
         print("  python3 atlas_dsl_parser.py <file.atlas>")
@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""
+atlas_grammar.py
+Лексер и грамматика Atlas DSL (один проход, типизированное AST)
+
+Исходник разбирается за один проход по строкам: для каждой строки
+вычисляется отступ, первый токен определяет тип узла (таблица, а не
+цепочка startswith). Блоки (repeat/try/catch/end) собираются стеком
+по отступам. Каждый узел хранит строку и колонку - ошибки указывают
+точное место вместо молчаливого пропуска строки.
+
+AST:
+    Command(name, text)            click Like threshold=0.8
+    VariableRef(name, argument)    ${TikTokAutoLikes:10}
+    Repeat(times, body)            repeat 5: ... end
+    Try(body, catch_body)          try: ... catch: ... end
+
+Тела DSL переменных разбираются один раз вместе со слотами параметров
+({query}, repeat {count}:); bind() подставляет значения в готовые узлы.
+
+Семантику команд (какие команды существуют и во что превращаются)
+задает AtlasDSLParser: грамматике передается только набор известных команд.
+"""
+
+import re
+from dataclasses import dataclass, field, replace
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+# Предкомпилированные выражения
+VARIABLE_RE = re.compile(r'^\$\{(\w+)(?::(.+))?\}$')
+_REPEAT_RE = re.compile(r'^repeat\s+(?:(\d+)|\{(\w+)\})\s*:$')
+SLOT_RE = re.compile(r'(?<!\$)\{(\w+)\}')  # {param}, но не ${Var}
+_FIRST_TOKEN_RE = re.compile(r'\S+')
+
+# Ключевые слова блоков
+KEYWORD_REPEAT = 'repeat'
+KEYWORD_TRY = 'try:'
+KEYWORD_CATCH = 'catch:'
+KEYWORD_END = 'end'
+
+# Уровни диагностики
+SEVERITY_ERROR = 'error'
+SEVERITY_WARNING = 'warning'
+
+# Коды диагностики (по ним, а не по тексту, сообщения различают потребители)
+CODE_UNKNOWN_VARIABLE = 'unknown-variable'
+
+
+class AtlasSyntaxError(ValueError):
+    """Ошибка синтаксиса DSL с позицией в исходнике"""
+    
+    def __init__(self, message: str, line: int = 0, column: int = 0,
+                 source_line: str = '', filename: Optional[str] = None):
+        self.message = message
+        self.line = line
+        self.column = column
+        self.source_line = source_line
+        self.filename = filename
+        super().__init__(self._format())
+    
+    def _format(self) -> str:
+        location = f"{self.filename or '<atlas>'}:{self.line}:{self.column}"
+        text = f"{location}: {self.message}"
+        if self.source_line:
+            text += f"\n    {self.source_line.strip()}"
+        return text
+
+
+@dataclass
+class Diagnostic:
+    """Сообщение парсера (ошибка или предупреждение) с позицией"""
+    severity: str
+    message: str
+    line: int
+    column: int
+    source_line: str = ''
+    filename: Optional[str] = None
+    code: str = ''
+    
+    def __str__(self) -> str:
+        icon = '❌' if self.severity == SEVERITY_ERROR else '⚠️ '
+        return f"{icon} {self.filename or '<atlas>'}:{self.line}:{self.column}: {self.message}"
+
+
+# ==================== AST ====================
+
+@dataclass
+class Node:
+    """Базовый узел: позиция в исходнике"""
+    line: int
+    column: int
+    indent: int
+    source: str
+
+
+@dataclass
+class Command(Node):
+    """Команда: первое слово + остаток строки"""
+    name: str = ''
+    text: str = ''
+    
+    @property
+    def args(self) -> List[str]:
+        """Остаток строки, разбитый по пробелам"""
+        return self.text.split()
+
+
+@dataclass
+class VariableRef(Node):
+    """Ссылка на DSL переменную: ${Name} или ${Name:argument}"""
+    name: str = ''
+    argument: Optional[str] = None
+
+
+@dataclass
+class Repeat(Node):
+    """Блок repeat N: (или repeat {param}: в теле переменной)"""
+    times: int = 1
+    body: List[Node] = field(default_factory=list)
+    times_slot: Optional[str] = None
+
+
+@dataclass
+class Try(Node):
+    """Блок try: ... catch: ... end"""
+    body: List[Node] = field(default_factory=list)
+    catch_body: List[Node] = field(default_factory=list)
+    in_catch: bool = False
+
+
+BlockNode = Union[Repeat, Try]
+
+
+@dataclass
+class Program:
+    """Результат разбора: узлы верхнего уровня и диагностика"""
+    body: List[Node]
+    diagnostics: List[Diagnostic] = field(default_factory=list)
+    filename: Optional[str] = None
+    
+    @property
+    def errors(self) -> List[Diagnostic]:
+        return [d for d in self.diagnostics if d.severity == SEVERITY_ERROR]
+
+
+# ==================== Лексер ====================
+
+def logical_lines(source: Union[str, Iterable[str]]) -> Iterator[Tuple[int, int, str, str]]:
+    """
+    Значимые строки исходника (без пустых и комментариев)
+    
+    Args:
+        source: Текст или итератор строк (открытый файл - читается построчно)
+    
+    Yields:
+        (номер строки, отступ, текст без отступа, исходная строка)
+    """
+    lines = source.split('\n') if isinstance(source, str) else source
+    for line_num, raw in enumerate(lines, 1):
+        line = raw.rstrip()
+        text = line.lstrip()
+        if not text or text.startswith('#'):
+            continue
+        yield line_num, len(line) - len(text), text, line
+
+
+def split_command(text: str) -> Tuple[str, str]:
+    """Первое слово и остаток строки"""
+    match = _FIRST_TOKEN_RE.match(text)
+    if not match:
+        return '', ''
+    return match.group(0), text[match.end():].strip()
+
+
+# ==================== Парсер ====================
+
+class _Parser:
+    """Однопроходный разбор строк в AST со стеком блоков"""
+    
+    def __init__(self, known_commands: Iterable[str], filename: Optional[str], strict: bool):
+        self.known_commands = frozenset(known_commands)
+        self.filename = filename
+        self.strict = strict
+        self.diagnostics: List[Diagnostic] = []
+    
+    def report(self, severity: str, message: str, line: int, column: int, source: str):
+        """Ошибка (strict - исключение) или запись в диагностику"""
+        if self.strict and severity == SEVERITY_ERROR:
+            raise AtlasSyntaxError(message, line, column, source, self.filename)
+        self.diagnostics.append(Diagnostic(severity, message, line, column, source.strip(), self.filename))
+    
+    def parse(self, source: Union[str, Iterable[str]]) -> Program:
+        body = list(self.iter_nodes(source))
+        return Program(body=body, diagnostics=self.diagnostics, filename=self.filename)
+    
+    def iter_nodes(self, source: Union[str, Iterable[str]]) -> Iterator[Node]:
+        """
+        Узлы верхнего уровня по мере готовности
+        
+        Команда отдается сразу, блок repeat/try - когда он закрыт (end,
+        строка с меньшим отступом или конец исходника).
+        """
+        # Стек открытых блоков (отступ заголовка - в node.indent)
+        stack: List[BlockNode] = []
+        # Открытый блок верхнего уровня (отдается после закрытия)
+        pending: Optional[BlockNode] = None
+        
+        def current_body() -> List[Node]:
+            block = stack[-1]
+            if isinstance(block, Try) and block.in_catch:
+                return block.catch_body
+            return block.body
+        
+        for line_num, indent, text, raw in logical_lines(source):
+            column = indent + 1
+            word, rest = split_command(text)
+            
+            # catch: / end закрывают более глубокие блоки и относятся к блоку своего уровня
+            if text == KEYWORD_CATCH or text == KEYWORD_END:
+                while stack and stack[-1].indent > indent:
+                    stack.pop()
+                
+                if text == KEYWORD_CATCH:
+                    if stack and isinstance(stack[-1], Try) and not stack[-1].in_catch:
+                        stack[-1].in_catch = True
+                    else:
+                        self.report(SEVERITY_ERROR, "catch: без открытого try:", line_num, column, raw)
+                elif stack:
+                    stack.pop()
+                    if not stack and pending is not None:
+                        yield pending
+                        pending = None
+                else:
+                    self.report(SEVERITY_WARNING, "end без открытого блока", line_num, column, raw)
+                continue
+            
+            # Обычная строка: блоки с отступом не меньше текущего закрыты
+            while stack and stack[-1].indent >= indent:
+                stack.pop()
+            if not stack and pending is not None:
+                yield pending
+                pending = None
+            
+            node = self._parse_node(word, rest, text, line_num, column, indent, raw)
+            if node is None:
+                continue
+            
+            is_block = isinstance(node, (Repeat, Try))
+            if stack:
+                current_body().append(node)
+            elif is_block:
+                pending = node
+            else:
+                yield node
+            if is_block:
+                stack.append(node)
+        
+        if pending is not None:
+            yield pending
+    
+    def _parse_node(self, word: str, rest: str, text: str, line_num: int, column: int,
+                    indent: int, raw: str) -> Optional[Node]:
+        position = dict(line=line_num, column=column, indent=indent, source=raw)
+        
+        # ${Var} / ${Var:arg}
+        if word.startswith('${'):
+            match = VARIABLE_RE.match(text)
+            if not match:
+                self.report(SEVERITY_ERROR, f"неверная ссылка на переменную: {text}", line_num, column, raw)
+                return None
+            return VariableRef(name=match.group(1), argument=match.group(2), **position)
+        
+        # repeat N:
+        if word == KEYWORD_REPEAT:
+            match = _REPEAT_RE.match(text)
+            if not match:
+                self.report(SEVERITY_ERROR, "ожидается 'repeat N:'", line_num, column, raw)
+                return None
+            if match.group(2):
+                return Repeat(times=0, times_slot=match.group(2), **position)
+            return Repeat(times=int(match.group(1)), **position)
+        
+        # try:
+        if text == KEYWORD_TRY:
+            return Try(**position)
+        
+        # Команда из таблицы
+        if word in self.known_commands:
+            return Command(name=word, text=rest, **position)
+        
+        self.report(SEVERITY_ERROR, f"неизвестная команда: {word}", line_num, column, raw)
+        return None
+
+
+def fill_slots(text: Optional[str], params: Dict[str, str]) -> Optional[str]:
+    """Подстановка {param} (неизвестные слоты остаются как есть)"""
+    if not text or '{' not in text:
+        return text
+    return SLOT_RE.sub(lambda m: params.get(m.group(1), m.group(0)), text)
+
+
+def bind(nodes: List[Node], params: Dict[str, str]) -> List[Node]:
+    """
+    Копия узлов с подставленными параметрами
+    
+    Исходные узлы (шаблон тела переменной) не меняются. repeat {param}:
+    получает times из параметра; если параметра нет или он не число -
+    times_slot остается, и ошибку сообщает тот, кто превращает узел в шаг.
+    """
+    bound = []
+    for node in nodes:
+        if isinstance(node, Command):
+            node = replace(node, text=fill_slots(node.text, params))
+        elif isinstance(node, VariableRef):
+            node = replace(node, argument=fill_slots(node.argument, params))
+        elif isinstance(node, Repeat):
+            times, slot = node.times, node.times_slot
+            if slot is not None and str(params.get(slot, '')).strip().isdigit():
+                times, slot = int(str(params[slot]).strip()), None
+            node = replace(node, times=times, times_slot=slot, body=bind(node.body, params))
+        elif isinstance(node, Try):
+            node = replace(node, body=bind(node.body, params), catch_body=bind(node.catch_body, params))
+        bound.append(node)
+    return bound
+
+
+def parse_program(source: Union[str, Iterable[str]], known_commands: Iterable[str], filename: Optional[str] = None,
+                  strict: bool = False) -> Program:
+    """
+    Разбор исходника DSL в AST
+    
+    Args:
+        source: Текст .atlas или итератор строк
+        known_commands: Первые слова команд (таблица диспетчеризации парсера)
+        filename: Имя файла для сообщений об ошибках
+        strict: True - первая ошибка бросает AtlasSyntaxError,
+            False - ошибки собираются в Program.diagnostics, строка пропускается
+    
+    Returns:
+        Program
+    """
+    return _Parser(known_commands, filename, strict).parse(source)
+
+
+def iter_program(source: Union[str, Iterable[str]], known_commands: Iterable[str],
+                 diagnostics: List[Diagnostic], filename: Optional[str] = None,
+                 strict: bool = False) -> Iterator[Node]:
+    """
+    Потоковый разбор: узлы верхнего уровня по мере закрытия блоков
+    
+    В памяти только текущая строка и открытый блок верхнего уровня -
+    для больших сгенерированных макросов (source - открытый файл).
+    
+    Args:
+        diagnostics: Список, куда добавляются ошибки по ходу разбора
+    """
+    parser = _Parser(known_commands, filename, strict)
+    parser.diagnostics = diagnostics
+    return parser.iter_nodes(source)
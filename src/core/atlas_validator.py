@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+atlas_validator.py
+Статическая проверка скомпилированных макросов до запуска
+
+Проверяет шаги (результат AtlasDSLParser или sequences из YAML), ничего
+не выполняя и не захватывая экран - миллисекунды на файл:
+- шаблоны: каждый template/templates существует на диске
+  (_resolve_template молча подставляет templates/<имя>.png);
+  внутри try - предупреждение, неудачу обработает catch
+- селекторы: selenium_* шаги с пустым selector
+- переменные: ${...}, которые не удалось развернуть
+- действия: action, которого нет в реестре действий (src/core/actions)
+- retry: политика повтора с неверными параметрами
+- недостижимые шаги: после abort, тело repeat 0, catch при пустом try
+
+Ошибка (error) - макрос гарантированно упадет, запуск не имеет смысла.
+Предупреждение (warning) - подозрительно, но выполнимо.
+
+Использование:
+    python3 -m src.core.atlas_validator macros/production/tiktok_likes.atlas
+    python3 -m src.core.atlas_validator macros/production --strict
+
+Код выхода 1 - есть ошибки (можно не ставить макрос в очередь).
+"""
+
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from src.core.actions import known_actions as registered_actions
+from src.core.atlas_grammar import CODE_UNKNOWN_VARIABLE, SEVERITY_ERROR, SEVERITY_WARNING
+from src.core.retry_policy import RetryPolicy
+
+# Selenium шаги, которым нужен CSS/XPath селектор
+SELECTOR_ACTIONS = frozenset({
+    'selenium_find', 'selenium_extract', 'selenium_get_coordinates', 'selenium_click',
+    'selenium_type',
+})
+
+# Шаг, после которого остаток блока не выполняется
+TERMINAL_ACTIONS = frozenset({'abort'})
+
+
+@dataclass
+class ValidationIssue:
+    """Проблема в шаге: уровень, сообщение и путь к шагу (1-based)"""
+    severity: str
+    message: str
+    sequence: str = ''
+    step_path: str = ''
+    description: str = ''
+    
+    def __str__(self) -> str:
+        icon = '❌' if self.severity == SEVERITY_ERROR else '⚠️ '
+        location = ' '.join(part for part in (self.sequence, f"шаг {self.step_path}" if self.step_path else '')
+                            if part)
+        text = f"{icon} {location}: {self.message}" if location else f"{icon} {self.message}"
+        if self.description:
+            text += f" ({self.description})"
+        return text
+
+
+@dataclass
+class ValidationReport:
+    """Результат проверки файла"""
+    path: str
+    issues: List[ValidationIssue] = field(default_factory=list)
+    steps: int = 0
+    seconds: float = 0.0
+    
+    @property
+    def errors(self) -> List[ValidationIssue]:
+        return [i for i in self.issues if i.severity == SEVERITY_ERROR]
+    
+    @property
+    def warnings(self) -> List[ValidationIssue]:
+        return [i for i in self.issues if i.severity == SEVERITY_WARNING]
+    
+    @property
+    def ok(self) -> bool:
+        """Нет ошибок (предупреждения допустимы)"""
+        return not self.errors
+
+
+class _StepValidator:
+    """Обход дерева шагов с накоплением проблем"""
+    
+    def __init__(self, sequence: str, known_actions: Optional[Iterable[str]] = None):
+        self.sequence = sequence
+        self.known_actions = frozenset(registered_actions() if known_actions is None else known_actions)
+        self.issues: List[ValidationIssue] = []
+        self.steps = 0
+        # Глубина вложенности в try_steps (ошибки там ловит catch)
+        self.try_depth = 0
+    
+    def report(self, severity: str, message: str, path: str, step: Any = None):
+        description = step.get('description', '') if isinstance(step, dict) else ''
+        self.issues.append(ValidationIssue(severity, message, self.sequence, path, description))
+    
+    def body(self, steps: Any, prefix: str = ''):
+        """Список шагов (тело последовательности или блока)"""
+        if not isinstance(steps, list):
+            self.report(SEVERITY_ERROR, "steps должен быть списком", prefix.rstrip('.'))
+            return
+        
+        terminated_at = None
+        for index, step in enumerate(steps, 1):
+            path = f"{prefix}{index}"
+            if terminated_at is not None:
+                self.report(SEVERITY_WARNING, f"недостижимый шаг (после abort в шаге {terminated_at})", path, step)
+            self.step(step, path)
+            if isinstance(step, dict) and step.get('action') in TERMINAL_ACTIONS and terminated_at is None:
+                terminated_at = path
+    
+    def step(self, step: Any, path: str):
+        self.steps += 1
+        if not isinstance(step, dict):
+            self.report(SEVERITY_ERROR, f"шаг должен быть словарем, а не {type(step).__name__}", path)
+            return
+        
+        action = step.get('action')
+        if not action:
+            self.report(SEVERITY_ERROR, "нет action", path, step)
+            return
+        
+        if action == 'expand_variable':
+            self.report(SEVERITY_ERROR, f"переменная ${{{step.get('variable')}}} не развернута", path, step)
+            return
+        if action not in self.known_actions:
+            self.report(SEVERITY_ERROR, f"действие '{action}' не поддерживается runner'ом", path, step)
+        
+        self._check_templates(step, path)
+        
+        if 'retry' in step:
+            try:
+                RetryPolicy.from_value(step['retry'])
+            except ValueError as e:
+                self.report(SEVERITY_ERROR, str(e), path, step)
+        
+        if action in SELECTOR_ACTIONS and not step.get('selector'):
+            self.report(SEVERITY_ERROR, f"{action} без selector", path, step)
+        
+        if action == 'click' and not (step.get('template') or step.get('templates')) \
+                and not ('x' in step and 'y' in step):
+            self.report(SEVERITY_ERROR, "click без шаблона и координат", path, step)
+        
+        if action == 'repeat':
+            nested = step.get('steps', [])
+            if step.get('times', 1) == 0 and nested:
+                self.report(SEVERITY_WARNING, "repeat 0: тело никогда не выполняется", path, step)
+            elif not nested:
+                self.report(SEVERITY_WARNING, "пустое тело repeat", path, step)
+            self.body(nested, f"{path}.")
+        
+        if action == 'try':
+            try_steps = step.get('try_steps', [])
+            catch_steps = step.get('catch_steps', [])
+            if not try_steps and catch_steps:
+                self.report(SEVERITY_WARNING, "catch недостижим: пустой блок try", path, step)
+            self.try_depth += 1
+            try:
+                self.body(try_steps, f"{path}.try.")
+            finally:
+                self.try_depth -= 1
+            self.body(catch_steps, f"{path}.catch.")
+    
+    def _check_templates(self, step: Dict[str, Any], path: str):
+        """template/templates: файлы шаблонов на диске"""
+        entries = step.get('templates') or ([step['template']] if step.get('template') else [])
+        if not isinstance(entries, list):
+            entries = [entries]
+        
+        paths = []
+        for entry in entries:
+            if isinstance(entry, dict):
+                entry = entry.get('template') or entry.get('path')
+            if entry:
+                paths.append(str(entry))
+        
+        missing = [p for p in paths if not os.path.exists(p)]
+        if not missing:
+            return
+        # Из нескольких кандидатов достаточно одного существующего,
+        # внутри try шаг может не найти шаблон намеренно (ветка catch)
+        if len(missing) == len(paths) and not self.try_depth:
+            severity = SEVERITY_ERROR
+        else:
+            severity = SEVERITY_WARNING
+        for template in missing:
+            self.report(severity, f"шаблон не найден: {template}", path, step)
+
+
+def validate_steps(steps: List[Dict[str, Any]], sequence: str = '',
+                   known_actions: Optional[Iterable[str]] = None) -> List[ValidationIssue]:
+    """
+    Проверка списка шагов
+    
+    Args:
+        steps: Шаги последовательности
+        sequence: Имя последовательности (для сообщений)
+        known_actions: Действия, которые умеет выполнять runner
+            (по умолчанию - встроенные и зарегистрированные плагинами)
+    
+    Returns:
+        Список проблем (пустой - все в порядке)
+    """
+    validator = _StepValidator(sequence, known_actions)
+    validator.body(steps)
+    return validator.issues
+
+
+def validate_config(config: Dict[str, Any], path: str = '',
+                    known_actions: Optional[Iterable[str]] = None) -> ValidationReport:
+    """Проверка всех последовательностей конфига ({'sequences': {...}})"""
+    started = time.perf_counter()
+    report = ValidationReport(path=path)
+    
+    sequences = config.get('sequences') if isinstance(config, dict) else None
+    if not isinstance(sequences, dict):
+        report.issues.append(ValidationIssue(SEVERITY_ERROR, "нет раздела sequences"))
+    else:
+        for name, sequence in sequences.items():
+            validator = _StepValidator(str(name), known_actions)
+            validator.body((sequence or {}).get('steps', []))
+            report.issues.extend(validator.issues)
+            report.steps += validator.steps
+    
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+def validate_file(path: str, known_actions: Optional[Iterable[str]] = None) -> ValidationReport:
+    """
+    Проверка .atlas или YAML конфига
+    
+    .atlas разбирается AtlasDSLParser (без вывода), ошибки разбора и
+    ненайденные переменные входят в отчет как ошибки.
+    """
+    started = time.perf_counter()
+    path = str(path)
+    
+    if not os.path.exists(path):
+        report = ValidationReport(path=path)
+        report.issues.append(ValidationIssue(SEVERITY_ERROR, f"файл не найден: {path}"))
+        return report
+    
+    if path.endswith('.atlas'):
+        import contextlib
+        import io
+        from src.core.atlas_dsl_parser import AtlasDSLParser
+        
+        parser = AtlasDSLParser()
+        parse_issues = []
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                parsed = parser.parse_file(path)
+        except ValueError as e:
+            report = ValidationReport(path=path)
+            report.issues.append(ValidationIssue(SEVERITY_ERROR, str(e)))
+            report.seconds = time.perf_counter() - started
+            return report
+        
+        for diagnostic in parser.diagnostics:
+            if diagnostic.filename != path and diagnostic.severity != SEVERITY_ERROR:
+                continue  # Проза в телах переменных
+            # Ненайденная переменная - шаги молча пропали бы
+            severity = SEVERITY_ERROR if diagnostic.code == CODE_UNKNOWN_VARIABLE else diagnostic.severity
+            parse_issues.append(ValidationIssue(
+                severity, f"{diagnostic.filename}:{diagnostic.line}:{diagnostic.column}: {diagnostic.message}"))
+        
+        config = {'sequences': {Path(path).stem: parsed}}
+    else:
+        import yaml
+        parse_issues = []
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                config = yaml.safe_load(f) or {}
+        except yaml.YAMLError as e:
+            report = ValidationReport(path=path)
+            report.issues.append(ValidationIssue(SEVERITY_ERROR, f"YAML: {e}"))
+            report.seconds = time.perf_counter() - started
+            return report
+    
+    report = validate_config(config, path, known_actions)
+    report.issues[:0] = parse_issues
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Статическая проверка макросов (.atlas / YAML)')
+    parser.add_argument('paths', nargs='+', help='Файлы или папки с .atlas')
+    parser.add_argument('--strict', action='store_true', help='Предупреждения считать ошибками')
+    parser.add_argument('--quiet', action='store_true', help='Только итог и файлы с проблемами')
+    args = parser.parse_args(argv)
+    
+    files = []
+    for path in map(Path, args.paths):
+        files.extend(sorted(path.rglob('*.atlas')) if path.is_dir() else [path])
+    
+    failed = 0
+    for path in files:
+        report = validate_file(str(path))
+        bad = not report.ok or (args.strict and report.warnings)
+        failed += bool(bad)
+        if args.quiet and not report.issues:
+            continue
+        
+        icon = '❌' if bad else ('⚠️ ' if report.issues else '✅')
+        print(f"{icon} {report.path} ({report.steps} шагов, {report.seconds * 1000:.1f} мс)")
+        for issue in report.issues:
+            print(f"   {issue}")
+    
+    print(f"\n📊 Проверено: {len(files)}, с ошибками: {failed}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
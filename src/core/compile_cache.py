@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+compile_cache.py
+Кэш скомпилированных .atlas (и YAML) конфигов с учетом зависимостей
+
+Ключ записи - MD5 пути и содержимого .atlas: имя последовательности
+берется из имени файла, поэтому одинаковые по тексту a.atlas и b.atlas
+хранятся отдельно. В записи хранится манифест всех
+входов, которые читал AtlasDSLParser (DSL_VARIABLES.txt, USER_VARIABLES.txt,
+dom_selectors/*/selectors.json, папки templates/), и версия парсера.
+При загрузке манифест сверяется с диском (только stat, без чтения файлов):
+изменилась любая зависимость или версия парсера - запись считается
+устаревшей и .atlas компилируется заново. Чистить .cache при деплое
+больше не нужно.
+
+Записи хранятся через compiled_program (.atlc, dict парсера): загрузчик
+не получает ни одного класса или функции и не может выполнить код.
+"""
+
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+from src.core import compiled_program
+
+CACHE_DIR = Path(".cache") / "compiled"
+CACHE_FORMAT = 2
+
+
+def file_signature(path: str) -> Optional[list]:
+    """(mtime_ns, размер) файла или None если файла нет"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def dir_signature(path: str) -> Optional[int]:
+    """
+    mtime_ns папки или None если папки нет
+    
+    mtime папки меняется при добавлении/удалении/переименовании файлов
+    в ней, поэтому набор PNG проверяется без обхода всего дерева.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns
+
+
+def snapshot(files: Iterable[str] = (), dirs: Iterable[str] = ()) -> Dict[str, dict]:
+    """Манифест зависимостей: текущие сигнатуры файлов и папок"""
+    return {
+        'files': {str(path): file_signature(path) for path in sorted(set(map(str, files)))},
+        'dirs': {str(path): dir_signature(path) for path in sorted(set(map(str, dirs)))},
+    }
+
+
+def stale_dependency(manifest: Dict[str, dict]) -> Optional[str]:
+    """
+    Первая изменившаяся зависимость манифеста
+    
+    Returns:
+        Путь изменившегося файла/папки или None если все актуально
+    """
+    for path, signature in manifest.get('files', {}).items():
+        if file_signature(path) != signature:
+            return path
+    for path, signature in manifest.get('dirs', {}).items():
+        if dir_signature(path) != signature:
+            return path
+    return None
+
+
+class CompileCache:
+    """Кэш результата парсинга .atlas (ключ: содержимое + зависимости + версия парсера)"""
+    
+    def __init__(self, cache_dir: Path = CACHE_DIR, parser_version: Optional[str] = None):
+        """
+        Args:
+            cache_dir: Папка кэша
+            parser_version: Версия парсера (по умолчанию PARSER_VERSION)
+        """
+        if parser_version is None:
+            from src.core.atlas_dsl_parser import PARSER_VERSION
+            parser_version = PARSER_VERSION
+        
+        self.cache_dir = Path(cache_dir)
+        self.parser_version = parser_version
+        self.last_miss_reason = None
+    
+    @staticmethod
+    def source_hash(source_path: str) -> str:
+        """MD5 содержимого исходного файла ('' если не читается)"""
+        try:
+            with open(source_path, 'rb') as f:
+                return hashlib.md5(f.read()).hexdigest()
+        except Exception:
+            return ""
+    
+    @staticmethod
+    def source_key(source_path: str) -> str:
+        """Нормализованный абсолютный путь исходника"""
+        return os.path.normcase(os.path.abspath(source_path))
+    
+    def _entry_path(self, source_path: str, source_hash: str) -> Path:
+        key = hashlib.md5(f"{self.source_key(source_path)}|{source_hash}".encode('utf-8')).hexdigest()
+        return self.cache_dir / f"{key}.atlc"
+    
+    def load(self, source_path: str) -> Optional[dict]:
+        """
+        Результат из кэша, если исходник и все зависимости не менялись
+        
+        Returns:
+            Сохраненные данные или None (причина в last_miss_reason)
+        """
+        self.last_miss_reason = None
+        
+        source_hash = self.source_hash(source_path)
+        if not source_hash:
+            return None
+        
+        entry_path = self._entry_path(source_path, source_hash)
+        if not entry_path.exists():
+            self.last_miss_reason = 'нет записи'
+            return None
+        
+        try:
+            entry = compiled_program.load(str(entry_path))
+            if not isinstance(entry, dict):
+                raise compiled_program.CompiledFormatError("Запись не dict")
+        except Exception:
+            self.last_miss_reason = 'запись повреждена'
+            return None
+        
+        if entry.get('format') != CACHE_FORMAT or entry.get('parser_version') != self.parser_version:
+            self.last_miss_reason = 'другая версия парсера'
+            return None
+        
+        if entry.get('source') != self.source_key(source_path):
+            self.last_miss_reason = 'запись другого файла'
+            return None
+        
+        changed = stale_dependency(entry.get('dependencies', {}))
+        if changed:
+            self.last_miss_reason = f"изменилось: {changed}"
+            return None
+        
+        return entry.get('data')
+    
+    def save(self, source_path: str, data: dict, dependencies: Optional[Dict[str, dict]] = None):
+        """
+        Сохранение результата с манифестом зависимостей
+        
+        Args:
+            source_path: Исходный .atlas
+            data: Результат парсинга
+            dependencies: Манифест {'files': {путь: сигнатура}, 'dirs': {...}}
+                (AtlasDSLParser.get_dependencies() - сигнатуры сняты в момент чтения)
+        """
+        source_hash = self.source_hash(source_path)
+        if not source_hash:
+            return
+        
+        entry = {
+            'format': CACHE_FORMAT,
+            'parser_version': self.parser_version,
+            'source': self.source_key(source_path),
+            'dependencies': dependencies or {'files': {}, 'dirs': {}},
+            'data': data,
+        }
+        
+        try:
+            payload = compiled_program.dumps(entry)
+        except (TypeError, ValueError):
+            # Не представимо в формате (например даты в YAML) - без кэша
+            return
+        
+        # Атомарная запись: параллельные runner'ы не читают недописанный файл
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(payload)
+            os.replace(tmp_path, self._entry_path(source_path, source_hash))
+        except Exception:
+            pass
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+compiled_program.py
+Безопасный формат записей кэша компиляции (.atlc)
+
+Это сериализатор записей CompileCache, а не формат программы: в файле
+то же дерево dict шагов, что возвращает парсер, и MacroRunner получает
+те же dict. Опкоды с типизированными операндами, пул констант и
+выполнение программы напрямую не сделаны.
+
+Структура файла (little-endian):
+    MAGIC 'ATLC' | версия u16 | u32 длина данных | данные
+
+Данные - pickle (protocol 5) дерева None/bool/int/float/str/list/dict.
+Одинаковые строки при записи сводятся к одному объекту (pickle хранит
+каждую один раз).
+
+Загрузка - C-загрузчик pickle без глобальных имен: find_class всегда
+отклоняется, поэтому файл не может получить ни одного класса или
+функции и выполнить код (в отличие от обычного pickle.load).
+"""
+
+import io
+import pickle
+import struct
+from typing import Any, Dict
+
+MAGIC = b'ATLC'
+FORMAT_VERSION = 2
+
+_HEADER = struct.Struct('<4sHI')
+_PICKLE_PROTOCOL = 5
+
+
+class CompiledFormatError(ValueError):
+    """Поврежденный файл или неподдерживаемая версия формата"""
+
+
+class _SafeUnpickler(pickle.Unpickler):
+    """Unpickler без доступа к классам и функциям"""
+    
+    def find_class(self, module: str, name: str):
+        raise CompiledFormatError(f"Запрещенное имя в данных: {module}.{name}")
+
+
+# ==================== Запись ====================
+
+def _canonical(value: Any, strings: Dict[str, str]) -> Any:
+    """
+    Копия дерева только из поддерживаемых типов (tuple → list),
+    одинаковые строки - один объект
+    """
+    # bool раньше int: bool - подкласс int
+    if value is None or isinstance(value, (bool, float)):
+        return value
+    if isinstance(value, int):
+        return int(value)
+    if isinstance(value, str):
+        return strings.setdefault(value, value)
+    if isinstance(value, (list, tuple)):
+        return [_canonical(item, strings) for item in value]
+    if isinstance(value, dict):
+        result = {}
+        for key, item in value.items():
+            if not isinstance(key, str):
+                raise TypeError(f"Ключ должен быть строкой: {key!r}")
+            result[strings.setdefault(key, key)] = _canonical(item, strings)
+        return result
+    raise TypeError(f"Тип не поддерживается форматом: {type(value).__name__}")
+
+
+def dumps(data: Any) -> bytes:
+    """
+    Кодирование в бинарный формат
+    
+    Raises:
+        TypeError: Значение не представимо (даты, объекты)
+    """
+    payload = pickle.dumps(_canonical(data, {}), protocol=_PICKLE_PROTOCOL)
+    return _HEADER.pack(MAGIC, FORMAT_VERSION, len(payload)) + payload
+
+
+# ==================== Чтение ====================
+
+def loads(buffer: bytes) -> Any:
+    """
+    Декодирование бинарного формата
+    
+    Raises:
+        CompiledFormatError: Не тот формат, другая версия или поврежденные данные
+    """
+    if len(buffer) < _HEADER.size:
+        raise CompiledFormatError("Данные обрезаны")
+    magic, version, size = _HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC:
+        raise CompiledFormatError("Не скомпилированный макрос (нет сигнатуры ATLC)")
+    if version != FORMAT_VERSION:
+        raise CompiledFormatError(f"Версия формата {version}, ожидается {FORMAT_VERSION}")
+    if len(buffer) - _HEADER.size != size:
+        raise CompiledFormatError("Данные обрезаны" if len(buffer) - _HEADER.size < size
+                                  else "Лишние данные в конце файла")
+    
+    stream = io.BytesIO(buffer)
+    stream.seek(_HEADER.size)
+    try:
+        data = _SafeUnpickler(stream).load()
+    except CompiledFormatError:
+        raise
+    except Exception as e:
+        # UnpicklingError, EOFError, ошибки памяти/рекурсии на поврежденных данных
+        raise CompiledFormatError(f"Поврежденные данные: {e!r}") from e
+    if stream.tell() != len(buffer):
+        raise CompiledFormatError("Лишние данные после программы")
+    return data
+
+
+def dump(data: Any, path: str):
+    """Запись в файл"""
+    with open(path, 'wb') as f:
+        f.write(dumps(data))
+
+
+def load(path: str) -> Any:
+    """Чтение из файла"""
+    with open(path, 'rb') as f:
+        return loads(f.read())
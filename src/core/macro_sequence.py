@@ -10,14 +10,42 @@ import os
 import sys
 from pathlib import Path
 from typing import Optional, Tuple
+from dataclasses import replace
 import yaml
-import hashlib
-import pickle
 
 # Легкие импорты (быстрые)
 import pyautogui
 import pyperclip
 
+# Корень проекта в sys.path (запуск как скрипта: python3 src/core/macro_sequence.py)
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.core.actions import (
+    MacroAborted, bind_actions, normalize_step, normalize_steps, register_action, step_resources,
+    unskippable_actions, normalize_click, normalize_hotkey, normalize_key, normalize_repeat,
+    normalize_scroll, normalize_wait, selenium_click_resources,
+    RESOURCE_DOM, RESOURCE_INPUT, RESOURCE_NETWORK,
+)
+from src.core.atlas_grammar import SEVERITY_ERROR
+from src.core.atlas_validator import validate_steps
+from src.core.compile_cache import CompileCache
+from src.core.resource_scheduler import ResourceScheduler, get_scheduler
+from src.core.retry_policy import RetryPolicy
+from src.engines.dom_extract import ElementTexts, extract_elements, is_meaningful, is_service_text, parse_attributes
+from src.engines.driver_pool import LEASE_TIMEOUT, get_driver_pool
+from src.vision.capture import get_capture_backend
+from src.vision.frame_cache import FrameCache
+from src.vision.multi_template import parse_template_candidates, pick_best_hit
+from src.vision.roi import RoiTracker, region_to_window, full_window
+from src.vision.matching import extract_peaks, pyramid_match, resize_image
+from src.vision.multiscale import ScaleCache, candidate_scales
+from src.vision.search_options import SearchOptions, MATCH_MODE_FULL, MATCH_MODE_PYRAMID
+from src.vision.template_store import TemplateStore
+from src.vision.waiter import WaitPolicy, wait_for_match
+from src.vision.parallel_match import MatchPool, resolve_workers, tiled_match_template
+
 # НОВОЕ: Импорт для поддержки состояний
 try:
     from src.memory.state_manager import state_manager, MacroState
@@ -38,9 +66,7 @@ try:
     from selenium.webdriver.common.by import By
     from selenium.webdriver.support.ui import WebDriverWait
     from selenium.webdriver.support import expected_conditions as EC
-    from selenium.webdriver.chrome.service import Service
     from selenium.webdriver.common.action_chains import ActionChains
-    from webdriver_manager.chrome import ChromeDriverManager
     SELENIUM_AVAILABLE = True
 except ImportError:
     SELENIUM_AVAILABLE = False
@@ -69,6 +95,9 @@ except ImportError:
 DEFAULT_THRESHOLD = 0.75  # Понижен с 0.86 для лучшего поиска
 DEFAULT_INTERVAL = 0.5
 USE_GRAYSCALE = True
+FRAME_MAX_AGE = 0.1  # Максимальный возраст общего кадра экрана (сек)
+DUPLICATE_DISTANCE = 20  # Совпадения ближе (логические px) считаются дубликатами
+MATCH_WORKERS = 'auto'  # Потоки поиска шаблонов (auto = ядра, до 8)
 
 # Безопасность
 pyautogui.FAILSAFE = True
@@ -107,8 +136,24 @@ def _lazy_import_cv2():
 class MacroRunner:
     """Запуск последовательностей макросов"""
     
-    def __init__(self, config_path: str = "my_sequences.yaml"):
+    def __init__(self, config_path: Optional[str] = "my_sequences.yaml", capture: Optional[str] = None,
+                 stream: bool = False, validate: bool = True, driver=None,
+                 scheduler: Optional[ResourceScheduler] = None):
+        """
+        Args:
+            config_path: Путь к конфигу (None - без конфига, затем load_config)
+            capture: Backend захвата экрана (pyautogui | mss | auto | replay:<путь>),
+                по умолчанию переменная MACRO_CAPTURE, иначе pyautogui
+            stream: Потоковый разбор .atlas - выполнение начинается с первого
+                шага, пока остаток файла еще разбирается (для больших макросов)
+            validate: Статическая проверка шагов перед запуском (atlas_validator)
+            driver: Уже подключенный WebDriver экземпляра (parallel_runner) -
+                selenium_init/connect используют его, selenium_close не закрывает
+            scheduler: Блокировки ресурсов шагов (по умолчанию - общие для процесса)
+        """
         self.config_path = config_path
+        self.stream = stream
+        self.validate = validate
         self.config = {}
         self.templates = {}
         self.templates_library = {}  # Библиотека шаблонов
@@ -122,7 +167,8 @@ class MacroRunner:
         }
         
         # Selenium & AI
-        self.driver = None  # Selenium WebDriver
+        self.driver = driver  # Selenium WebDriver
+        self.external_driver = driver is not None  # Драйвер принадлежит вызывающему
         self.ocr_reader = None  # EasyOCR reader
         self.ai_model = None  # Gemini AI model
         
@@ -139,72 +185,70 @@ class MacroRunner:
         self.state_manager = state_manager if STATE_MANAGER_AVAILABLE else None
         self.current_step_index = 0
         
+        # Обработчики действий: action → связанный метод (один поиск в dict на шаг)
+        self._bind_actions()
+        # Срок шага с retry timeout (ожидания шага не длятся дольше, см. _clamp_wait)
+        self._step_deadline = None
+        # Ввод (мышь/клавиатура) - под общей блокировкой параллельных runner'ов
+        self.scheduler = scheduler or get_scheduler()
+        
+        # Захват экрана (все скриншоты runner'а идут через backend)
+        self.capture = get_capture_backend(capture)
+        
         self._detect_display_scale()
+        # Кэш скомпилированных .atlas (с учетом зависимостей парсера)
+        self.compile_cache = CompileCache()
         self._load_config()
+        
+        # Общий кадр экрана: один захват на тик опроса для всех шаблонов
+        self.frame_cache = FrameCache(max_age=FRAME_MAX_AGE, capture=self.capture)
+        # Последние позиции шаблонов (ROI) - ищем сначала там
+        self.roi_tracker = RoiTracker()
+        # Победившие масштабы шаблонов (multiscale) и кэш масштабированных шаблонов
+        self.scale_cache = ScaleCache()
+        self.template_store = TemplateStore(color=not USE_GRAYSCALE)
+        self._scaled_templates = {}
+        # Пул потоков: несколько шаблонов шага / полосы большого кадра параллельно
+        self.match_pool = None
+        self._apply_settings()
+        
         # Ленивая загрузка: templates_library и variables загружаются по требованию
         # self._load_templates_library()  # Теперь загружается при первом использовании
         self._load_variables()
-    
-    def _get_file_hash(self, file_path: str) -> str:
-        """Получение MD5 хэша файла для кэширования"""
-        try:
-            with open(file_path, 'rb') as f:
-                return hashlib.md5(f.read()).hexdigest()
-        except Exception:
-            return ""
+        # Переменные уже в начальном состоянии (run_sequence не сбрасывает их повторно)
+        self._fresh_state = True
     
     def _load_from_cache(self, file_path: str) -> Optional[dict]:
-        """Загрузка из кэша по хэшу файла"""
-        cache_dir = Path(".cache")
-        if not cache_dir.exists():
-            return None
-        
-        file_hash = self._get_file_hash(file_path)
-        if not file_hash:
+        """Загрузка из кэша (исходник, зависимости парсера и его версия не менялись)"""
+        cached_data = self.compile_cache.load(file_path)
+        if cached_data is None:
+            reason = self.compile_cache.last_miss_reason
+            if reason and reason != 'нет записи' and not FAST_MODE:
+                print(f"♻️  Кэш устарел ({reason}), компилируем заново")
             return None
         
-        cache_file = cache_dir / f"{file_hash}.pkl"
-        if not cache_file.exists():
-            return None
-        
-        try:
-            with open(cache_file, 'rb') as f:
-                cached_data = pickle.load(f)
-                if not FAST_MODE:
-                    print(f"💾 Загружено из кэша: {Path(file_path).name}")
-                return cached_data
-        except Exception:
-            return None
+        if not FAST_MODE:
+            print(f"💾 Загружено из кэша: {Path(file_path).name}")
+        return cached_data
     
-    def _save_to_cache(self, file_path: str, data: dict):
-        """Сохранение в кэш"""
-        cache_dir = Path(".cache")
-        cache_dir.mkdir(exist_ok=True)
-        
-        file_hash = self._get_file_hash(file_path)
-        if not file_hash:
-            return
-        
-        cache_file = cache_dir / f"{file_hash}.pkl"
-        try:
-            with open(cache_file, 'wb') as f:
-                pickle.dump(data, f)
-        except Exception:
-            pass
+    def _save_to_cache(self, file_path: str, data: dict, dependencies: Optional[dict] = None):
+        """Сохранение в кэш с манифестом зависимостей парсера"""
+        self.compile_cache.save(file_path, data, dependencies)
     
     def _detect_display_scale(self):
         """Определение Retina scale"""
         screen_size = pyautogui.size()
-        screenshot = pyautogui.screenshot()
+        frame = self.capture.grab_gray()
+        height, width = frame.shape[:2]
         
-        # PyAutoGUI уже возвращает физическое разрешение
+        # Захват уже возвращает физическое разрешение
         # Поэтому НЕ нужно масштабировать шаблоны
         # Но нужно корректировать координаты для pyautogui.click()
-        if screenshot.width != screen_size.width:
-            self.display_scale = screenshot.width / screen_size.width
+        if width != screen_size.width:
+            self.display_scale = width / screen_size.width
             print(f"🖥️  Retina Display обнаружен (scale: {self.display_scale}x)")
             print(f"   📐 Логическое разрешение: {screen_size.width}x{screen_size.height}")
-            print(f"   📐 Физическое разрешение: {screenshot.width}x{screenshot.height}")
+            print(f"   📐 Физическое разрешение: {width}x{height}")
         else:
             self.display_scale = 1.0
     
@@ -229,8 +273,10 @@ class MacroRunner:
             return False
             
         self.session_id = session_id
-        # Восстановить контекст выполнения
+        # Восстановить контекст выполнения (поверх начальных переменных конфига)
+        self._reset_run_state()
         self._restore_context_from_state(state)
+        self._fresh_state = True
         return True
     
     def _restore_context_from_state(self, state: MacroState):
@@ -265,8 +311,36 @@ class MacroRunner:
                 return state.get_context_for_ai()
         return {}
     
+    def load_config(self, config_path: str):
+        """Загрузка конфига в тот же runner (долгоживущие воркеры): новые settings и переменные"""
+        self.config_path = config_path
+        self._load_config()
+        self._apply_settings()
+        self._load_variables()
+        self._fresh_state = True
+    
+    def _apply_settings(self):
+        """Параметры runner'а из settings конфига (frame_max_age, match_workers)"""
+        settings = self.config.get('settings') or {}
+        self.frame_cache.max_age = float(settings.get('frame_max_age', FRAME_MAX_AGE))
+        workers = resolve_workers(settings.get('match_workers', MATCH_WORKERS))
+        if self.match_pool is None or self.match_pool.workers != workers:
+            if self.match_pool is not None:
+                self.match_pool.shutdown()
+            self.match_pool = MatchPool(workers)
+    
+    def _reset_run_state(self):
+        """Состояние прошлого запуска (переменные, _skip_steps) не переходит в следующий"""
+        self.variables = dict(self.config.get('variables') or {})
+        self.current_step_index = 0
+        self._step_deadline = None
+    
     def _load_config(self):
-        """Загрузка конфига (YAML или DSL .atlas) с кэшированием"""
+        """Загрузка конфига (YAML или DSL .atlas) с кэшированием (.cache/compiled/*.atlc)"""
+        if self.config_path is None:
+            # Прогретый runner воркера: конфиг придет с первым заданием
+            self.config = {'sequences': {}, 'settings': {}}
+            return
         if not os.path.exists(self.config_path):
             print(f"❌ Конфиг не найден: {self.config_path}")
             self.config = {'sequences': {}, 'settings': {}}
@@ -283,6 +357,19 @@ class MacroRunner:
                     print(f"✅ Загружено последовательностей: {len(sequences)}")
                     return
                 
+                sequence_name = Path(self.config_path).stem
+                if self.stream:
+                    # Шаги разбираются во время выполнения (run_sequence)
+                    self.config = {
+                        'sequences': {sequence_name: {
+                            'name': sequence_name.replace('_', ' ').title(),
+                            'stream': self.config_path
+                        }},
+                        'settings': {}
+                    }
+                    print(f"🌊 Потоковый режим: {sequence_name} (шаги разбираются по ходу выполнения)")
+                    return
+                
                 # DSL формат - конвертируем в YAML
                 print(f"🔄 Обнаружен DSL формат (.atlas)")
                 # Добавляем корень проекта в sys.path для импортов
@@ -294,7 +381,6 @@ class MacroRunner:
                 parsed = parser.parse_file(self.config_path)
                 
                 # Создаем структуру конфига
-                sequence_name = Path(self.config_path).stem
                 self.config = {
                     'sequences': {sequence_name: parsed},
                     'settings': {}
@@ -302,11 +388,16 @@ class MacroRunner:
                 print(f"✅ DSL конвертирован: {sequence_name}")
                 
                 # Сохраняем в кэш
-                self._save_to_cache(self.config_path, self.config)
+                self._save_to_cache(self.config_path, self.config, parser.get_dependencies())
             else:
-                # Обычный YAML
-                with open(self.config_path, 'r', encoding='utf-8') as f:
-                    self.config = yaml.safe_load(f) or {'sequences': {}, 'settings': {}}
+                # Обычный YAML (кэш по содержимому - без yaml.safe_load на каждом запуске)
+                cached_config = self._load_from_cache(self.config_path)
+                if cached_config:
+                    self.config = cached_config
+                else:
+                    with open(self.config_path, 'r', encoding='utf-8') as f:
+                        self.config = yaml.safe_load(f) or {'sequences': {}, 'settings': {}}
+                    self._save_to_cache(self.config_path, self.config)
             
             sequences = self.config.get('sequences', {})
             print(f"✅ Загружено последовательностей: {len(sequences)}")
@@ -339,12 +430,19 @@ class MacroRunner:
     
     def _load_variables(self):
         """Загрузка переменных из конфига"""
-        self.variables = self.config.get('variables', {})
+        # Копия: шаги меняют переменные, конфиг остается исходным
+        self.variables = dict(self.config.get('variables') or {})
         if self.variables:
             print(f"🔧 Загружено переменных: {len(self.variables)}")
             for key, value in self.variables.items():
                 print(f"   {key} = {value}")
     
+    def _clamp_wait(self, seconds: float) -> float:
+        """Время ожидания внутри шага, не дольше оставшегося retry timeout"""
+        if self._step_deadline is None:
+            return seconds
+        return round(max(0.0, min(float(seconds), self._step_deadline - time.monotonic())), 3)
+    
     def _resolve_variable(self, value):
         """Разрешение переменных вида ${var_name}"""
         if isinstance(value, str) and value.startswith('${') and value.endswith('}'):
@@ -365,9 +463,13 @@ class MacroRunner:
             print(f"⚠️  Шаблон не найден: {template_path}")
             return None
         
-        # Ленивая загрузка OpenCV
-        cv2_lib = _lazy_import_cv2()
-        template = cv2_lib.imread(template_path, cv2_lib.IMREAD_GRAYSCALE if USE_GRAYSCALE else cv2_lib.IMREAD_COLOR)
+        # Предобработанный шаблон из .cache/templates (memory map, без повторного декодирования)
+        try:
+            template = self.template_store.get(template_path, color=not USE_GRAYSCALE)
+        except Exception as e:
+            print(f"⚠️  Хранилище шаблонов недоступно: {e}")
+            cv2_lib = _lazy_import_cv2()
+            template = cv2_lib.imread(template_path, cv2_lib.IMREAD_GRAYSCALE if USE_GRAYSCALE else cv2_lib.IMREAD_COLOR)
         
         if template is None:
             print(f"❌ Не удалось загрузить: {template_path}")
@@ -375,70 +477,190 @@ class MacroRunner:
         
         # НЕ масштабируем шаблон, так как PyAutoGUI уже возвращает физическое разрешение
         # Шаблоны должны быть созданы в физическом разрешении (Retina)
+        # Другой монитор или zoom браузера: multiscale=true (см. _search_multiscale)
         
         self.templates[template_path] = template
         print(f"📥 Загружен шаблон: {Path(template_path).name} ({template.shape[1]}x{template.shape[0]})")
         return template
     
-    def _find_all_templates(self, template_path: str, threshold: float = DEFAULT_THRESHOLD) -> list:
-        """Поиск ВСЕХ совпадений шаблона на экране"""
+    def _find_all_templates(self, template_path: str, threshold: float = DEFAULT_THRESHOLD,
+                            gray: Optional['np.ndarray'] = None,
+                            options: Optional[SearchOptions] = None) -> list:
+        """
+        Поиск ВСЕХ совпадений шаблона на экране
+        
+        Args:
+            template_path: Путь к шаблону
+            threshold: Порог совпадения
+            gray: Кадр (по умолчанию общий кадр текущего тика)
+            options: Параметры поиска шага (region, ROI, match_mode, multiscale)
+        """
+        options = options or SearchOptions()
+        
         template = self._load_template(template_path)
         if template is None:
             return []
         
-        # Ленивая загрузка библиотек
-        np_lib = _lazy_import_numpy()
-        cv2_lib = _lazy_import_cv2()
+        # Общий кадр текущего тика (захват только если кадр устарел)
+        if gray is None:
+            gray = self.frame_cache.get_gray()
         
-        # Захват экрана
-        screenshot = pyautogui.screenshot()
-        frame = np_lib.array(screenshot)
-        frame = cv2_lib.cvtColor(frame, cv2_lib.COLOR_RGB2BGR)
-        gray = cv2_lib.cvtColor(frame, cv2_lib.COLOR_BGR2GRAY)
+        if options.multiscale:
+            return self._search_multiscale(template_path, template, threshold, gray, options)
+        return self._search_template(template_path, template, threshold, gray, options)
+    
+    def _search_multiscale(self, template_path: str, template: 'np.ndarray', threshold: float,
+                           gray: 'np.ndarray', options: SearchOptions) -> list:
+        """
+        Поиск шаблона в нескольких масштабах вокруг display_scale
         
-        # Template matching
-        res = cv2_lib.matchTemplate(gray, template, cv2_lib.TM_CCOEFF_NORMED)
+        Сначала пробуется запомненный масштаб, перебор всех масштабов -
+        только при промахе. Победивший масштаб запоминается.
+        """
+        known_scale = self.scale_cache.get(template_path, self.display_scale)
+        if known_scale is not None:
+            matches = self._search_template(template_path, self._scaled_template(template_path, template, known_scale),
+                                            threshold, gray, options)
+            if matches:
+                return matches
+        
+        best_matches = []
+        best_scale = None
+        for scale in candidate_scales(self.display_scale):
+            if scale == known_scale:
+                continue
+            scaled = self._scaled_template(template_path, template, scale)
+            if scaled.shape[0] > gray.shape[0] or scaled.shape[1] > gray.shape[1]:
+                continue
+            
+            matches = self._search_template(template_path, scaled, threshold, gray, options)
+            if matches and (not best_matches or matches[0]['score'] > best_matches[0]['score']):
+                best_matches = matches
+                best_scale = scale
+        
+        if best_scale is not None and best_scale != known_scale:
+            print(f"📐 Масштаб шаблона {Path(template_path).name}: {best_scale}x")
+            self.scale_cache.remember(template_path, self.display_scale, best_scale)
+        
+        return best_matches
+    
+    def _scaled_template(self, template_path: str, template: 'np.ndarray', scale: float) -> 'np.ndarray':
+        """Шаблон в заданном масштабе (с кэшированием)"""
+        if scale == 1.0:
+            return template
+        key = (template_path, scale)
+        if key not in self._scaled_templates:
+            self._scaled_templates[key] = resize_image(template, scale)
+        return self._scaled_templates[key]
+    
+    def _search_template(self, template_path: str, template: 'np.ndarray', threshold: float,
+                         gray: 'np.ndarray', options: SearchOptions) -> list:
+        """Поиск готового шаблона в окнах кадра: region шага, либо ROI → весь кадр"""
+        region = options.region
+        h, w = template.shape[:2]
+        
+        # Окна поиска: region шага, либо ROI → весь кадр
+        if region is not None:
+            windows = [region_to_window(region, self.display_scale, gray.shape)]
+        elif options.use_roi:
+            windows = self.roi_tracker.search_windows(template_path, self.display_scale, gray.shape, (w, h))
+        else:
+            windows = [full_window(gray.shape)]
         
-        # Найти ВСЕ совпадения выше threshold
-        locations = np_lib.where(res >= threshold)
-        matches = []
+        levels = self._template_levels(template_path, template) if options.match_mode == MATCH_MODE_PYRAMID else None
         
-        h, w = template.shape
+        for i, (x0, y0, x1, y1) in enumerate(windows):
+            if x1 - x0 < w or y1 - y0 < h:
+                continue
+            
+            is_roi = region is None and len(windows) > 1 and i == 0
+            if region is None and not is_roi:
+                self.roi_tracker.stats['full_scans'] += 1
+            
+            # Template matching (только внутри окна)
+            matches = self._match_in_window(gray[y0:y1, x0:x1], template, threshold, options,
+                                            offset=(x0, y0), levels=levels)
+            
+            if matches:
+                if is_roi:
+                    self.roi_tracker.stats['roi_hits'] += 1
+                if region is None:
+                    self.roi_tracker.record_hit(template_path, self.display_scale,
+                                                [m['top_left'] for m in matches], (w, h))
+                return matches
+            
+            if is_roi:
+                self.roi_tracker.stats['roi_misses'] += 1
         
-        for pt in zip(*locations[::-1]):  # Switch x and y
-            score = res[pt[1], pt[0]]
+        return []
+    
+    def _template_levels(self, template_path: str, template: 'np.ndarray') -> Optional[dict]:
+        """Готовые уровни пирамиды из хранилища (только для исходного grayscale шаблона)"""
+        if not USE_GRAYSCALE or template is not self.templates.get(template_path):
+            return None
+        try:
+            return self.template_store.levels(template_path)
+        except Exception:
+            return None
+    
+    def _match_in_window(self, image: 'np.ndarray', template: 'np.ndarray', threshold: float,
+                         options: SearchOptions, offset: Tuple[int, int] = (0, 0),
+                         levels: Optional[dict] = None) -> list:
+        """Совпадения шаблона внутри окна кадра (без дубликатов)"""
+        h, w = template.shape[:2]
+        
+        # Дубликаты: ближе 20px в логических координатах
+        min_distance = max(1, int(round(DUPLICATE_DISTANCE * self.display_scale)))
+        
+        peaks = None
+        if options.match_mode == MATCH_MODE_PYRAMID:
+            # None - шаблон слишком мал для пирамиды, ищем обычным способом
+            peaks = pyramid_match(image, template, threshold, min_distance, top_k=options.max_matches,
+                                  template_levels=levels)
+        
+        if peaks is None:
+            # Большой кадр - полосами в пуле потоков (карта та же, что у одного matchTemplate)
+            res = tiled_match_template(image, template, self.match_pool, options.workers)
+            peaks = extract_peaks(res, threshold, min_distance, top_k=options.max_matches)
+        
+        return self._peaks_to_matches(peaks, w, h, offset)
+    
+    def _peaks_to_matches(self, peaks: list, w: int, h: int, offset: Tuple[int, int] = (0, 0)) -> list:
+        """Пики (x, y, score) окна → совпадения с координатами для клика"""
+        off_x, off_y = offset
+        
+        matches = []
+        for x, y, score in peaks:
+            top_left = (x + off_x, y + off_y)
             
             # Координаты центра в физическом разрешении
             # Делим на scale для pyautogui.click() (который работает в логическом разрешении)
-            center_x = int((pt[0] + w / 2) / self.display_scale)
-            center_y = int((pt[1] + h / 2) / self.display_scale)
+            center_x = int((top_left[0] + w / 2) / self.display_scale)
+            center_y = int((top_left[1] + h / 2) / self.display_scale)
             
             matches.append({
                 'coords': (center_x, center_y),
-                'score': float(score),
-                'top_left': pt
+                'score': score,
+                'top_left': top_left
             })
         
-        # Сортировать по score (лучшие первые)
-        matches.sort(key=lambda x: x['score'], reverse=True)
-        
-        # Убрать дубликаты (близкие координаты)
-        filtered_matches = []
-        for match in matches:
-            is_duplicate = False
-            for existing in filtered_matches:
-                dx = abs(match['coords'][0] - existing['coords'][0])
-                dy = abs(match['coords'][1] - existing['coords'][1])
-                if dx < 20 and dy < 20:  # Если ближе 20px - дубликат
-                    is_duplicate = True
-                    break
-            if not is_duplicate:
-                filtered_matches.append(match)
-        
-        return filtered_matches
-    
-    def _find_template(self, template_path: str, threshold: float = DEFAULT_THRESHOLD, index: int = 0) -> Tuple[bool, Optional[Tuple[int, int]], float]:
+        return matches
+    
+    def _find_template(self, template_path: str, threshold: float = DEFAULT_THRESHOLD, index: int = 0,
+                       gray: Optional['np.ndarray'] = None) -> Tuple[bool, Optional[Tuple[int, int]], float]:
         """Поиск шаблона на экране (с поддержкой выбора конкретного совпадения)"""
+        # Найти все совпадения
+        matches = self._find_all_templates(template_path, threshold, gray=gray)
+        
+        if not matches:
+            return False, None, 0.0
+        
+        # Выбрать нужное совпадение по индексу
+        match = self._pick_match(matches, index)
+        return True, match['coords'], match['score']
+    
+    def _pick_match(self, matches: list, index: int = 0) -> dict:
+        """Выбор совпадения по индексу (первое, если индекс вне диапазона)"""
         # Конвертировать index в int если это строка
         if isinstance(index, str):
             try:
@@ -446,23 +668,52 @@ class MacroRunner:
             except ValueError:
                 index = 0
         
-        # Найти все совпадения
-        matches = self._find_all_templates(template_path, threshold)
-        
-        if not matches:
-            return False, None, 0.0
-        
-        # Выбрать нужное совпадение по индексу
         if index >= len(matches):
             print(f"⚠️  Индекс {index} вне диапазона (найдено {len(matches)} совпадений), используем первое")
             index = 0
         
-        match = matches[index]
-        
         if len(matches) > 1:
             print(f"ℹ️  Найдено {len(matches)} совпадений, выбрано #{index + 1}")
         
-        return True, match['coords'], match['score']
+        return matches[index]
+    
+    def _find_best_template(self, candidates: list, index: int = 0,
+                            options: Optional[SearchOptions] = None,
+                            gray: Optional['np.ndarray'] = None) -> Tuple[bool, Optional[Tuple[int, int]], float, Optional[str]]:
+        """
+        Поиск всех шаблонов-кандидатов на одном кадре
+        
+        Args:
+            candidates: Список TemplateCandidate (у каждого свой threshold)
+            index: Номер совпадения у победившего шаблона
+            options: Параметры поиска шага (region, ROI, match_mode)
+            gray: Кадр (по умолчанию общий кадр текущего тика)
+        
+        Returns:
+            (найдено, координаты, score, путь победившего шаблона)
+        """
+        if gray is None:
+            gray = self.frame_cache.get_gray()
+        
+        options = options or SearchOptions()
+        
+        # Несколько шаблонов - каждый в своем потоке (полосами внутри шаблона уже не делим)
+        parallel = len(candidates) > 1 and self.match_pool.workers > 1 and options.workers != 1
+        candidate_options = replace(options, workers=1) if parallel else options
+        
+        def search(candidate):
+            return candidate, self._find_all_templates(candidate.path, candidate.threshold, gray=gray,
+                                                       options=candidate_options)
+        
+        hits = self.match_pool.map(search, candidates, workers=options.workers if parallel else 1)
+        
+        best = pick_best_hit(hits)
+        if best is None:
+            return False, None, 0.0, None
+        
+        candidate, matches = best
+        match = self._pick_match(matches, index)
+        return True, match['coords'], match['score'], candidate.path
     
     def _find_template_with_cnn(self, template_path: str, threshold: float = 0.8) -> Tuple[bool, Optional[Tuple[int, int]], float]:
         """
@@ -485,13 +736,10 @@ class MacroRunner:
             return self._find_template_old(template_path, threshold=DEFAULT_THRESHOLD)
         
         # Ленивая загрузка библиотек
-        np_lib = _lazy_import_numpy()
         cv2_lib = _lazy_import_cv2()
         
         # Захват экрана
-        screenshot = pyautogui.screenshot()
-        frame = np_lib.array(screenshot)
-        frame = cv2_lib.cvtColor(frame, cv2_lib.COLOR_RGB2BGR)
+        frame = cv2_lib.cvtColor(self.capture.grab_rgb(), cv2_lib.COLOR_RGB2BGR)
         
         # CNN детекция
         try:
@@ -529,11 +777,8 @@ class MacroRunner:
         np_lib = _lazy_import_numpy()
         cv2_lib = _lazy_import_cv2()
         
-        # Захват экрана
-        screenshot = pyautogui.screenshot()
-        frame = np_lib.array(screenshot)
-        frame = cv2_lib.cvtColor(frame, cv2_lib.COLOR_RGB2BGR)
-        gray = cv2_lib.cvtColor(frame, cv2_lib.COLOR_BGR2GRAY)
+        # Общий кадр текущего тика
+        gray = self.frame_cache.get_gray()
         
         # Template matching
         res = cv2_lib.matchTemplate(gray, template, cv2_lib.TM_CCOEFF_NORMED)
@@ -556,7 +801,9 @@ class MacroRunner:
     def _perform_click(self, x: int, y: int, clicks: int = 1, interval: float = 0.1):
         """Выполнение клика"""
         try:
-            pyautogui.click(x, y, clicks=clicks, interval=interval)
+            # Только сам клик под блокировкой ввода - поиск шаблона идет параллельно
+            with self.scheduler.input():
+                pyautogui.click(x, y, clicks=clicks, interval=interval)
             self.stats['total_clicks'] += clicks
             return True
         except Exception as e:
@@ -564,263 +811,363 @@ class MacroRunner:
             return False
     
     def _execute_step(self, step: dict) -> bool:
-        """Выполнение одного шага"""
+        """Выполнение одного шага (обработчик из реестра действий src/core/actions)"""
         action = step.get('action')
         
+        # Предыдущий шаг мог изменить экран - кадр больше не актуален
+        self.frame_cache.invalidate()
+        
         # Проверка флага пропуска (кроме selenium_extract)
-        if action != 'selenium_extract' and self.variables.get('_skip_steps', False):
+        if self.variables.get('_skip_steps', False) and action not in self._unskippable_actions:
             print(f"   ⏭️  Пропущен шаг: {action}")
             return True  # Продолжить, но пропустить
         
-        # REPEAT - повторение вложенных шагов
-        if action == 'repeat':
-            times = step.get('times', 1)
-            
-            # Обработка переменных в times
-            if isinstance(times, str):
-                # Если это строка с переменной типа "{reply_count}"
-                if times.startswith('{') and times.endswith('}'):
-                    var_name = times[1:-1]
-                    times = self.variables.get(var_name, 1)
-                # Или просто строка с числом
-                try:
-                    times = int(times)
-                except (ValueError, TypeError):
-                    print(f"⚠️  Неверное значение times: {times}, используем 1")
-                    times = 1
-            
-            nested_steps = step.get('steps', [])
-            
-            if not nested_steps:
-                print("⚠️  Нет шагов для повторения")
-                return True
-            
-            print(f"🔄 Повторение {times} раз ({len(nested_steps)} шагов)")
-            
-            for iteration in range(times):
-                print(f"\n   ━━━ Итерация {iteration + 1}/{times} ━━━")
-                
-                for i, nested_step in enumerate(nested_steps, 1):
-                    nested_action = nested_step.get('action')
-                    nested_desc = nested_step.get('description', nested_action)
-                    print(f"   📍 {i}. {nested_desc}")
-                    
-                    if not self._execute_step(nested_step):
-                        print(f"   ❌ Шаг {i} не выполнен")
-                        return False
-                
-                # Пауза между итерациями (кроме последней)
-                if iteration < times - 1:
-                    time.sleep(0.5)
-            
-            print(f"\n✅ Повторение завершено ({times} итераций)")
-            return True
-        
-        # CLICK
-        elif action == 'click':
-            clicks = step.get('clicks', 1)
-            interval = step.get('interval', DEFAULT_INTERVAL)
-            
-            # Проверяем тип клика: по шаблону или по координатам
-            if step.get('position') == 'absolute':
-                # Клик по абсолютным координатам (из записи действий)
-                x = int(step.get('x', 0))
-                y = int(step.get('y', 0))
-                print(f"🎯 Клик по координатам: ({x}, {y})")
-                return self._perform_click(x, y, clicks, interval)
-            
-            # Клик по шаблону (template matching)
-            template = step.get('template')
-            templates = step.get('templates')  # Список шаблонов (fallback)
-            
-            # Если указан список шаблонов, попробуем каждый
-            if templates:
-                template_list = templates if isinstance(templates, list) else [templates]
-            elif template:
-                template_list = [template]
-            else:
-                print("❌ Не указан шаблон или координаты для клика")
+        handler = self._actions.get(action)
+        if handler is None:
+            # Плагин мог зарегистрировать действие после создания runner'а
+            self._bind_actions()
+            handler = self._actions.get(action)
+            if handler is None:
+                print(f"❌ Неизвестное действие: {action}")
                 return False
-            
-            # Поддержка выбора конкретного совпадения
-            index = step.get('index', 0)
-            
-            # Поддержка wait_for_appear и timeout
-            wait_for_appear = step.get('wait_for_appear', False)
-            timeout = step.get('timeout', 5.0)
-            
-            # Поддержка custom threshold
-            threshold = step.get('threshold', DEFAULT_THRESHOLD)
-            
-            # По умолчанию всегда ждем 10 секунд перед ошибкой
-            default_retry_timeout = 10.0
-            
-            found = False
-            coords = None
-            score = 0.0
-            used_template = None
-            
-            # Попробовать каждый шаблон из списка
-            for tmpl in template_list:
-                if wait_for_appear:
-                    print(f"⏳ Ожидание появления шаблона (timeout: {timeout}с, threshold: {threshold})...")
-                    start_time = time.time()
-                    
-                    while time.time() - start_time < timeout:
-                        found, coords, score = self._find_template(tmpl, threshold=threshold, index=index)
-                        if found:
-                            used_template = tmpl
-                            break
-                        time.sleep(0.5)
-                    
-                    if found:
-                        break
-                else:
-                    # Повторяем поиск в течение 10 секунд
-                    print(f"🔍 Поиск шаблона (макс. {default_retry_timeout}с, threshold: {threshold})...")
-                    start_time = time.time()
-                    
-                    while time.time() - start_time < default_retry_timeout:
-                        found, coords, score = self._find_template(tmpl, threshold=threshold, index=index)
-                        if found:
-                            used_template = tmpl
-                            break
-                        time.sleep(0.5)
-                    
-                    if found:
-                        break
-            
-            if not found:
-                if len(template_list) > 1:
-                    print(f"❌ Ни один из {len(template_list)} шаблонов не найден")
-                else:
-                    print(f"❌ Шаблон не найден: {template_list[0]} (score: {score:.3f})")
+        
+        # Ресурсы шага (ввод, драйвер, сеть) заняты только на время обработчика
+        resources = step_resources(step)
+        if resources:
+            handler = self.scheduler.wrap(handler, resources, lambda: self.driver)
+        
+        retry = step.get('retry')
+        if retry is not None:
+            return self._execute_with_retry(handler, step, retry)
+        return handler(step)
+    
+    def _execute_with_retry(self, handler, step: dict, retry) -> bool:
+        """Шаг с политикой повтора (src/core/retry_policy)"""
+        try:
+            policy = RetryPolicy.from_value(retry, self.config.get('settings'))
+        except ValueError as e:
+            print(f"⚠️  {e}, шаг выполняется без повтора")
+            return handler(step)
+        
+        def attempt(remaining):
+            # Вложенный retry не продлевает срок внешнего
+            outer = self._step_deadline
+            if remaining is not None:
+                deadline = time.monotonic() + max(0.0, remaining)
+                self._step_deadline = deadline if outer is None else min(outer, deadline)
+            try:
+                return handler(step)
+            except MacroAborted:
+                raise
+            except Exception as e:
+                print(f"❌ Ошибка шага: {e}")
                 return False
-            
-            x, y = coords
-            print(f"✅ Найдено! ({x}, {y}) score: {score:.3f}")
-            return self._perform_click(x, y, clicks, interval)
+            finally:
+                self._step_deadline = outer
+        
+        def on_retry(number, delay):
+            pause = f" через {delay:.2f}с" if delay > 0 else ""
+            print(f"🔁 Повтор {number}/{policy.attempts}{pause}: {step.get('description', step.get('action'))}")
         
-        # WAIT
-        elif action == 'wait':
-            duration = self._resolve_variable(step.get('duration', 1.0))
-            duration = float(duration)
-            print(f"⏸️  Пауза {duration}с")
-            time.sleep(duration)
+        return policy.run(attempt, on_retry=on_retry)
+    
+    def _bind_actions(self):
+        """Обработчики реестра, связанные с этим runner'ом"""
+        self._actions = bind_actions(self)
+        self._unskippable_actions = unskippable_actions()
+    
+    # ==================== ДЕЙСТВИЯ ====================
+    
+    @register_action('repeat', normalize=normalize_repeat)
+    def _action_repeat(self, step: dict) -> bool:
+        """REPEAT - повторение вложенных шагов"""
+        times = step.get('times', 1)
+        
+        # Обработка переменных в times (числа приведены normalize_repeat заранее)
+        if not isinstance(times, int):
+            # Если это строка с переменной типа "{reply_count}"
+            if isinstance(times, str) and times.startswith('{') and times.endswith('}'):
+                var_name = times[1:-1]
+                times = self.variables.get(var_name, 1)
+            # Или просто строка с числом
+            try:
+                times = int(times)
+            except (ValueError, TypeError):
+                print(f"⚠️  Неверное значение times: {times}, используем 1")
+                times = 1
+        
+        nested_steps = step.get('steps', [])
+        
+        if not nested_steps:
+            print("⚠️  Нет шагов для повторения")
             return True
         
-        # TYPE
-        elif action == 'type':
-            text = step.get('text', '')
-            
-            # Подставить переменные
-            text = text.format(**self.variables)
-            
-            # Проверка на кириллицу
-            has_cyrillic = any('\u0400' <= char <= '\u04FF' for char in text)
+        print(f"🔄 Повторение {times} раз ({len(nested_steps)} шагов)")
+        
+        # Подписи шагов и обработчик - один раз на весь цикл, не на итерацию
+        labels = [f"   📍 {i}. {nested.get('description', nested.get('action'))}"
+                  for i, nested in enumerate(nested_steps, 1)]
+        execute = self._execute_step
+        
+        for iteration in range(times):
+            print(f"\n   ━━━ Итерация {iteration + 1}/{times} ━━━")
             
-            if has_cyrillic:
-                pyperclip.copy(text)
-                pyautogui.hotkey('command', 'v')
-            else:
-                pyautogui.write(text, interval=0.05)
+            for i, nested_step in enumerate(nested_steps):
+                print(labels[i])
+                
+                if not execute(nested_step):
+                    print(f"   ❌ Шаг {i + 1} не выполнен")
+                    return False
             
-            print(f"⌨️  Введено: {text}")
-            return True
+            # Пауза между итерациями (кроме последней)
+            if iteration < times - 1:
+                time.sleep(0.5)
         
-        # KEY
-        elif action == 'key':
-            key = step.get('key')
-            pyautogui.press(key)
-            print(f"🔘 Нажата клавиша: {key}")
+        print(f"\n✅ Повторение завершено ({times} итераций)")
+        return True
+    
+    @register_action('try')
+    def _action_try(self, step: dict) -> bool:
+        """TRY - шаги try_steps, при неудаче или исключении - catch_steps"""
+        try_steps = step.get('try_steps', [])
+        catch_steps = step.get('catch_steps', [])
+        
+        print(f"🛡️  try: {len(try_steps)} шагов")
+        error = self._run_block(try_steps)
+        if error is None:
             return True
         
-        # HOTKEY
-        elif action == 'hotkey':
-            keys = step.get('keys', [])
-            pyautogui.hotkey(*keys)
-            print(f"🎹 Комбинация: {'+'.join(keys)}")
+        self.execution_state.setdefault('caught_errors', []).append(error)
+        if not catch_steps:
+            print(f"⚠️  try: {error} (без catch - продолжаем)")
             return True
         
-        # SCROLL
-        elif action == 'scroll':
-            direction = step.get('direction', 'down')
-            amount = step.get('amount', 5)
-            clicks = step.get('clicks', 1)
-            
-            # Проверяем координаты для скролла
-            x = step.get('x')
-            y = step.get('y')
-            
-            # Если координаты не указаны - используем центр экрана
-            if x is None or y is None:
-                screen_size = pyautogui.size()
-                x = screen_size.width // 2
-                y = screen_size.height // 2
-                print(f"📍 Скролл в центре экрана: ({x}, {y})")
-            else:
-                print(f"📍 Скролл в позиции: ({x}, {y})")
-            
-            # Перемещаем курсор в нужную позицию
-            pyautogui.moveTo(x, y, duration=0.2)
-            
-            # На macOS логика инвертирована:
-            # положительное значение = скролл вверх
-            # отрицательное значение = скролл вниз
-            # На Windows/Linux - наоборот
-            import platform
-            is_macos = platform.system() == 'Darwin'
-            
-            # Инвертируем для macOS
-            if is_macos:
-                scroll_amount = -amount if direction == 'down' else amount
-            else:
-                scroll_amount = amount if direction == 'down' else -amount
-            
-            # Выполняем скролл нужное количество раз
-            for i in range(clicks):
-                pyautogui.scroll(scroll_amount)
-                if clicks > 1 and i < clicks - 1:
-                    time.sleep(0.3)
-            
-            emoji = "⬇️" if direction == 'down' else "⬆️"
-            print(f"🖱️  Скролл {emoji} {direction}: {abs(scroll_amount)} x{clicks}")
-            return True
+        print(f"⚠️  try: {error} → catch ({len(catch_steps)} шагов)")
+        catch_error = self._run_block(catch_steps)
+        if catch_error is not None:
+            print(f"❌ catch: {catch_error}")
+            return False
+        return True
+    
+    def _run_block(self, steps: list) -> Optional[str]:
+        """
+        Выполнение блока шагов до первой неудачи
+        
+        Returns:
+            None если все шаги выполнены, иначе описание ошибки
+            (MacroAborted не перехватывается - abort прекращает макрос)
+        """
+        execute = self._execute_step
+        for i, nested_step in enumerate(steps, 1):
+            desc = nested_step.get('description', nested_step.get('action'))
+            print(f"   📍 {i}. {desc}")
+            try:
+                if not execute(nested_step):
+                    return f"шаг {i} не выполнен ({desc})"
+            except MacroAborted:
+                raise
+            except Exception as e:
+                return f"шаг {i}: {e} ({desc})"
+        return None
+    
+    @register_action('log')
+    def _action_log(self, step: dict) -> bool:
+        """LOG - сообщение в лог выполнения ({переменные} подставляются)"""
+        message = str(step.get('message', ''))
+        try:
+            message = message.format(**self.variables)
+        except (KeyError, IndexError, ValueError):
+            pass
+        print(f"📝 {message}")
+        self.execution_state.setdefault('log', []).append(message)
+        return True
+    
+    @register_action('abort')
+    def _action_abort(self, step: dict) -> bool:
+        """ABORT - прервать выполнение макроса (не перехватывается catch)"""
+        raise MacroAborted(step.get('message') or 'abort')
+    
+    @register_action('click', normalize=normalize_click)
+    def _action_click(self, step: dict) -> bool:
+        """CLICK - по координатам или по шаблону (template matching)"""
+        clicks = step.get('clicks', 1)
+        interval = step.get('interval', DEFAULT_INTERVAL)
+        
+        # Проверяем тип клика: по шаблону или по координатам
+        if step.get('position') == 'absolute':
+            # Клик по абсолютным координатам (из записи действий)
+            x = int(step.get('x', 0))
+            y = int(step.get('y', 0))
+            print(f"🎯 Клик по координатам: ({x}, {y})")
+            return self._perform_click(x, y, clicks, interval)
+        
+        # Клик по шаблону (template matching)
+        # Список шаблонов (fallback) проверяется целиком на каждом кадре
+        candidates = parse_template_candidates(step, DEFAULT_THRESHOLD)
+        if not candidates:
+            print("❌ Не указан шаблон или координаты для клика")
+            return False
         
-        # SELENIUM ACTIONS
-        elif action == 'selenium_init':
-            return self._selenium_init(step)
-        elif action == 'selenium_connect':
-            return self._selenium_connect(step)
-        elif action == 'selenium_navigate':
-            return self._selenium_navigate(step)
-        elif action == 'selenium_find':
-            return self._selenium_find(step)
-        elif action == 'selenium_extract':
-            return self._selenium_extract(step)
-        elif action == 'selenium_get_coordinates':
-            return self._selenium_get_coordinates(step)
-        elif action == 'selenium_click':
-            return self._selenium_click(step)
-        elif action == 'selenium_type':
-            return self._selenium_type(step)
-        elif action == 'selenium_scroll':
-            return self._selenium_scroll(step)
-        elif action == 'selenium_close':
-            return self._selenium_close(step)
-        
-        # AI ACTIONS
-        elif action == 'ai_extract_text':
-            return self._ai_extract_text(step)
-        elif action == 'ai_generate':
-            return self._ai_generate(step)
+        # Поддержка выбора конкретного совпадения
+        index = step.get('index', 0)
         
+        # Поддержка wait_for_appear и timeout
+        wait_for_appear = step.get('wait_for_appear', False)
+        timeout = step.get('timeout', 5.0)
+        
+        # Параметры поиска: region шага / ROI по последним позициям, match_mode
+        options = SearchOptions.from_step(step, self.config.get('settings'))
+        if options.region:
+            print(f"   🔲 Область поиска: {options.region}")
+        if options.match_mode != MATCH_MODE_FULL:
+            print(f"   🔺 Режим поиска: {options.match_mode}")
+        if options.multiscale:
+            print(f"   📐 Поиск в нескольких масштабах")
+        
+        # По умолчанию всегда ждем 10 секунд перед ошибкой
+        default_retry_timeout = 10.0
+        poll_timeout = self._clamp_wait(timeout if wait_for_appear else default_retry_timeout)
+        
+        thresholds = ', '.join(f"{c.threshold}" for c in candidates)
+        if wait_for_appear:
+            print(f"⏳ Ожидание появления шаблона (timeout: {timeout}с, threshold: {thresholds})...")
         else:
-            print(f"❌ Неизвестное действие: {action}")
+            print(f"🔍 Поиск шаблона (макс. {default_retry_timeout}с, threshold: {thresholds})...")
+        if len(candidates) > 1:
+            print(f"   🗂️  Кандидатов: {len(candidates)} (один проход на кадр)")
+        
+        def grab_frame():
+            # Новый тик опроса - один кадр на все шаблоны
+            self.frame_cache.invalidate()
+            return self.frame_cache.get_gray()
+        
+        # Полный поиск только когда область поиска изменилась (region шага,
+        # либо окно последних позиций шаблонов), интервал опроса адаптивный
+        change_window = None
+        if options.region:
+            change_window = lambda shape: region_to_window(options.region, self.display_scale, shape)
+        elif options.use_roi:
+            paths = [c.path for c in candidates]
+            change_window = lambda shape: self.roi_tracker.watch_window(paths, self.display_scale, shape)
+        
+        (found, coords, score, used_template), wait_stats = wait_for_match(
+            lambda gray: self._find_best_template(candidates, index=index, options=options, gray=gray),
+            grab_frame,
+            poll_timeout,
+            policy=WaitPolicy.from_step(step, self.config.get('settings')),
+            window=change_window,
+        )
+        if wait_stats['skipped'] and not FAST_MODE:
+            print(f"   ⏱️  Кадров: {wait_stats['samples']}, поисков: {wait_stats['matches']}")
+        
+        if not found:
+            if len(candidates) > 1:
+                print(f"❌ Ни один из {len(candidates)} шаблонов не найден")
+            else:
+                print(f"❌ Шаблон не найден: {candidates[0].path} (score: {score:.3f})")
             return False
+        
+        if len(candidates) > 1:
+            print(f"   🏆 Лучший шаблон: {Path(used_template).name}")
+        
+        x, y = coords
+        print(f"✅ Найдено! ({x}, {y}) score: {score:.3f}")
+        return self._perform_click(x, y, clicks, interval)
+    
+    @register_action('wait', normalize=normalize_wait)
+    def _action_wait(self, step: dict) -> bool:
+        """WAIT - пауза"""
+        duration = self._resolve_variable(step.get('duration', 1.0))
+        duration = self._clamp_wait(float(duration))
+        print(f"⏸️  Пауза {duration}с")
+        time.sleep(duration)
+        return True
+    
+    @register_action('type', resources={RESOURCE_INPUT})
+    def _action_type(self, step: dict) -> bool:
+        """TYPE - ввод текста"""
+        text = step.get('text', '')
+        
+        # Подставить переменные
+        text = text.format(**self.variables)
+        
+        # Проверка на кириллицу
+        has_cyrillic = any('\u0400' <= char <= '\u04FF' for char in text)
+        
+        if has_cyrillic:
+            pyperclip.copy(text)
+            pyautogui.hotkey('command', 'v')
+        else:
+            pyautogui.write(text, interval=0.05)
+        
+        print(f"⌨️  Введено: {text}")
+        return True
+    
+    @register_action('key', normalize=normalize_key, resources={RESOURCE_INPUT})
+    def _action_key(self, step: dict) -> bool:
+        """KEY - нажатие клавиши"""
+        key = step.get('key')
+        pyautogui.press(key)
+        print(f"🔘 Нажата клавиша: {key}")
+        return True
+    
+    @register_action('hotkey', normalize=normalize_hotkey, resources={RESOURCE_INPUT})
+    def _action_hotkey(self, step: dict) -> bool:
+        """HOTKEY - комбинация клавиш"""
+        keys = step.get('keys', [])
+        pyautogui.hotkey(*keys)
+        print(f"🎹 Комбинация: {'+'.join(keys)}")
+        return True
+    
+    @register_action('scroll', normalize=normalize_scroll, resources={RESOURCE_INPUT})
+    def _action_scroll(self, step: dict) -> bool:
+        """SCROLL - скролл колесом мыши"""
+        direction = step.get('direction', 'down')
+        amount = step.get('amount', 5)
+        clicks = step.get('clicks', 1)
+        
+        # Проверяем координаты для скролла
+        x = step.get('x')
+        y = step.get('y')
+        
+        # Если координаты не указаны - используем центр экрана
+        if x is None or y is None:
+            screen_size = pyautogui.size()
+            x = screen_size.width // 2
+            y = screen_size.height // 2
+            print(f"📍 Скролл в центре экрана: ({x}, {y})")
+        else:
+            print(f"📍 Скролл в позиции: ({x}, {y})")
+        
+        # Перемещаем курсор в нужную позицию
+        pyautogui.moveTo(x, y, duration=0.2)
+        
+        # На macOS логика инвертирована:
+        # положительное значение = скролл вверх
+        # отрицательное значение = скролл вниз
+        # На Windows/Linux - наоборот
+        import platform
+        is_macos = platform.system() == 'Darwin'
+        
+        # Инвертируем для macOS
+        if is_macos:
+            scroll_amount = -amount if direction == 'down' else amount
+        else:
+            scroll_amount = amount if direction == 'down' else -amount
+        
+        # Выполняем скролл нужное количество раз
+        for i in range(clicks):
+            pyautogui.scroll(scroll_amount)
+            if clicks > 1 and i < clicks - 1:
+                time.sleep(0.3)
+        
+        emoji = "⬇️" if direction == 'down' else "⬆️"
+        print(f"🖱️  Скролл {emoji} {direction}: {abs(scroll_amount)} x{clicks}")
+        return True
     
     # ==================== SELENIUM МЕТОДЫ ====================
     
+    @register_action('selenium_init', resources={RESOURCE_DOM})
     def _selenium_init(self, step: dict) -> bool:
         """Инициализация Selenium WebDriver"""
         if not SELENIUM_AVAILABLE:
@@ -830,25 +1177,22 @@ class MacroRunner:
         browser = step.get('browser', 'chrome')
         headless = step.get('headless', False)
         url = step.get('url')
+        lease_timeout = float(step.get('lease_timeout', LEASE_TIMEOUT))  # Ожидание занятой сессии
+        
+        if self.external_driver and self.driver:
+            print("🌐 Используется драйвер экземпляра")
+            if url:
+                print(f"📍 Переход на: {url}")
+                self.driver.get(url)
+            return True
         
         try:
             print(f"🌐 Запуск {browser} (headless={headless})...")
             
             if browser == 'chrome':
-                options = webdriver.ChromeOptions()
-                
-                # Путь к Chrome на macOS
-                chrome_path = "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome"
-                if os.path.exists(chrome_path):
-                    options.binary_location = chrome_path
-                
-                if headless:
-                    options.add_argument('--headless')
-                options.add_argument('--no-sandbox')
-                options.add_argument('--disable-dev-shm-usage')
-                
-                service = Service(ChromeDriverManager().install())
-                self.driver = webdriver.Chrome(service=service, options=options)
+                # Сессия из пула: свободный Chrome этого процесса или новый (занятый не ждем)
+                self._release_driver()
+                self.driver = get_driver_pool().launch(headless=headless, timeout=lease_timeout)
             
             if url:
                 print(f"📍 Переход на: {url}")
@@ -861,6 +1205,7 @@ class MacroRunner:
             print(f"❌ Ошибка Selenium: {e}")
             return False
     
+    @register_action('selenium_connect', resources={RESOURCE_DOM})
     def _selenium_connect(self, step: dict) -> bool:
         """Подключение к существующему браузеру через remote debugging"""
         if not SELENIUM_AVAILABLE:
@@ -869,25 +1214,19 @@ class MacroRunner:
         
         browser = step.get('browser', 'chrome')
         debugger_address = step.get('debugger_address', '127.0.0.1:9222')
+        lease_timeout = float(step.get('lease_timeout', LEASE_TIMEOUT))  # Ожидание занятой сессии
+        
+        if self.external_driver and self.driver:
+            print("🔗 Используется драйвер экземпляра (уже подключен)")
+            return True
         
         try:
             print(f"🔗 Подключение к {browser} на {debugger_address}...")
             
             if browser == 'chrome':
-                options = webdriver.ChromeOptions()
-                options.add_experimental_option("debuggerAddress", debugger_address)
-                
-                # Попробовать использовать уже скачанный ChromeDriver
-                chromedriver_path = "/tmp/chromedriver_temp/chromedriver-mac-arm64/chromedriver"
-                
-                if os.path.exists(chromedriver_path):
-                    print(f"   ✅ Используем скачанный ChromeDriver: {chromedriver_path}")
-                    service = Service(chromedriver_path)
-                else:
-                    print(f"   ⚠️  Скачиваем ChromeDriver через webdriver-manager...")
-                    service = Service(ChromeDriverManager().install())
-                
-                self.driver = webdriver.Chrome(service=service, options=options)
+                # Сессия из пула: повторное подключение к тому же Chrome - без нового chromedriver
+                self._release_driver()
+                self.driver = get_driver_pool().attach(debugger_address, timeout=lease_timeout)
             
             # Переключаемся на последнюю вкладку (обычно активную)
             try:
@@ -907,6 +1246,7 @@ class MacroRunner:
             print("💡 Или запусти: python3 tests/test_selenium_alt.py (скачает правильный ChromeDriver)")
             return False
     
+    @register_action('selenium_navigate', resources={RESOURCE_DOM})
     def _selenium_navigate(self, step: dict) -> bool:
         """Навигация на URL"""
         if not self.driver:
@@ -926,6 +1266,7 @@ class MacroRunner:
             print(f"❌ Ошибка навигации: {e}")
             return False
     
+    @register_action('selenium_find', resources={RESOURCE_DOM})
     def _selenium_find(self, step: dict) -> bool:
         """Поиск элемента через Selenium"""
         if not self.driver:
@@ -940,6 +1281,7 @@ class MacroRunner:
         
         try:
             if wait_for_element:
+                timeout = self._clamp_wait(timeout)
                 print(f"⏳ Ожидание элемента (timeout: {timeout}с)...")
                 wait = WebDriverWait(self.driver, timeout)
                 element = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, selector)))
@@ -961,6 +1303,7 @@ class MacroRunner:
             print(f"❌ Ошибка поиска: {e}")
             return False
     
+    @register_action('selenium_extract', skippable=False, resources={RESOURCE_DOM})
     def _selenium_extract(self, step: dict) -> bool:
         """Извлечение текста элемента через Selenium"""
         if not self.driver:
@@ -969,7 +1312,7 @@ class MacroRunner:
         
         selector = step.get('selector')
         index = step.get('index', 0)
-
+        
         # Конвертировать index в int если это строка
         if isinstance(index, str):
             try:
@@ -987,30 +1330,40 @@ class MacroRunner:
         max_attempts = step.get('max_attempts', 10)  # Максимум попыток
         extract_all = step.get('extract_all', False)  # Извлечь все элементы
         save_all_to = step.get('save_all_to')  # Сохранить все в список
+        save_elements_to = step.get('save_elements_to')  # extract_all: текст, атрибуты, координаты
+        attributes = parse_attributes(step.get('attributes'))  # Атрибуты для save_elements_to
+        batch = step.get('batch', True)  # Все элементы одним execute_script
         
         try:
             if wait_for_element:
+                timeout = self._clamp_wait(timeout)
                 print(f"⏳ Ожидание элемента (timeout: {timeout}с)...")
                 wait = WebDriverWait(self.driver, timeout)
                 wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, selector)))
             
-            elements = self.driver.find_elements(By.CSS_SELECTOR, selector)
-            if not elements:
+            # Один запрос на все элементы, при ошибке скрипта - по запросу на элемент
+            items = self._extract_batch(selector, attributes) if batch else None
+            if items is not None:
+                texts = [item['text'] for item in items]
+            else:
+                texts = ElementTexts(self.driver.find_elements(By.CSS_SELECTOR, selector))
+            if not texts:
                 print(f"❌ Элемент не найден: {selector}")
                 return False
             
-            print(f"📊 Найдено элементов: {len(elements)}")
+            print(f"📊 Найдено элементов: {len(texts)}")
             
             # Если extract_all=True, извлечь все элементы
             if extract_all:
-                all_texts = []
-                for elem in elements:
-                    text = elem.text.strip()
-                    if text and len(text) > 5:
-                        all_texts.append(text)
+                indices = [i for i, text in enumerate(texts) if is_meaningful(text.strip())]
+                all_texts = [texts[i].strip() for i in indices]
                 
                 if save_all_to:
                     self.variables[save_all_to] = all_texts
+                if save_elements_to:
+                    self.variables[save_elements_to] = (
+                        [items[i] for i in indices] if items is not None
+                        else [{'index': i, 'text': texts[i].strip()} for i in indices])
                 
                 print(f"✅ Selenium: извлечено {len(all_texts)} элементов")
                 for i, text in enumerate(all_texts[:5]):
@@ -1027,18 +1380,14 @@ class MacroRunner:
                 attempts = 0
                 
                 while attempts < max_attempts:
-                    if index >= len(elements):
-                        print(f"⚠️  Достигнут конец списка (всего {len(elements)} элементов)")
+                    if index >= len(texts):
+                        print(f"⚠️  Достигнут конец списка (всего {len(texts)} элементов)")
                         return False
                     
-                    element = elements[index]
-                    text = element.text.strip()
+                    text = texts[index].strip()
                     
                     # Фильтруем служебные тексты
-                    skip_words = ["Комментарии", "Ответить", "Нравится", "Добавить", "Показать", "Просмотреть"]
-                    is_service_text = any(word in text for word in skip_words)
-                    
-                    if text and len(text) > 5 and not is_service_text:
+                    if is_meaningful(text) and not is_service_text(text):
                         # Нашли комментарий с текстом!
                         if index != original_index:
                             print(f"⏭️  Пропущено комментариев: {index - original_index}")
@@ -1066,12 +1415,11 @@ class MacroRunner:
             
             else:
                 # Обычный режим (без пропуска пустых)
-                if index >= len(elements):
-                    print(f"⚠️  Индекс {index} вне диапазона (найдено {len(elements)} элементов)")
+                if index >= len(texts):
+                    print(f"⚠️  Индекс {index} вне диапазона (найдено {len(texts)} элементов)")
                     index = 0
                 
-                element = elements[index]
-                text = element.text
+                text = texts[index]
                 
                 if text and save_to:
                     # Проверка на совпадение с предыдущим
@@ -1082,7 +1430,7 @@ class MacroRunner:
                             print(f"⏸️  Пауза 10 секунд перед следующей проверкой...")
                             # Установить флаг для пропуска остальных шагов
                             self.variables['_skip_steps'] = True
-                            time.sleep(10)
+                            time.sleep(self._clamp_wait(10))
                             return True  # Продолжить цикл, но пропустить шаги
                         else:
                             print(f"✅ Новое сообщение обнаружено!")
@@ -1107,6 +1455,15 @@ class MacroRunner:
             print(f"❌ Ошибка извлечения: {e}")
             return False
     
+    def _extract_batch(self, selector: str, attributes: list) -> Optional[list]:
+        """Все элементы селектора одним execute_script (None - откат на поэлементное чтение)"""
+        try:
+            return extract_elements(self.driver, selector, attributes)
+        except Exception as e:
+            print(f"   ⚠️  Пакетное извлечение недоступно ({e}), читаем по элементам")
+            return None
+    
+    @register_action('selenium_get_coordinates', resources={RESOURCE_DOM})
     def _selenium_get_coordinates(self, step: dict) -> bool:
         """Получить координаты элемента через Selenium"""
         if not self.driver:
@@ -1169,6 +1526,7 @@ class MacroRunner:
             print(f"❌ Ошибка получения координат: {e}")
             return False
     
+    @register_action('selenium_click', resources=selenium_click_resources)
     def _selenium_click(self, step: dict) -> bool:
         """Клик через Selenium"""
         if not self.driver:
@@ -1323,6 +1681,7 @@ class MacroRunner:
             print(f"❌ Ошибка клика: {e}")
             return False
     
+    @register_action('selenium_type', resources={RESOURCE_DOM})
     def _selenium_type(self, step: dict) -> bool:
         """Ввод текста через Selenium"""
         if not self.driver:
@@ -1357,6 +1716,7 @@ class MacroRunner:
             print(f"❌ Ошибка ввода: {e}")
             return False
     
+    @register_action('selenium_scroll', resources={RESOURCE_DOM})
     def _selenium_scroll(self, step: dict) -> bool:
         """Скролл через Selenium"""
         if not self.driver:
@@ -1378,8 +1738,23 @@ class MacroRunner:
             print(f"❌ Ошибка скролла: {e}")
             return False
     
+    @register_action('selenium_close', resources={RESOURCE_DOM})
     def _selenium_close(self, step: dict) -> bool:
         """Закрыть Selenium"""
+        if self.external_driver:
+            print("ℹ️  Драйвер экземпляра закрывает parallel_runner")
+            return True
+        pool = get_driver_pool()
+        if self.driver and pool.owns(self.driver):
+            if pool.is_attached(self.driver):
+                # Chrome пользователя остается открытым, сессия - для следующего макроса
+                pool.release(self.driver)
+                print("✅ Selenium отключен (сессия возвращена в пул)")
+            else:
+                pool.discard(self.driver)
+                print("✅ Selenium закрыт")
+            self.driver = None
+            return True
         if self.driver:
             try:
                 self.driver.quit()
@@ -1391,8 +1766,18 @@ class MacroRunner:
                 return False
         return True
     
+    def _release_driver(self):
+        """Вернуть сессию пула (src/engines/driver_pool), если runner ее держит"""
+        if self.driver is None or self.external_driver:
+            return
+        pool = get_driver_pool()
+        if pool.owns(self.driver):
+            pool.release(self.driver)
+            self.driver = None
+    
     # ==================== AI МЕТОДЫ ====================
     
+    @register_action('ai_extract_text', resources={RESOURCE_DOM})
     def _ai_extract_text(self, step: dict) -> bool:
         """Извлечение текста (Selenium или OCR)"""
         method = step.get('method', 'selenium')
@@ -1444,28 +1829,19 @@ class MacroRunner:
         preprocess = step.get('preprocess', True)  # Предобработка по умолчанию
         
         try:
-            # Скриншот региона
+            # Скриншот региона (автопоиск текстового блока - упрощенно весь экран)
+            capture_region = None
             if region and region != 'auto':
                 x, y, w, h = region
-                screenshot = pyautogui.screenshot(region=(x, y, w, h))
-            else:
-                # Автопоиск текстового блока (упрощенно - весь экран)
-                screenshot = pyautogui.screenshot()
+                capture_region = (x, y, w, h)
             
             # Ленивая загрузка библиотек
-            np_lib = _lazy_import_numpy()
             cv2_lib = _lazy_import_cv2()
             
-            # Конвертация в numpy array
-            img_array = np_lib.array(screenshot)
-            
             # Предобработка для лучшего распознавания
             if preprocess:
-                # Конвертация в grayscale
-                if len(img_array.shape) == 3:
-                    img_gray = cv2_lib.cvtColor(img_array, cv2_lib.COLOR_RGB2GRAY)
-                else:
-                    img_gray = img_array
+                # Сразу grayscale (одна конвертация из буфера захвата)
+                img_gray = self.capture.grab_gray(capture_region)
                 
                 # Увеличение контраста (CLAHE)
                 clahe = cv2_lib.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
@@ -1476,6 +1852,8 @@ class MacroRunner:
                 
                 # Используем обработанное изображение
                 img_array = img_binary
+            else:
+                img_array = self.capture.grab_rgb(capture_region)
             
             # OCR
             results = self.ocr_reader.readtext(img_array)
@@ -1502,6 +1880,7 @@ class MacroRunner:
             traceback.print_exc()
             return None
     
+    @register_action('ai_generate', resources={RESOURCE_NETWORK})
     def _ai_generate(self, step: dict) -> bool:
         """Генерация ответа через AI"""
         if not AI_AVAILABLE:
@@ -1552,6 +1931,17 @@ class MacroRunner:
     
     def run_sequence(self, sequence_name: str, delay: int = 3):
         """Запуск последовательности"""
+        # Повторный запуск того же runner'а (воркеры) - с начальными переменными
+        if not self._fresh_state:
+            self._reset_run_state()
+        self._fresh_state = False
+        try:
+            return self._run_sequence(sequence_name, delay)
+        finally:
+            # Сессия Selenium - следующему макросу (другой runner может ждать этот Chrome)
+            self._release_driver()
+    
+    def _run_sequence(self, sequence_name: str, delay: int):
         sequences = self.config.get('sequences', {})
         
         if sequence_name not in sequences:
@@ -1560,7 +1950,6 @@ class MacroRunner:
             return False
         
         sequence = sequences[sequence_name]
-        steps = sequence.get('steps', [])
         
         # Инициализация состояния выполнения
         self.execution_state = {
@@ -1570,6 +1959,14 @@ class MacroRunner:
             'screenshots': []
         }
         
+        if sequence.get('stream'):
+            # Потоковый .atlas: общее число шагов неизвестно до конца разбора
+            steps = map(normalize_step, self._stream_steps(sequence['stream']))
+            total = '?'
+        else:
+            steps = sequence.get('steps', [])
+            total = len(steps)
+        
         # Вывод метаданных
         print("\n" + "="*60)
         print(f"🚀 Запуск: {sequence_name}")
@@ -1584,9 +1981,27 @@ class MacroRunner:
         if 'tags' in sequence:
             print(f"🏷️  Теги: {', '.join(sequence['tags'])}")
         
-        print(f"📊 Шагов: {len(steps)}")
+        if sequence.get('stream'):
+            print(f"📊 Шагов: потоковый разбор ({sequence['stream']})")
+        else:
+            print(f"📊 Шагов: {total}")
         print("="*60)
         
+        # Статическая проверка до задержки и поиска шаблонов (потоковый режим - без нее)
+        if self.validate and not sequence.get('stream'):
+            issues = validate_steps(steps, sequence_name)
+            for issue in issues:
+                print(issue)
+            errors = [str(issue) for issue in issues if issue.severity == SEVERITY_ERROR]
+            if errors:
+                self.execution_state['validation_errors'] = errors
+                print(f"❌ Макрос не прошел проверку ({len(errors)} ошибок), запуск отменен")
+                return False
+        
+        # Параметры шагов приводятся к типам обработчиков один раз, а не на каждом выполнении
+        if not sequence.get('stream'):
+            steps = normalize_steps(steps)
+        
         if delay > 0:
             print(f"\n⏳ Задержка {delay} секунд...")
             for i in range(delay, 0, -1):
@@ -1595,13 +2010,20 @@ class MacroRunner:
             print("   Старт!     ")
         
         # Выполнение шагов
+        executed = 0
         for i, step in enumerate(steps, 1):
             action = step.get('action')
             desc = step.get('description', action)
             
-            print(f"\n📍 Шаг {i}/{len(steps)}: {desc}")
+            print(f"\n📍 Шаг {i}/{total}: {desc}")
             
-            success = self._execute_step(step)
+            try:
+                success = self._execute_step(step)
+            except MacroAborted as e:
+                self.execution_state['failed_step'] = {**step, 'index': i, 'success': False,
+                                                       'description': desc, 'error': f"abort: {e}"}
+                print(f"\n⏹️  Выполнение прервано (abort): {e}")
+                return False
             
             # Записываем результат
             step_record = {
@@ -1618,25 +2040,51 @@ class MacroRunner:
                 self.execution_state['failed_step'] = step_record
                 print(f"❌ Шаг {i} не выполнен")
                 return False
+            executed += 1
+        
+        if self.execution_state.get('parse_error'):
+            return False
         
         # Статистика
         print("\n" + "="*60)
         print("✅ Последовательность завершена!")
         print("="*60)
         print(f"📊 Статистика:")
-        print(f"   Шагов выполнено: {len(steps)}")
+        print(f"   Шагов выполнено: {executed}")
         print(f"   Кликов: {self.stats['total_clicks']}")
         print(f"   Найдено шаблонов: {self.stats['successful_finds']}")
         print("="*60 + "\n")
         
         return True
     
+    def _stream_steps(self, path: str):
+        """
+        Шаги .atlas по мере разбора (AtlasDSLParser.iter_parse_file)
+        
+        Ошибка разбора останавливает выполнение на месте ошибки: уже
+        выполненные шаги не откатываются, причина - в execution_state.
+        """
+        from src.core.atlas_dsl_parser import AtlasDSLParser
+        from src.core.atlas_grammar import AtlasSyntaxError
+        
+        try:
+            yield from AtlasDSLParser().iter_parse_file(path)
+        except AtlasSyntaxError as e:
+            print(f"❌ Ошибка разбора: {e}")
+            self.execution_state['parse_error'] = str(e)
+    
 def main():
     parser = argparse.ArgumentParser(description='Macro AI - Запуск последовательностей')
     parser.add_argument('--config', type=str, default='my_sequences.yaml', help='Путь к конфигу')
     parser.add_argument('--run', type=str, required=True, help='Имя последовательности')
     parser.add_argument('--delay', type=int, default=0, help='Задержка перед стартом (сек, 0=без задержки)')
     parser.add_argument('--fast', action='store_true', help='Быстрый запуск (без задержки, без предупреждений)')
+    parser.add_argument('--capture', type=str, default=None,
+                        help='Захват экрана: pyautogui | mss | auto | replay:<путь> (по умолчанию MACRO_CAPTURE, иначе pyautogui)')
+    parser.add_argument('--no-validate', action='store_true',
+                        help='Не проверять шаги перед запуском (шаблоны, селекторы, действия)')
+    parser.add_argument('--stream', action='store_true',
+                        help='Потоковый разбор .atlas: выполнение с первого шага, без полного разбора файла')
     
     args = parser.parse_args()
     
@@ -1646,7 +2094,8 @@ def main():
         FAST_MODE = True
         args.delay = 0  # Принудительно убираем задержку
     
-    runner = MacroRunner(args.config)
+    runner = MacroRunner(args.config, capture=args.capture, stream=args.stream,
+                         validate=not args.no_validate)
     runner.run_sequence(args.run, args.delay)
 
 
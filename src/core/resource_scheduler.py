@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+resource_scheduler.py
+Блокировки ресурсов шагов для параллельных runner'ов одного процесса
+
+Экземпляры parallel_runner / macro_worker_pool - потоки одного процесса.
+pyautogui шаги (click, type, key, hotkey, scroll) двигают одну физическую
+мышь и клавиатуру: два одновременных клика портят друг друга. selenium_*
+шаги работают с драйвером своего экземпляра и друг другу не мешают.
+
+Шаг объявляет ресурсы при регистрации (src/core/actions):
+    RESOURCE_INPUT   - общая блокировка ввода на процесс
+    RESOURCE_DOM     - блокировка драйвера экземпляра
+    RESOURCE_NETWORK - семафор AI/сетевых вызовов (по умолчанию без предела)
+
+Шаги без ресурсов (wait, repeat, try, поиск шаблона) не блокируются.
+click занимает ввод только на время самого клика: поиск шаблона идет
+параллельно с другими экземплярами.
+"""
+
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from typing import Any, Callable, Dict, FrozenSet, Optional
+
+from src.core.actions import RESOURCE_DOM, RESOURCE_INPUT, RESOURCE_NETWORK
+
+
+class ResourceScheduler:
+    """Блокировки ресурсов (один экземпляр на процесс - get_scheduler())"""
+    
+    def __init__(self, network_limit: Optional[int] = None):
+        """
+        Args:
+            network_limit: Предел одновременных AI/сетевых шагов (None - без предела)
+        """
+        self._input = threading.RLock()
+        self._driver_locks: Dict[int, threading.RLock] = {}
+        self._driver_locks_guard = threading.Lock()
+        self._network = threading.BoundedSemaphore(network_limit) if network_limit else None
+        self.stats = {
+            'input_holds': 0,
+            'input_wait': 0.0,  # Суммарное ожидание блокировки ввода (сек)
+            'input_held': 0.0,  # Суммарное время под блокировкой (сек)
+        }
+    
+    @contextmanager
+    def input(self):
+        """Физические мышь и клавиатура"""
+        started = time.perf_counter()
+        with self._input:
+            acquired = time.perf_counter()
+            try:
+                yield
+            finally:
+                self.stats['input_holds'] += 1
+                self.stats['input_wait'] += acquired - started
+                self.stats['input_held'] += time.perf_counter() - acquired
+    
+    @contextmanager
+    def dom(self, driver: Any):
+        """Драйвер экземпляра (без драйвера - без блокировки)"""
+        if driver is None:
+            yield
+            return
+        with self._driver_locks_guard:
+            lock = self._driver_locks.setdefault(id(driver), threading.RLock())
+        with lock:
+            yield
+    
+    @contextmanager
+    def network(self):
+        """AI и сетевые вызовы"""
+        if self._network is None:
+            yield
+            return
+        with self._network:
+            yield
+    
+    @contextmanager
+    def hold(self, resources: FrozenSet[str], driver: Any = None):
+        """
+        Занять ресурсы шага
+        
+        Порядок захвата фиксирован (DOM → сеть → ввод), ввод - последним:
+        блокировка ввода не ждет драйвер или сеть.
+        """
+        with ExitStack() as stack:
+            if RESOURCE_DOM in resources:
+                stack.enter_context(self.dom(driver))
+            if RESOURCE_NETWORK in resources:
+                stack.enter_context(self.network())
+            if RESOURCE_INPUT in resources:
+                stack.enter_context(self.input())
+            yield
+    
+    def wrap(self, handler: Callable[[dict], bool], resources: FrozenSet[str],
+             get_driver: Callable[[], Any] = lambda: None) -> Callable[[dict], bool]:
+        """Обработчик шага, который занимает ресурсы на время каждого вызова (retry - на попытку)"""
+        def run(step: dict) -> bool:
+            with self.hold(resources, get_driver()):
+                return handler(step)
+        return run
+
+
+_default_scheduler: Optional[ResourceScheduler] = None
+_default_lock = threading.Lock()
+
+
+def get_scheduler() -> ResourceScheduler:
+    """Общий планировщик процесса (одна блокировка ввода на все runner'ы)"""
+    global _default_scheduler
+    if _default_scheduler is None:
+        with _default_lock:
+            if _default_scheduler is None:
+                _default_scheduler = ResourceScheduler()
+    return _default_scheduler
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+retry_policy.py
+Повтор шага при неудаче (попытки, backoff, общий таймаут)
+
+Шаг объявляет политику полем retry:
+    
+    - action: click
+      template: templates/Like.png
+      retry: 3                      # 3 попытки без паузы
+    - action: try
+      retry: {attempts: 4, backoff: 0.5, backoff_factor: 2, timeout: 20}
+      try_steps: [...]
+
+В DSL: click Like retry=3 backoff=0.5 retry_timeout=20
+
+Значения по умолчанию для незаданных полей - settings.retry конфига.
+timeout ограничивает и ожидания внутри попытки: поиск шаблона, wait,
+WebDriverWait selenium шагов (MacroRunner._clamp_wait).
+Неудачная попытка повторяется локально, остальная последовательность
+не перезапускается (и не повторяет уже выполненные медленные поиски).
+"""
+
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, Optional
+
+DEFAULT_BACKOFF_FACTOR = 2.0
+DEFAULT_MAX_BACKOFF = 30.0
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """Параметры повтора"""
+    attempts: int = 1                              # Всего попыток (1 - без повтора)
+    backoff: float = 0.0                           # Пауза перед второй попыткой (сек)
+    backoff_factor: float = DEFAULT_BACKOFF_FACTOR  # Множитель паузы для следующих попыток
+    max_backoff: float = DEFAULT_MAX_BACKOFF       # Предел паузы
+    timeout: Optional[float] = None                # Общее время на шаг со всеми попытками
+    
+    @classmethod
+    def from_value(cls, value: Any, settings: Optional[Dict[str, Any]] = None) -> 'RetryPolicy':
+        """
+        Политика из поля retry шага
+        
+        Args:
+            value: Число попыток, dict с полями политики или RetryPolicy
+            settings: Секция settings конфига (settings.retry - значения по умолчанию)
+        
+        Raises:
+            ValueError: Неверные значения (проверяется atlas_validator до запуска)
+        """
+        if isinstance(value, RetryPolicy):
+            return value
+        
+        defaults = (settings or {}).get('retry') or {}
+        if not isinstance(defaults, dict):
+            defaults = {}
+        if isinstance(value, dict):
+            fields = {**defaults, **value}
+        elif isinstance(value, (int, float, str)) and not isinstance(value, bool):
+            fields = {**defaults, 'attempts': value}
+        else:
+            raise ValueError(f"retry: ожидается число попыток или параметры, получено {value!r}")
+        
+        unknown = set(fields) - {'attempts', 'backoff', 'backoff_factor', 'max_backoff', 'timeout'}
+        if unknown:
+            raise ValueError(f"retry: неизвестные параметры {', '.join(sorted(unknown))}")
+        
+        try:
+            attempts = int(float(fields.get('attempts', 1)))
+            backoff = float(fields.get('backoff', 0.0))
+            backoff_factor = float(fields.get('backoff_factor', DEFAULT_BACKOFF_FACTOR))
+            max_backoff = float(fields.get('max_backoff', DEFAULT_MAX_BACKOFF))
+            timeout = fields.get('timeout')
+            timeout = float(timeout) if timeout is not None else None
+        except (TypeError, ValueError):
+            raise ValueError(f"retry: неверные значения {fields}")
+        
+        if attempts < 1 or backoff < 0 or backoff_factor < 1 or max_backoff < 0 \
+                or (timeout is not None and timeout <= 0):
+            raise ValueError(f"retry: значения вне диапазона {fields}")
+        
+        return cls(attempts, backoff, backoff_factor, max_backoff, timeout)
+    
+    def delays(self) -> Iterator[float]:
+        """Паузы перед 2-й, 3-й, ... попытками"""
+        delay = self.backoff
+        for _ in range(self.attempts - 1):
+            yield min(delay, self.max_backoff)
+            delay *= self.backoff_factor
+    
+    def run(self, attempt: Callable[[Optional[float]], bool],
+            on_retry: Optional[Callable[[int, float], None]] = None,
+            clock: Callable[[], float] = time.monotonic,
+            sleep: Callable[[float], None] = time.sleep) -> bool:
+        """
+        Выполнение с повторами
+        
+        Args:
+            attempt: Попытка attempt(осталось_секунд или None) -> успех
+            on_retry: Вызывается перед повтором: on_retry(номер попытки, пауза)
+            clock, sleep: Часы и пауза (подменяются в тестах)
+        
+        Returns:
+            True если одна из попыток успешна
+        """
+        deadline = clock() + self.timeout if self.timeout is not None else None
+        delays = self.delays()
+        
+        for number in range(1, self.attempts + 1):
+            remaining = None if deadline is None else deadline - clock()
+            if attempt(remaining):
+                return True
+            
+            delay = next(delays, None)
+            if delay is None:
+                break
+            if deadline is not None and clock() + delay >= deadline:
+                break  # Следующая попытка не уложится в таймаут
+            
+            if on_retry is not None:
+                on_retry(number + 1, delay)
+            if delay > 0:
+                sleep(delay)
+        
+        return False
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+template_index.py
+Постоянный индекс имен шаблонов (templates/**/*.png → путь)
+
+Для каждого PNG индекс хранит все формы имени, которые понимает DSL:
+- точное имя файла без расширения (Chrome-TikTok-Like-btn)
+- без префиксов Chrome-/Atlas-/... и суффиксов -btn (Like)
+- с заменой дефисов на подчеркивания
+- без учета регистра (casefold) для всех форм
+
+Индекс сохраняется в .cache/template_index.json вместе с mtime каждой
+папки. При следующем запуске пересканируются только папки, у которых
+изменился mtime (добавили/удалили/переименовали файлы), остальные
+берутся из индекса - без rglob по всему дереву.
+"""
+
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional
+
+TEMPLATE_INDEX_FILE = Path(".cache") / "template_index.json"
+INDEX_VERSION = 1
+
+# Префиксы и суффиксы, которые отбрасываются в коротком имени
+STRIP_PREFIXES = ["Chrome-TikTok-", "Chrome-YouTube-", "Chrome-", "Atlas-"]
+STRIP_SUFFIXES = ["-btn", "_btn"]
+
+
+def name_forms(stem: str) -> List[str]:
+    """
+    Все формы имени шаблона (в порядке добавления в карту)
+    
+    Args:
+        stem: Имя PNG без расширения
+    """
+    clean_name = stem
+    for prefix in STRIP_PREFIXES:
+        if clean_name.startswith(prefix):
+            clean_name = clean_name[len(prefix):]
+    for suffix in STRIP_SUFFIXES:
+        clean_name = clean_name.replace(suffix, "")
+    
+    return [stem, clean_name, clean_name.replace("-", "_")]
+
+
+class TemplateIndex:
+    """Индекс имен шаблонов с инкрементальным обновлением по mtime папок"""
+    
+    def __init__(self, templates_dir: str = "templates", index_file: Optional[Path] = TEMPLATE_INDEX_FILE):
+        """
+        Args:
+            templates_dir: Корень шаблонов
+            index_file: Файл индекса (None - без сохранения на диск)
+        """
+        self.templates_dir = str(templates_dir)
+        self.index_file = Path(index_file) if index_file else None
+        # папка → {'mtime': ns, 'pngs': [...], 'subdirs': [...]}
+        self._dirs: Dict[str, dict] = {}
+        self._exact: Dict[str, str] = {}
+        self._casefold: Dict[str, str] = {}
+        self.stats = {
+            'scanned_dirs': 0,
+            'reused_dirs': 0,
+        }
+        
+        self._load()
+        self.refresh()
+    
+    # ==================== Диск ====================
+    
+    def _load(self):
+        """Загрузка сохраненного индекса (если он для этой папки и версии)"""
+        if not self.index_file or not self.index_file.exists():
+            return
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == INDEX_VERSION and data.get('root') == self.templates_dir:
+                self._dirs = data.get('dirs', {})
+        except Exception:
+            self._dirs = {}
+    
+    def _save(self):
+        """Атомарная запись индекса"""
+        if not self.index_file:
+            return
+        try:
+            self.index_file.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.index_file.parent, suffix='.json')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'version': INDEX_VERSION, 'root': self.templates_dir, 'dirs': self._dirs},
+                          f, ensure_ascii=False)
+            os.replace(tmp_path, self.index_file)
+        except Exception:
+            pass
+    
+    # ==================== Обновление ====================
+    
+    def _scan_dir(self, path: str, mtime: int) -> dict:
+        """Содержимое одной папки (без рекурсии)"""
+        pngs, subdirs = [], []
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        subdirs.append(entry.name)
+                    elif entry.name.endswith('.png'):
+                        pngs.append(entry.name)
+        except OSError:
+            pass
+        
+        self.stats['scanned_dirs'] += 1
+        return {'mtime': mtime, 'pngs': sorted(pngs), 'subdirs': sorted(subdirs)}
+    
+    def refresh(self) -> bool:
+        """
+        Обновление индекса: stat каждой известной папки, пересканирование измененных
+        
+        Returns:
+            True если индекс изменился
+        """
+        dirs = {}
+        changed = False
+        stack = [self.templates_dir]
+        
+        while stack:
+            path = stack.pop()
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                continue
+            
+            entry = self._dirs.get(path)
+            if entry is not None and entry.get('mtime') == mtime:
+                self.stats['reused_dirs'] += 1
+            else:
+                entry = self._scan_dir(path, mtime)
+                changed = True
+            
+            dirs[path] = entry
+            # Обратный порядок: подпапки обходятся по алфавиту
+            stack.extend(os.path.join(path, name) for name in reversed(entry['subdirs']))
+        
+        if changed or set(dirs) != set(self._dirs):
+            changed = True
+            self._dirs = dirs
+            self._save()
+        else:
+            self._dirs = dirs
+        
+        if changed or not self._exact:
+            self._build_maps()
+        return changed
+    
+    def _build_maps(self):
+        """Карты имя → путь (точная и casefold)"""
+        exact = {}
+        # Папки в порядке обхода (корень, затем подпапки по алфавиту)
+        for path, entry in self._walk():
+            for png in entry['pngs']:
+                full_path = os.path.join(path, png)
+                for form in name_forms(Path(png).stem):
+                    exact[form] = full_path
+        
+        casefold = {}
+        for key, value in exact.items():
+            casefold.setdefault(key.casefold(), value)
+        
+        self._exact = exact
+        self._casefold = casefold
+    
+    def _walk(self):
+        """Папки индекса в порядке обхода в глубину"""
+        stack = [self.templates_dir]
+        while stack:
+            path = stack.pop()
+            entry = self._dirs.get(path)
+            if entry is None:
+                continue
+            yield path, entry
+            stack.extend(os.path.join(path, name) for name in reversed(entry['subdirs']))
+    
+    # ==================== API ====================
+    
+    def resolve(self, name: str) -> Optional[str]:
+        """
+        Путь к шаблону по имени (O(1))
+        
+        Returns:
+            Путь или None если имени нет в индексе
+        """
+        path = self._exact.get(name)
+        if path is not None:
+            return path
+        return self._casefold.get(name.casefold())
+    
+    def as_map(self) -> Dict[str, str]:
+        """Карта имя → путь (все формы имен)"""
+        return dict(self._exact)
+    
+    def dir_mtimes(self) -> Dict[str, int]:
+        """mtime всех папок индекса (для манифеста кэша компиляции)"""
+        return {path: entry['mtime'] for path, entry in self._dirs.items()}
+    
+    def __len__(self) -> int:
+        return sum(len(entry['pngs']) for entry in self._dirs.values())
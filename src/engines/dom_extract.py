@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+dom_extract.py
+Пакетное извлечение DOM: все совпадения селектора одним execute_script
+
+elem.text для каждого элемента - отдельный HTTP запрос к chromedriver:
+список из 300 комментариев TikTok - 300 запросов. Скрипт собирает текст,
+атрибуты и координаты всех элементов за один запрос, фильтрация
+(пустые, служебные тексты) - в Python.
+
+    items = extract_elements(driver, 'div[data-e2e="comment-level-1"]', ['data-id'])
+    # [{'index': 0, 'text': '...', 'attrs': {'data-id': '42'},
+    #   'rect': {'x': 10, 'y': 200, 'width': 300, 'height': 40}}, ...]
+
+Текст - как у Selenium elem.text: innerText отрисованного элемента без
+пробелов по краям, для скрытого (display: none) - пустая строка.
+"""
+
+from typing import Any, Dict, Iterable, List, Sequence
+
+# Служебные тексты в списках комментариев (кнопки, заголовки)
+SERVICE_WORDS = ("Комментарии", "Ответить", "Нравится", "Добавить", "Показать", "Просмотреть")
+MIN_TEXT_LENGTH = 5
+
+EXTRACT_SCRIPT = """
+const selector = arguments[0];
+const attributes = arguments[1] || [];
+return Array.from(document.querySelectorAll(selector), (el, index) => {
+    const rendered = el.getClientRects().length > 0;
+    const r = el.getBoundingClientRect();
+    const attrs = {};
+    for (const name of attributes) {
+        attrs[name] = el.getAttribute(name);
+    }
+    return {
+        index: index,
+        text: rendered ? el.innerText : '',
+        attrs: attrs,
+        rect: {x: r.x, y: r.y, width: r.width, height: r.height},
+    };
+});
+"""
+
+
+def extract_elements(driver: Any, selector: str,
+                     attributes: Iterable[str] = ()) -> List[Dict[str, Any]]:
+    """
+    Текст, атрибуты и координаты всех элементов селектора (один запрос)
+    
+    Args:
+        driver: WebDriver
+        selector: CSS селектор
+        attributes: Имена атрибутов
+    
+    Returns:
+        [{'index', 'text', 'attrs', 'rect'}] в порядке документа
+    """
+    items = driver.execute_script(EXTRACT_SCRIPT, selector, list(attributes)) or []
+    for item in items:
+        item['text'] = (item.get('text') or '').strip()
+    return items
+
+
+def parse_attributes(value: Any) -> List[str]:
+    """Параметр attributes шага: список или строка через запятую"""
+    if not value:
+        return []
+    if isinstance(value, str):
+        return [name.strip() for name in value.split(',') if name.strip()]
+    return [str(name) for name in value]
+
+
+def is_service_text(text: str) -> bool:
+    return any(word in text for word in SERVICE_WORDS)
+
+
+def is_meaningful(text: str, min_length: int = MIN_TEXT_LENGTH) -> bool:
+    """Непустой текст длиннее min_length (extract_all)"""
+    return bool(text) and len(text) > min_length
+
+
+class ElementTexts(Sequence):
+    """
+    Тексты элементов по одному запросу на элемент (запасной путь)
+    
+    Читаются только нужные элементы: skip_empty останавливается на первом
+    подходящем, как и раньше.
+    """
+    
+    def __init__(self, elements: List[Any]):
+        self.elements = elements
+        self._cache: Dict[int, str] = {}
+    
+    def __len__(self) -> int:
+        return len(self.elements)
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index not in self._cache:
+            self._cache[index] = self.elements[index].text or ''
+        return self._cache[index]
@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+"""
+driver_pool.py
+Пул WebDriver сессий: повторное использование между запусками макросов
+
+Раньше каждый selenium_init / selenium_connect / parallel_runner создавал
+новый webdriver.Chrome, а ChromeDriverManager().install() каждый раз
+заново определял версию драйвера (секунды, иногда сеть). Теперь:
+
+- путь к chromedriver определяется один раз и хранится на диске
+  (.cache/chromedriver.json), следующий процесс берет его сразу;
+- сессии хранятся в пуле по ключу (debug порт или профиль), макрос
+  берет сессию в аренду (lease) и возвращает (release). Повторный
+  запуск против того же Chrome - проверка связи и готовая сессия.
+    
+    pool = get_driver_pool()
+    driver = pool.attach('127.0.0.1:9222')   # или pool.launch(headless=True)
+    ...
+    pool.release(driver)
+
+Сессия, к которой подключились (attach), при закрытии пула не закрывает
+сам Chrome - останавливается только chromedriver.
+
+Chrome без профиля (launch() без profile_dir) можно запускать несколько:
+занятая сессия не ждет, а пул запускает еще один экземпляр (ключ#n).
+Свободных таких сессий на ключ остается не больше MAX_IDLE_SPAWNED,
+лишние закрываются при release.
+Сессии с профилем и attach ждут освобождения не дольше LEASE_TIMEOUT.
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+try:
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service
+    SELENIUM_AVAILABLE = True
+except ImportError:
+    SELENIUM_AVAILABLE = False
+
+# Кэш пути к chromedriver (между процессами)
+DRIVER_PATH_CACHE = '.cache/chromedriver.json'
+# Вручную скачанный ChromeDriver (tests/test_selenium_alt.py)
+LEGACY_DRIVER_PATHS = ["/tmp/chromedriver_temp/chromedriver-mac-arm64/chromedriver"]
+# Путь к Chrome на macOS
+CHROME_PATH = "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome"
+
+KIND_ATTACH = 'attach'  # Подключение к запущенному Chrome (debuggerAddress)
+KIND_LAUNCH = 'launch'  # Chrome, запущенный пулом
+
+# Ожидание занятой сессии по умолчанию (сек): макрос, который ждет сам себя
+# через другой runner, получает TimeoutError, а не зависает навсегда
+LEASE_TIMEOUT = 120.0
+
+# Свободных Chrome без профиля на ключ (остальные закрываются при release)
+MAX_IDLE_SPAWNED = 1
+
+_resolved_path: Optional[str] = None
+_resolve_lock = threading.Lock()
+
+
+def _executable(path: Optional[str]) -> bool:
+    return bool(path) and os.path.isfile(path) and os.access(path, os.X_OK)
+
+
+def resolve_chromedriver(cache_path: str = DRIVER_PATH_CACHE,
+                         install: Optional[Callable[[], str]] = None,
+                         refresh: bool = False) -> str:
+    """
+    Путь к chromedriver
+    
+    Порядок: CHROMEDRIVER_PATH → кэш процесса → кэш на диске → скачанный
+    вручную → webdriver-manager (результат пишется в кэш на диске).
+    
+    Args:
+        cache_path: Файл кэша пути
+        install: Определение пути без кэша (по умолчанию ChromeDriverManager().install())
+        refresh: Игнорировать кэш (драйвер не подошел к обновленному Chrome)
+    """
+    global _resolved_path
+    
+    env_path = os.environ.get('CHROMEDRIVER_PATH')
+    if _executable(env_path):
+        return env_path
+    
+    with _resolve_lock:
+        if refresh:
+            _resolved_path = None
+        elif _executable(_resolved_path):
+            return _resolved_path
+        
+        cache = Path(cache_path)
+        if not refresh and cache.exists():
+            try:
+                cached = json.loads(cache.read_text(encoding='utf-8')).get('path')
+            except (OSError, ValueError, AttributeError):
+                cached = None
+            if _executable(cached):
+                _resolved_path = cached
+                return cached
+        
+        path = None
+        if not refresh:
+            path = next((p for p in LEGACY_DRIVER_PATHS if _executable(p)), None)
+        if path is None:
+            if install is None:
+                from webdriver_manager.chrome import ChromeDriverManager
+                install = lambda: ChromeDriverManager().install()
+            print("   ⚠️  Определяем ChromeDriver через webdriver-manager...")
+            path = install()
+        
+        try:
+            cache.parent.mkdir(parents=True, exist_ok=True)
+            cache.write_text(json.dumps({'path': path, 'resolved_at': time.time()}), encoding='utf-8')
+        except OSError as e:
+            print(f"⚠️  Не удалось сохранить путь ChromeDriver: {e}")
+        
+        _resolved_path = path
+        return path
+
+
+def _start_chrome(options) -> Any:
+    """webdriver.Chrome с кэшированным драйвером (один повтор, если драйвер устарел)"""
+    try:
+        return webdriver.Chrome(service=Service(resolve_chromedriver()), options=options)
+    except Exception as e:
+        # Chrome обновился - кэшированный chromedriver другой версии
+        if 'version' not in str(e).lower():
+            raise
+        print("   ♻️  ChromeDriver не подходит к версии Chrome, определяем заново...")
+        return webdriver.Chrome(service=Service(resolve_chromedriver(refresh=True)), options=options)
+
+
+def create_driver(params: Dict[str, Any]) -> Any:
+    """
+    Новая сессия Chrome (фабрика пула по умолчанию)
+    
+    Args:
+        params: {'kind': 'attach', 'debugger_address'} или
+                {'kind': 'launch', 'profile_dir', 'headless', 'arguments'}
+    """
+    if not SELENIUM_AVAILABLE:
+        raise RuntimeError("Selenium не установлен")
+    
+    options = webdriver.ChromeOptions()
+    if params['kind'] == KIND_ATTACH:
+        options.add_experimental_option("debuggerAddress", params['debugger_address'])
+        return _start_chrome(options)
+    
+    if os.path.exists(CHROME_PATH):
+        options.binary_location = CHROME_PATH
+    if params.get('profile_dir'):
+        options.add_argument(f"--user-data-dir={params['profile_dir']}")
+    if params.get('headless'):
+        options.add_argument('--headless')
+    for argument in params.get('arguments') or ('--no-sandbox', '--disable-dev-shm-usage'):
+        options.add_argument(argument)
+    return _start_chrome(options)
+
+
+def check_driver(driver: Any) -> bool:
+    """Проверка связи с сессией (один легкий запрос)"""
+    try:
+        driver.window_handles
+        return True
+    except Exception:
+        return False
+
+
+@dataclass
+class _Entry:
+    """Сессия пула"""
+    key: str
+    kind: str
+    driver: Any = None
+    leased: bool = True
+    created: float = field(default_factory=time.monotonic)
+    uses: int = 0
+    spawned: bool = False  # Chrome без профиля (key или key#n, lease(spawn=True))
+
+
+class DriverPool:
+    """Сессии WebDriver по ключу (debug порт / профиль) с арендой"""
+    
+    def __init__(self, factory: Callable[[Dict[str, Any]], Any] = create_driver,
+                 health_check: Callable[[Any], bool] = check_driver,
+                 max_idle_spawned: int = MAX_IDLE_SPAWNED):
+        """
+        Args:
+            factory: factory(params) -> новая сессия
+            health_check: health_check(driver) -> сессия жива
+            max_idle_spawned: Свободных сессий без профиля на ключ
+        """
+        self.factory = factory
+        self.health_check = health_check
+        self.max_idle_spawned = max_idle_spawned
+        self._entries: Dict[str, _Entry] = {}
+        self._cond = threading.Condition()
+        self.stats = {'created': 0, 'reused': 0, 'discarded': 0}
+    
+    @staticmethod
+    def attach_key(debugger_address: str) -> str:
+        return f"{KIND_ATTACH}:{debugger_address}"
+    
+    @staticmethod
+    def launch_key(profile_dir: Optional[str] = None, headless: bool = False) -> str:
+        return f"{KIND_LAUNCH}:{profile_dir or '-'}:{'headless' if headless else 'window'}"
+    
+    def attach(self, debugger_address: str = '127.0.0.1:9222', timeout: Optional[float] = LEASE_TIMEOUT) -> Any:
+        """Сессия к запущенному Chrome (chrome --remote-debugging-port)"""
+        params = {'kind': KIND_ATTACH, 'debugger_address': debugger_address}
+        return self.lease(self.attach_key(debugger_address), params, timeout)
+    
+    def launch(self, profile_dir: Optional[str] = None, headless: bool = False,
+               arguments: Optional[Iterable[str]] = None, timeout: Optional[float] = LEASE_TIMEOUT) -> Any:
+        """
+        Сессия Chrome, запущенного пулом (профиль + headless - ключ)
+        
+        Без профиля занятая сессия не ждет: запускается еще один Chrome.
+        Один профиль открыт только в одном Chrome - такие сессии ждут.
+        """
+        params = {'kind': KIND_LAUNCH, 'profile_dir': profile_dir, 'headless': headless,
+                  'arguments': list(arguments) if arguments is not None else None}
+        return self.lease(self.launch_key(profile_dir, headless), params, timeout,
+                          spawn=profile_dir is None)
+    
+    def lease(self, key: str, params: Dict[str, Any], timeout: Optional[float] = LEASE_TIMEOUT,
+              spawn: bool = False) -> Any:
+        """
+        Взять сессию в аренду (ждет, пока ее вернет другой макрос)
+        
+        Args:
+            spawn: Вместо ожидания - свободная сессия key#n или новая
+        
+        Raises:
+            TimeoutError: Сессия занята дольше timeout
+        """
+        with self._cond:
+            if spawn:
+                key = self._free_slot(key)
+            elif not self._cond.wait_for(lambda: key not in self._entries or not self._entries[key].leased,
+                                         timeout):
+                raise TimeoutError(f"Сессия занята: {key}")
+            entry = self._entries.get(key)
+            if entry is None:
+                # Место занято до создания сессии - второй макрос ждет, а не создает дубль
+                entry = self._entries[key] = _Entry(key, params['kind'], spawned=spawn)
+            entry.leased = True
+        
+        if entry.driver is not None:
+            if self.health_check(entry.driver):
+                entry.uses += 1
+                self.stats['reused'] += 1
+                return entry.driver
+            print(f"   ♻️  Сессия недоступна, создаем заново: {key}")
+            self._dispose(entry)
+            self.stats['discarded'] += 1
+        
+        try:
+            entry.driver = self.factory(params)
+        except Exception:
+            with self._cond:
+                self._entries.pop(key, None)
+                self._cond.notify_all()
+            raise
+        entry.created = time.monotonic()
+        entry.uses = 1
+        self.stats['created'] += 1
+        return entry.driver
+    
+    def release(self, driver: Any):
+        """Вернуть сессию в пул (следующий макрос получит ее сразу)"""
+        with self._cond:
+            entry = self._find(driver)
+            if entry is None:
+                return
+            entry.leased = False
+            extras = self._idle_extras(entry) if entry.spawned else []
+            for extra in extras:
+                del self._entries[extra.key]
+            self._cond.notify_all()
+        for extra in extras:
+            self._dispose(extra)
+            self.stats['discarded'] += 1
+    
+    def discard(self, driver: Any):
+        """Закрыть сессию и убрать из пула"""
+        with self._cond:
+            entry = self._find(driver)
+            if entry is not None:
+                del self._entries[entry.key]
+                self._cond.notify_all()
+        if entry is not None:
+            self._dispose(entry)
+            self.stats['discarded'] += 1
+    
+    def is_attached(self, driver: Any) -> bool:
+        """Сессия подключена к внешнему Chrome (а не запущена пулом)"""
+        with self._cond:
+            entry = self._find(driver)
+        return entry is not None and entry.kind == KIND_ATTACH
+    
+    def owns(self, driver: Any) -> bool:
+        with self._cond:
+            return self._find(driver) is not None
+    
+    @contextmanager
+    def session(self, debugger_address: str = '127.0.0.1:9222', timeout: Optional[float] = LEASE_TIMEOUT):
+        """with pool.session('127.0.0.1:9222') as driver: ..."""
+        driver = self.attach(debugger_address, timeout)
+        try:
+            yield driver
+        finally:
+            self.release(driver)
+    
+    def close_all(self):
+        """Закрыть все сессии (Chrome, к которым подключались, остаются открытыми)"""
+        with self._cond:
+            entries = [entry for entry in self._entries.values() if entry.driver is not None]
+            self._entries = {}
+            self._cond.notify_all()
+        for entry in entries:
+            self._dispose(entry)
+    
+    def __len__(self) -> int:
+        with self._cond:
+            return len(self._entries)
+    
+    def _free_slot(self, key: str) -> str:
+        """Ключ свободной сессии key, key#1, ... (готовая сессия раньше пустого места)"""
+        for entry in self._entries.values():
+            if not entry.leased and (entry.key == key or entry.key.startswith(f"{key}#")):
+                return entry.key
+        n = 0
+        while (f"{key}#{n}" if n else key) in self._entries:
+            n += 1
+        return f"{key}#{n}" if n else key
+    
+    def _idle_extras(self, entry: _Entry) -> List[_Entry]:
+        """Свободные сессии без профиля того же ключа сверх max_idle_spawned (старшие key#n)"""
+        base = entry.key.partition('#')[0]
+        idle = [e for e in self._entries.values()
+                if e.spawned and not e.leased and e.driver is not None and e.key.partition('#')[0] == base]
+        idle.sort(key=lambda e: int(e.key.partition('#')[2] or 0))
+        return idle[max(0, self.max_idle_spawned):]
+    
+    def _find(self, driver: Any) -> Optional[_Entry]:
+        return next((entry for entry in self._entries.values() if entry.driver is driver), None)
+    
+    @staticmethod
+    def _dispose(entry: _Entry):
+        try:
+            if entry.kind == KIND_ATTACH:
+                # quit() закрыл бы браузер пользователя - останавливаем только chromedriver
+                entry.driver.service.stop()
+            else:
+                entry.driver.quit()
+        except Exception:
+            pass
+        entry.driver = None
+
+
+_default_pool: Optional[DriverPool] = None
+_default_lock = threading.Lock()
+
+
+def get_driver_pool() -> DriverPool:
+    """Общий пул процесса (сессии закрываются при выходе)"""
+    global _default_pool
+    if _default_pool is None:
+        with _default_lock:
+            if _default_pool is None:
+                _default_pool = DriverPool()
+                atexit.register(_default_pool.close_all)
+    return _default_pool
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+instance_worker.py
+Долгоживущий воркер экземпляра Chrome для parallel_runner
+
+Каждый экземпляр получает свой поток с MacroRunner, привязанным к уже
+подключенному драйверу. Макросы выполняются в том же процессе: без
+запуска интерпретатора и импортов на каждый макрос, runner (шаблоны,
+масштаб экрана, кэш конфигов) создается один раз на экземпляр - при
+старте потока, до первого макроса.
+
+    results = queue.Queue()
+    worker = InstanceWorker(0, driver, results)
+    worker.start()
+    worker.submit('macros/production/like.atlas', url='https://tiktok.com')
+    print(results.get())   # {'instance_id': 0, 'success': True, ...}
+    worker.stop()
+
+Воркеры - потоки, а не процессы пула: WebDriver не передается между
+процессами.
+"""
+
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+# Сигнал остановки в очереди заданий
+_STOP = None
+
+
+def default_runner_factory(macro_file: Optional[str], driver: Any):
+    """MacroRunner на драйвере экземпляра (macro_file None - конфиг загрузится позже)"""
+    from src.core.macro_sequence import MacroRunner
+    return MacroRunner(macro_file, driver=driver)
+
+
+class InstanceWorker(threading.Thread):
+    """Поток экземпляра: выполняет макросы по очереди, результаты - в общую очередь"""
+    
+    def __init__(self, instance_id: int, driver: Any, results: queue.Queue,
+                 runner_factory: Optional[Callable[[str, Any], Any]] = None):
+        """
+        Args:
+            instance_id: ID экземпляра
+            driver: Подключенный WebDriver экземпляра
+            results: Общая очередь результатов (dict на каждый макрос)
+            runner_factory: runner_factory(macro_file, driver) -> MacroRunner
+                (macro_file None - прогрев до первого макроса)
+        """
+        super().__init__(name=f"instance-{instance_id}", daemon=True)
+        self.instance_id = instance_id
+        self.driver = driver
+        self.results = results
+        self.runner_factory = runner_factory or default_runner_factory
+        self.runner = None
+        self.jobs = queue.Queue()
+    
+    def submit(self, macro_file: str, url: Optional[str] = None):
+        """Поставить макрос в очередь экземпляра"""
+        self.jobs.put((macro_file, url))
+    
+    def stop(self):
+        """Завершить поток после уже поставленных макросов"""
+        self.jobs.put(_STOP)
+    
+    def warm(self):
+        """Runner до первого макроса: импорты, масштаб экрана, пул поиска"""
+        if self.runner is not None:
+            return
+        try:
+            self.runner = self.runner_factory(None, self.driver)
+        except Exception as e:
+            # Не фатально: run_job создаст runner с первым макросом
+            print(f"⚠️  Instance #{self.instance_id}: runner не прогрет: {e}")
+    
+    def run(self):
+        self.warm()
+        while True:
+            job = self.jobs.get()
+            if job is _STOP:
+                break
+            self.results.put(self.run_job(*job))
+    
+    def run_job(self, macro_file: str, url: Optional[str] = None,
+                sequence: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Выполнение одного макроса в этом потоке
+        
+        Args:
+            macro_file: Путь к .atlas (или YAML конфигу)
+            url: URL для открытия перед запуском
+            sequence: Имя последовательности (по умолчанию - имя файла)
+        
+        Returns:
+            {'instance_id', 'macro', 'success', 'error', 'startup', 'seconds', 'execution_state'}
+        """
+        started = time.perf_counter()
+        result = {
+            'instance_id': self.instance_id,
+            'macro': macro_file,
+            'success': False,
+            'error': None,
+            'startup': None,
+            'seconds': None,
+            'execution_state': None,
+        }
+        
+        try:
+            if url:
+                if self.driver is None:
+                    raise RuntimeError(f"нет драйвера для перехода на {url}")
+                print(f"📍 Instance #{self.instance_id}: Переход на {url}")
+                self.driver.get(url)
+            
+            # startup - подготовка runner'а (без навигации)
+            prepared = time.perf_counter()
+            if self.runner is None:
+                self.runner = self.runner_factory(macro_file, self.driver)
+            else:
+                # Всегда заново: файл по тому же пути мог измениться (serve --watch).
+                # Неизменный файл берется из кэша компиляции
+                self.runner.load_config(macro_file)
+            result['startup'] = time.perf_counter() - prepared
+            
+            print(f"🎬 Instance #{self.instance_id}: Запуск макроса {Path(macro_file).name}")
+            result['success'] = bool(self.runner.run_sequence(sequence or Path(macro_file).stem, delay=0))
+            result['execution_state'] = self.runner.execution_state
+            failed_step = self.runner.execution_state.get('failed_step')
+            if not result['success'] and failed_step:
+                result['error'] = failed_step.get('error')
+        except Exception as e:
+            result['error'] = str(e)
+        
+        result['seconds'] = time.perf_counter() - started
+        return result
@@ -0,0 +1,512 @@
+#!/usr/bin/env python3
+"""
+macro_worker_pool.py
+Демон очереди макросов: N прогретых воркеров + таблица заданий SQLite
+
+Задания (макрос, приоритет, последовательность) лежат в SQLite
+(.cache/macro_jobs.db), их добавляет кто угодно - CLI, GUI, cron.
+Демон держит N потоков InstanceWorker: у каждого свой MacroRunner
+(шаблоны, парсер, кэш конфигов, драйвер - один раз на воркер), задания
+забираются из таблицы по приоритету. Результат каждого задания
+записывается в ту же строку.
+
+Использование:
+    python3 -m src.engines.macro_worker_pool submit macro-queues/ --priority 5
+    python3 -m src.engines.macro_worker_pool serve --workers 2 --watch macro-queues
+    python3 -m src.engines.macro_worker_pool serve --once   # до пустой очереди
+    python3 -m src.engines.macro_worker_pool serve --workers 2 --browser headless
+    python3 -m src.engines.macro_worker_pool status
+
+Задания с --url выполняются только воркерами с драйвером: serve --browser
+берет каждому воркеру свою сессию Chrome из общего DriverPool.
+
+Макросы проверяются atlas_validator до постановки в очередь (битый файл
+не занимает воркер). Воркеры - потоки одного процесса (как в parallel_runner): GUI макросы
+делят экран и мышь, число воркеров - предел одновременных макросов.
+"""
+
+import argparse
+import json
+import os
+import queue
+import socket
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+# Корень проекта в sys.path (запуск как скрипта)
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.core.atlas_validator import validate_file
+from src.engines.instance_worker import InstanceWorker
+
+DEFAULT_DB_PATH = '.cache/macro_jobs.db'
+POLL_INTERVAL = 0.5  # Пауза опроса пустой очереди (сек)
+
+# Браузер воркеров (serve --browser)
+BROWSER_NONE = 'none'
+BROWSER_WINDOW = 'window'
+BROWSER_HEADLESS = 'headless'
+
+# Статусы заданий
+STATUS_QUEUED = 'queued'
+STATUS_RUNNING = 'running'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+STATUS_CANCELLED = 'cancelled'
+
+_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        macro TEXT NOT NULL,
+        sequence TEXT,
+        url TEXT,
+        priority INTEGER NOT NULL DEFAULT 0,
+        status TEXT NOT NULL DEFAULT 'queued',
+        source_mtime INTEGER,
+        created_at REAL NOT NULL,
+        started_at REAL,
+        finished_at REAL,
+        worker TEXT,
+        host TEXT,
+        pid INTEGER,
+        success INTEGER,
+        error TEXT,
+        startup REAL,
+        seconds REAL,
+        result TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_jobs_queue ON jobs(status, priority DESC, id);
+    CREATE INDEX IF NOT EXISTS idx_jobs_macro ON jobs(macro, source_mtime);
+'''
+
+
+class JobQueue:
+    """Таблица заданий в SQLite (общая для процессов: демон, CLI submit, GUI)"""
+    
+    def __init__(self, db_path: str = DEFAULT_DB_PATH):
+        """
+        Args:
+            db_path: Путь к файлу базы (папка создается)
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._rejected = set()  # (путь, mtime) файлов папки, не прошедших accept
+        # Одно соединение на процесс, потоки воркеров - через lock
+        self.conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None,
+                                    check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(_SCHEMA)
+    
+    def close(self):
+        self.conn.close()
+    
+    def submit(self, macro: str, priority: int = 0, sequence: Optional[str] = None,
+               url: Optional[str] = None, source_mtime: Optional[int] = None) -> int:
+        """
+        Добавить задание
+        
+        Args:
+            macro: Путь к .atlas (или YAML конфигу)
+            priority: Больше - раньше (при равном - по порядку добавления)
+            sequence: Имя последовательности (по умолчанию - имя файла)
+            url: URL для открытия перед запуском (воркер с драйвером)
+            source_mtime: mtime файла (для --watch: не добавлять повторно)
+        
+        Returns:
+            ID задания
+        """
+        with self._lock:
+            cursor = self.conn.execute(
+                'INSERT INTO jobs (macro, sequence, url, priority, source_mtime, created_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (macro, sequence, url, int(priority), source_mtime, time.time()))
+            return cursor.lastrowid
+    
+    def claim(self, worker: str) -> Optional[Dict[str, Any]]:
+        """
+        Забрать следующее задание (атомарно между процессами)
+        
+        Returns:
+            Задание (dict) или None если очередь пуста
+        """
+        with self._lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = self.conn.execute(
+                    'SELECT * FROM jobs WHERE status = ? ORDER BY priority DESC, id LIMIT 1',
+                    (STATUS_QUEUED,)).fetchone()
+                if row is None:
+                    self.conn.execute('COMMIT')
+                    return None
+                started_at = time.time()
+                self.conn.execute(
+                    'UPDATE jobs SET status = ?, worker = ?, host = ?, pid = ?, started_at = ? WHERE id = ?',
+                    (STATUS_RUNNING, worker, socket.gethostname(), os.getpid(), started_at, row['id']))
+                self.conn.execute('COMMIT')
+            except Exception:
+                self.conn.execute('ROLLBACK')
+                raise
+        
+        job = dict(row)
+        job.update(status=STATUS_RUNNING, worker=worker, started_at=started_at)
+        return job
+    
+    def finish(self, job_id: int, result: Dict[str, Any]):
+        """Записать результат задания (InstanceWorker.run_job)"""
+        state = result.get('execution_state') or {}
+        record = {
+            'sequence_name': state.get('sequence_name'),
+            'completed_steps': len(state.get('completed_steps') or []),
+            'failed_step': state.get('failed_step'),
+            'caught_errors': state.get('caught_errors'),
+            'log': state.get('log'),
+        }
+        with self._lock:
+            self.conn.execute(
+                'UPDATE jobs SET status = ?, finished_at = ?, success = ?, error = ?, '
+                'startup = ?, seconds = ?, result = ? WHERE id = ?',
+                (STATUS_DONE if result.get('success') else STATUS_FAILED, time.time(),
+                 int(bool(result.get('success'))), result.get('error'), result.get('startup'),
+                 result.get('seconds'), json.dumps(record, ensure_ascii=False, default=str), job_id))
+    
+    def cancel(self, job_id: int) -> bool:
+        """Отменить задание, которое еще в очереди"""
+        with self._lock:
+            cursor = self.conn.execute('UPDATE jobs SET status = ? WHERE id = ? AND status = ?',
+                                       (STATUS_CANCELLED, job_id, STATUS_QUEUED))
+            return cursor.rowcount > 0
+    
+    def recover_stale(self) -> int:
+        """
+        Вернуть в очередь задания 'running' упавших демонов этого хоста
+        
+        Returns:
+            Число возвращенных заданий
+        """
+        host = socket.gethostname()
+        with self._lock:
+            rows = self.conn.execute('SELECT id, pid FROM jobs WHERE status = ? AND host = ?',
+                                     (STATUS_RUNNING, host)).fetchall()
+            stale = [row['id'] for row in rows if not _pid_alive(row['pid'])]
+            for job_id in stale:
+                self.conn.execute('UPDATE jobs SET status = ?, worker = NULL, pid = NULL, started_at = NULL '
+                                  'WHERE id = ?', (STATUS_QUEUED, job_id))
+        return len(stale)
+    
+    def get(self, job_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self.conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return dict(row) if row else None
+    
+    def jobs(self, status: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        """Последние задания (новые первыми)"""
+        query = 'SELECT * FROM jobs'
+        params = ()
+        if status:
+            query += ' WHERE status = ?'
+            params = (status,)
+        with self._lock:
+            rows = self.conn.execute(query + ' ORDER BY id DESC LIMIT ?', params + (limit,)).fetchall()
+        return [dict(row) for row in rows]
+    
+    def counts(self) -> Dict[str, int]:
+        """Число заданий по статусам"""
+        with self._lock:
+            rows = self.conn.execute('SELECT status, COUNT(*) AS n FROM jobs GROUP BY status').fetchall()
+        return {row['status']: row['n'] for row in rows}
+    
+    def submit_new_files(self, directory: str, priority: int = 0,
+                         accept: Optional[Callable[[str], bool]] = None) -> List[int]:
+        """
+        Добавить .atlas из папки, которых еще нет в очереди (или которые изменились)
+        
+        Args:
+            directory: Папка (например macro-queues)
+            priority: Приоритет новых заданий
+            accept: Проверка файла перед добавлением (отклоненный файл не
+                проверяется повторно, пока не изменится)
+        
+        Returns:
+            ID новых заданий
+        """
+        job_ids = []
+        for path in sorted(Path(directory).glob('*.atlas')):
+            mtime = path.stat().st_mtime_ns
+            with self._lock:
+                known = self.conn.execute('SELECT 1 FROM jobs WHERE macro = ? AND source_mtime = ? LIMIT 1',
+                                          (str(path), mtime)).fetchone()
+            if known or (path, mtime) in self._rejected:
+                continue
+            if accept is not None and not accept(str(path)):
+                self._rejected.add((path, mtime))
+                continue
+            job_ids.append(self.submit(str(path), priority, source_mtime=mtime))
+        return job_ids
+
+
+def _pid_alive(pid: Optional[int]) -> bool:
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class PoolWorker(InstanceWorker):
+    """Воркер пула: берет задания из JobQueue вместо своей очереди"""
+    
+    def __init__(self, worker_id: int, job_queue: JobQueue, stop_event: threading.Event,
+                 results: queue.Queue, driver: Any = None,
+                 runner_factory: Optional[Callable[[str, Any], Any]] = None,
+                 poll_interval: float = POLL_INTERVAL, exit_when_empty: bool = False):
+        super().__init__(worker_id, driver, results, runner_factory)
+        self.name = f"worker-{worker_id}"
+        self.job_queue = job_queue
+        self.stop_event = stop_event
+        self.poll_interval = poll_interval
+        self.exit_when_empty = exit_when_empty
+    
+    def run(self):
+        self.warm()
+        while not self.stop_event.is_set():
+            job = self.job_queue.claim(self.name)
+            if job is None:
+                if self.exit_when_empty:
+                    break
+                self.stop_event.wait(self.poll_interval)
+                continue
+            
+            result = self.run_job(job['macro'], job['url'], job['sequence'])
+            result['job_id'] = job['id']
+            self.job_queue.finish(job['id'], result)
+            self.results.put(result)
+
+
+class MacroWorkerPool:
+    """N прогретых воркеров над одной таблицей заданий"""
+    
+    def __init__(self, job_queue: JobQueue, workers: int = 1,
+                 runner_factory: Optional[Callable[[str, Any], Any]] = None,
+                 drivers: Optional[List[Any]] = None, poll_interval: float = POLL_INTERVAL):
+        """
+        Args:
+            job_queue: Таблица заданий
+            workers: Число воркеров (предел одновременных макросов)
+            runner_factory: runner_factory(macro_file, driver) -> MacroRunner
+            drivers: Драйверы воркеров (по одному, selenium макросы)
+            poll_interval: Пауза опроса пустой очереди
+        """
+        if workers < 1:
+            raise ValueError(f"workers должно быть >= 1, получено {workers}")
+        self.job_queue = job_queue
+        self.num_workers = workers
+        self.runner_factory = runner_factory
+        self.drivers = list(drivers or [])
+        self.poll_interval = poll_interval
+        self.stop_event = threading.Event()
+        self.results = queue.Queue()
+        self.workers: List[PoolWorker] = []
+    
+    def start(self, exit_when_empty: bool = False):
+        """Запуск воркеров (exit_when_empty - завершиться, когда очередь опустеет)"""
+        recovered = self.job_queue.recover_stale()
+        if recovered:
+            print(f"♻️  Возвращено в очередь незавершенных заданий: {recovered}")
+        
+        self.stop_event.clear()
+        for i in range(self.num_workers):
+            driver = self.drivers[i] if i < len(self.drivers) else None
+            worker = PoolWorker(i, self.job_queue, self.stop_event, self.results, driver,
+                                self.runner_factory, self.poll_interval, exit_when_empty)
+            worker.start()
+            self.workers.append(worker)
+        print(f"🧵 Воркеров: {self.num_workers}")
+    
+    def stop(self, timeout: Optional[float] = None):
+        """Остановка: текущие макросы доигрываются, новые задания не берутся"""
+        self.stop_event.set()
+        self.join(timeout)
+    
+    def join(self, timeout: Optional[float] = None):
+        for worker in self.workers:
+            worker.join(timeout)
+        self.workers = [worker for worker in self.workers if worker.is_alive()]
+    
+    def alive(self) -> bool:
+        return any(worker.is_alive() for worker in self.workers)
+    
+    def drain_results(self) -> List[Dict[str, Any]]:
+        """Результаты, завершенные с прошлого вызова"""
+        results = []
+        while True:
+            try:
+                results.append(self.results.get_nowait())
+            except queue.Empty:
+                return results
+
+
+def check_macro(path: str) -> bool:
+    """Статическая проверка перед постановкой в очередь (src/core/atlas_validator)"""
+    report = validate_file(path)
+    for issue in report.issues:
+        print(f"   {issue}")
+    if not report.ok:
+        print(f"❌ Макрос не прошел проверку: {path}")
+    return report.ok
+
+
+def _print_result(result: Dict[str, Any]):
+    status = "✅" if result['success'] else "❌"
+    line = f"{status} #{result['job_id']} {Path(result['macro']).name}: {result['seconds']:.2f}с"
+    if result['error']:
+        line += f" - {result['error']}"
+    print(line)
+
+
+def lease_drivers(workers: int, browser: str) -> List[Any]:
+    """
+    Драйвер каждому воркеру из общего DriverPool (serve --browser)
+    
+    Args:
+        workers: Число воркеров
+        browser: none | window | headless
+    
+    Returns:
+        Драйверы (пустой список для none - задания с url завершатся ошибкой)
+    """
+    if browser == BROWSER_NONE:
+        return []
+    from src.engines.driver_pool import get_driver_pool
+    pool = get_driver_pool()
+    drivers = []
+    try:
+        for _ in range(workers):
+            # Без профиля каждая аренда - отдельный Chrome
+            drivers.append(pool.launch(headless=browser == BROWSER_HEADLESS))
+    except Exception:
+        for driver in drivers:
+            pool.release(driver)
+        raise
+    print(f"🌐 Сессий Chrome: {len(drivers)}")
+    return drivers
+
+
+def serve(args) -> int:
+    """Команда serve: демон до Ctrl+C (или до пустой очереди с --once)"""
+    job_queue = JobQueue(args.db)
+    drivers = lease_drivers(args.workers, args.browser)
+    pool = MacroWorkerPool(job_queue, workers=args.workers, drivers=drivers, poll_interval=args.poll)
+    
+    def watch():
+        for directory in args.watch or []:
+            added = job_queue.submit_new_files(directory, args.priority,
+                                               accept=check_macro if args.validate else None)
+            if added:
+                print(f"📥 {directory}: новых заданий {len(added)}")
+    
+    watch()
+    pool.start(exit_when_empty=args.once)
+    try:
+        while pool.alive():
+            time.sleep(args.poll)
+            watch()
+            for result in pool.drain_results():
+                _print_result(result)
+    except KeyboardInterrupt:
+        print("\n⏹️  Остановка: ждем текущие макросы...")
+        pool.stop()
+    
+    for result in pool.drain_results():
+        _print_result(result)
+    if drivers:
+        from src.engines.driver_pool import get_driver_pool
+        for driver in drivers:
+            get_driver_pool().release(driver)
+    counts = job_queue.counts()
+    print(f"📊 {', '.join(f'{status}: {n}' for status, n in sorted(counts.items()))}")
+    job_queue.close()
+    return 0 if not counts.get(STATUS_FAILED) else 1
+
+
+def submit(args) -> int:
+    """Команда submit: файлы и папки .atlas в очередь"""
+    job_queue = JobQueue(args.db)
+    count = 0
+    for path in map(Path, args.paths):
+        files = sorted(path.glob('*.atlas')) if path.is_dir() else [path]
+        for file in files:
+            if not file.exists():
+                print(f"⚠️  Не найдено: {file}")
+                continue
+            if args.validate and not check_macro(str(file)):
+                continue
+            job_id = job_queue.submit(str(file), args.priority, args.sequence, args.url)
+            print(f"📥 #{job_id} {file} (приоритет {args.priority})")
+            count += 1
+    job_queue.close()
+    return 0 if count else 1
+
+
+def status(args) -> int:
+    """Команда status: счетчики и последние задания"""
+    job_queue = JobQueue(args.db)
+    counts = job_queue.counts()
+    print(f"📊 {', '.join(f'{s}: {n}' for s, n in sorted(counts.items())) or 'очередь пуста'}")
+    for job in job_queue.jobs(args.filter, args.limit):
+        seconds = f"{job['seconds']:.2f}с" if job['seconds'] is not None else ''
+        error = f" - {job['error']}" if job['error'] else ''
+        print(f"  #{job['id']:<5} {job['status']:<9} p={job['priority']:<3} {job['macro']} {seconds}{error}")
+    job_queue.close()
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Очередь макросов с прогретыми воркерами')
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help='Файл базы заданий')
+    commands = parser.add_subparsers(dest='command', required=True)
+    
+    serve_parser = commands.add_parser('serve', help='Запустить воркеры')
+    serve_parser.add_argument('--workers', type=int, default=1, help='Число воркеров')
+    serve_parser.add_argument('--watch', nargs='+', help='Папки .atlas: новые и измененные файлы - в очередь')
+    serve_parser.add_argument('--priority', type=int, default=0, help='Приоритет заданий из --watch')
+    serve_parser.add_argument('--poll', type=float, default=POLL_INTERVAL, help='Интервал опроса (сек)')
+    serve_parser.add_argument('--once', action='store_true', help='Завершиться, когда очередь опустеет')
+    serve_parser.add_argument('--browser', choices=[BROWSER_NONE, BROWSER_WINDOW, BROWSER_HEADLESS],
+                              default=BROWSER_NONE, help='Chrome каждому воркеру (нужен для заданий с --url)')
+    serve_parser.add_argument('--no-validate', dest='validate', action='store_false',
+                              help='Без проверки файлов из --watch')
+    serve_parser.set_defaults(func=serve)
+    
+    submit_parser = commands.add_parser('submit', help='Добавить макросы в очередь')
+    submit_parser.add_argument('paths', nargs='+', help='.atlas файлы или папки')
+    submit_parser.add_argument('--priority', type=int, default=0, help='Больше - раньше')
+    submit_parser.add_argument('--sequence', help='Имя последовательности (по умолчанию - имя файла)')
+    submit_parser.add_argument('--url', help='URL для открытия перед запуском (serve --browser)')
+    submit_parser.add_argument('--no-validate', dest='validate', action='store_false',
+                               help='Без статической проверки макросов')
+    submit_parser.set_defaults(func=submit)
+    
+    status_parser = commands.add_parser('status', help='Состояние очереди')
+    status_parser.add_argument('--filter', choices=[STATUS_QUEUED, STATUS_RUNNING, STATUS_DONE,
+                                                    STATUS_FAILED, STATUS_CANCELLED])
+    status_parser.add_argument('--limit', type=int, default=20)
+    status_parser.set_defaults(func=status)
+    
+    args = parser.parse_args()
+    sys.exit(args.func(args))
+
+
+if __name__ == '__main__':
+    main()
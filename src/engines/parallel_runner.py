@@ -5,16 +5,23 @@ parallel_runner.py
 """
 
 import time
-import threading
+import queue
 import argparse
 from pathlib import Path
-import subprocess
 import os
+import sys
+
+# Корень проекта в sys.path (запуск как скрипта: python3 src/engines/parallel_runner.py)
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.core.atlas_validator import validate_file
+from src.engines.driver_pool import get_driver_pool
+from src.engines.instance_worker import InstanceWorker
 
 try:
     from selenium import webdriver
-    from selenium.webdriver.chrome.service import Service
-    from webdriver_manager.chrome import ChromeDriverManager
     SELENIUM_AVAILABLE = True
 except ImportError:
     SELENIUM_AVAILABLE = False
@@ -29,7 +36,9 @@ class ParallelMacroRunner:
         self.num_instances = num_instances
         self.use_existing = use_existing  # Подключаться к существующим вкладкам
         self.drivers = []
-        self.threads = []
+        self.threads = []          # InstanceWorker по экземплярам
+        self.workers = {}          # instance_id → InstanceWorker
+        self.result_queue = queue.Queue()  # Результаты макросов по мере завершения
         self.results = {}
         self.custom_profiles = []  # Кастомные профили
         self.custom_macros = []    # Разные макросы
@@ -46,16 +55,9 @@ class ParallelMacroRunner:
         print(f"🔗 Подключение к существующему Chrome #{instance_id}...")
         
         try:
-            options = webdriver.ChromeOptions()
-            
-            # Подключение к существующему Chrome
+            # Подключение к существующему Chrome (сессия из пула, chromedriver из кэша)
             port = debug_port + instance_id
-            options.add_experimental_option("debuggerAddress", f"127.0.0.1:{port}")
-            
-            # Создаем драйвер
-            from webdriver_manager.chrome import ChromeDriverManager
-            service = Service(ChromeDriverManager().install())
-            driver = webdriver.Chrome(service=service, options=options)
+            driver = get_driver_pool().attach(f"127.0.0.1:{port}")
             
             print(f"✅ Подключено к Chrome #{instance_id} (порт {port})")
             return driver
@@ -76,8 +78,6 @@ class ParallelMacroRunner:
         print(f"🚀 Запуск Chrome #{instance_id}...")
         
         try:
-            options = webdriver.ChromeOptions()
-            
             # Уникальный профиль для каждого экземпляра
             if profile_dir:
                 # Используем кастомный профиль
@@ -86,30 +86,23 @@ class ParallelMacroRunner:
                 # Временный профиль
                 profile_dir = f"/tmp/chrome-profile-{instance_id}"
             
-            options.add_argument(f"--user-data-dir={profile_dir}")
-            
             # Уникальный debug порт
             port = debug_port + instance_id
-            options.add_argument(f"--remote-debugging-port={port}")
             
             # Позиционирование окон (чтобы не перекрывались)
             window_offset = instance_id * 50
-            options.add_argument(f"--window-position={window_offset},{window_offset}")
-            options.add_argument(f"--window-size=800,900")
-            
-            # Отключаем некоторые проверки для скорости
-            options.add_argument('--no-sandbox')
-            options.add_argument('--disable-dev-shm-usage')
-            options.add_argument('--disable-blink-features=AutomationControlled')
-            
-            # Путь к Chrome на macOS
-            chrome_path = "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome"
-            if os.path.exists(chrome_path):
-                options.binary_location = chrome_path
+            arguments = [
+                f"--remote-debugging-port={port}",
+                f"--window-position={window_offset},{window_offset}",
+                "--window-size=800,900",
+                # Отключаем некоторые проверки для скорости
+                '--no-sandbox',
+                '--disable-dev-shm-usage',
+                '--disable-blink-features=AutomationControlled',
+            ]
             
-            # Создаем драйвер
-            service = Service(ChromeDriverManager().install())
-            driver = webdriver.Chrome(service=service, options=options)
+            # Создаем драйвер (пул: профиль - ключ сессии, chromedriver из кэша)
+            driver = get_driver_pool().launch(profile_dir, arguments=arguments)
             
             # Скрываем признаки автоматизации
             driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
@@ -123,48 +116,51 @@ class ParallelMacroRunner:
     
     def run_macro_in_instance(self, driver, instance_id, macro_file, url="https://tiktok.com"):
         """
-        Запускает макрос в конкретном экземпляре Chrome
+        Ставит макрос в очередь воркера экземпляра (результат - в result_queue)
+        
+        Макрос выполняется в этом же процессе MacroRunner'ом на драйвере
+        экземпляра, воркер создается при первом макросе и живет до cleanup.
         
         Args:
-            driver: WebDriver экземпляр
+            driver: WebDriver экземпляра
             instance_id: ID экземпляра
             macro_file: Путь к .atlas файлу
             url: URL для открытия
         """
-        print(f"📍 Instance #{instance_id}: Переход на {url}")
+        worker = self.workers.get(instance_id)
+        if worker is None:
+            worker = InstanceWorker(instance_id, driver, self.result_queue)
+            worker.start()
+            self.workers[instance_id] = worker
+            self.threads.append(worker)
         
-        try:
-            # Открываем URL
-            driver.get(url)
-            time.sleep(3)
-            
-            # Запускаем макрос через macro_sequence.py
-            cmd = [
-                "python3", "macro_sequence.py",
-                "--config", macro_file,
-                "--run", Path(macro_file).stem,
-                "--delay", "0"
-            ]
-            
-            print(f"🎬 Instance #{instance_id}: Запуск макроса {Path(macro_file).name}")
-            
-            # Запуск в отдельном процессе
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            
-            self.results[instance_id] = {
-                'success': result.returncode == 0,
-                'output': result.stdout,
-                'error': result.stderr
-            }
+        worker.submit(macro_file, url)
+    
+    def collect_results(self, count):
+        """
+        Получает результаты из очереди по мере завершения макросов
+        
+        Args:
+            count: Сколько результатов ждать
+        """
+        for _ in range(count):
+            result = self.result_queue.get()
+            instance_id = result['instance_id']
+            self.results[instance_id] = result
             
-            if result.returncode == 0:
-                print(f"✅ Instance #{instance_id}: Макрос завершен успешно")
+            if result['success']:
+                print(f"✅ Instance #{instance_id}: Макрос завершен успешно "
+                      f"({result['seconds']:.1f}с, запуск {result['startup'] * 1000:.0f}мс)")
             else:
-                print(f"❌ Instance #{instance_id}: Ошибка выполнения")
-            
-        except Exception as e:
-            print(f"❌ Instance #{instance_id}: {e}")
-            self.results[instance_id] = {'success': False, 'error': str(e)}
+                print(f"❌ Instance #{instance_id}: Ошибка выполнения: {result['error']}")
+    
+    def stop_workers(self):
+        """Останавливает воркеры экземпляров"""
+        for worker in self.workers.values():
+            worker.stop()
+        for worker in self.workers.values():
+            worker.join()
+        self.workers = {}
     
     def run_parallel(self, macro_file=None, url="https://tiktok.com"):
         """
@@ -193,6 +189,11 @@ class ParallelMacroRunner:
         
         print("="*60)
         
+        # Проверка макросов до запуска Chrome (битый макрос упал бы в каждом окне)
+        macros = set(self.custom_macros) | ({macro_file} if macro_file else set())
+        if not self.validate_macros(macros):
+            return
+        
         # Создаем или подключаемся к экземплярам Chrome
         for i in range(self.num_instances):
             if self.use_existing:
@@ -209,7 +210,7 @@ class ParallelMacroRunner:
         
         print(f"\n✅ Запущено {len(self.drivers)} экземпляров Chrome\n")
         
-        # Запускаем макросы в потоках
+        # Запускаем макросы в воркерах экземпляров
         for instance_id, driver in self.drivers:
             # Определяем макрос для этого экземпляра
             current_macro = self.custom_macros[instance_id] if instance_id < len(self.custom_macros) else macro_file
@@ -217,20 +218,32 @@ class ParallelMacroRunner:
             # Определяем URL для этого экземпляра
             current_url = self.custom_urls[instance_id] if instance_id < len(self.custom_urls) else url
             
-            thread = threading.Thread(
-                target=self.run_macro_in_instance,
-                args=(driver, instance_id, current_macro, current_url)
-            )
-            thread.start()
-            self.threads.append(thread)
+            self.run_macro_in_instance(driver, instance_id, current_macro, current_url)
         
-        # Ждем завершения всех потоков
-        for thread in self.threads:
-            thread.join()
+        # Результаты приходят по мере завершения
+        self.collect_results(len(self.drivers))
+        self.stop_workers()
         
         # Статистика
         self.print_results()
     
+    def validate_macros(self, macro_files):
+        """
+        Статическая проверка макросов (src/core/atlas_validator)
+        
+        Returns:
+            True если ошибок нет
+        """
+        ok = True
+        for macro_file in sorted(macro_files):
+            report = validate_file(macro_file)
+            for issue in report.issues:
+                print(f"   {issue}")
+            if not report.ok:
+                print(f"❌ Макрос не прошел проверку: {macro_file}")
+                ok = False
+        return ok
+    
     def print_results(self):
         """Выводит результаты выполнения"""
         print("\n" + "="*60)
@@ -250,9 +263,10 @@ class ParallelMacroRunner:
     def cleanup(self):
         """Закрывает все экземпляры Chrome"""
         print("\n🧹 Закрытие экземпляров...")
+        self.stop_workers()
         for instance_id, driver in self.drivers:
             try:
-                driver.quit()
+                get_driver_pool().discard(driver)
                 print(f"✅ Chrome #{instance_id} закрыт")
             except:
                 pass
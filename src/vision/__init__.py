@@ -0,0 +1,3 @@
+"""
+Компьютерное зрение: захват экрана и поиск шаблонов
+"""
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+capture.py
+Захват экрана со сменными backend'ами
+
+- pyautogui: текущий способ (PIL Image → numpy)
+- mss: прямой захват буфера BGRA без PIL (если mss установлен)
+- replay: кадры из PNG файлов (тесты, бенчмарки, отладка без экрана)
+
+Все backend'ы отдают numpy (физическое разрешение), grayscale - одной
+конвертацией cv2.cvtColor из исходного буфера, без промежуточных копий.
+
+Выбор: аргумент get_capture_backend(name), иначе переменная окружения
+MACRO_CAPTURE (pyautogui | mss | auto | replay:<путь>), иначе pyautogui.
+mss (pip install mss) включается явно: MACRO_CAPTURE=mss.
+
+Бенчмарк:
+    python3 -m src.vision.capture --bench [--iterations 30] [--region x,y,w,h] [--replay templates/]
+"""
+
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+# Тяжелые импорты (ленивая загрузка)
+np = None
+cv2 = None
+
+CAPTURE_ENV = 'MACRO_CAPTURE'
+DEFAULT_BACKEND = 'pyautogui'  # mss - только явно (mss или auto)
+
+
+def _lazy_import_numpy():
+    """Ленивая загрузка numpy"""
+    global np
+    if np is None:
+        import numpy as _np
+        np = _np
+    return np
+
+
+def _lazy_import_cv2():
+    """Ленивая загрузка OpenCV"""
+    global cv2
+    if cv2 is None:
+        import cv2 as _cv2
+        cv2 = _cv2
+    return cv2
+
+
+def _to_gray(frame: 'np.ndarray', channel_order: str) -> 'np.ndarray':
+    """Одна конвертация исходного буфера в grayscale"""
+    cv2_lib = _lazy_import_cv2()
+    if frame.ndim == 2:
+        return frame
+    if frame.shape[2] == 4:
+        code = cv2_lib.COLOR_BGRA2GRAY if channel_order == 'bgr' else cv2_lib.COLOR_RGBA2GRAY
+    else:
+        code = cv2_lib.COLOR_BGR2GRAY if channel_order == 'bgr' else cv2_lib.COLOR_RGB2GRAY
+    return cv2_lib.cvtColor(frame, code)
+
+
+def _to_rgb(frame: 'np.ndarray', channel_order: str) -> 'np.ndarray':
+    """Исходный буфер → RGB (3 канала)"""
+    cv2_lib = _lazy_import_cv2()
+    if frame.ndim == 2:
+        return cv2_lib.cvtColor(frame, cv2_lib.COLOR_GRAY2RGB)
+    if frame.shape[2] == 4:
+        code = cv2_lib.COLOR_BGRA2RGB if channel_order == 'bgr' else cv2_lib.COLOR_RGBA2RGB
+        return cv2_lib.cvtColor(frame, code)
+    if channel_order == 'bgr':
+        return cv2_lib.cvtColor(frame, cv2_lib.COLOR_BGR2RGB)
+    return frame
+
+
+class CaptureBackend:
+    """
+    Базовый backend захвата
+    
+    region везде (x, y, w, h) в тех же координатах, что у
+    pyautogui.screenshot(region=...) - логические координаты экрана.
+    """
+    name = 'base'
+    channel_order = 'rgb'  # Порядок каналов буфера grab_raw
+    
+    def grab_raw(self, region: Optional[Sequence[int]] = None) -> 'np.ndarray':
+        """Исходный буфер (без конвертаций)"""
+        raise NotImplementedError
+    
+    def grab_gray(self, region: Optional[Sequence[int]] = None) -> 'np.ndarray':
+        """Кадр в grayscale (физическое разрешение)"""
+        return _to_gray(self.grab_raw(region), self.channel_order)
+    
+    def grab_rgb(self, region: Optional[Sequence[int]] = None) -> 'np.ndarray':
+        """Кадр в RGB (физическое разрешение)"""
+        return _to_rgb(self.grab_raw(region), self.channel_order)
+    
+    def close(self):
+        """Освободить ресурсы backend'а"""
+
+
+class PyAutoGuiCapture(CaptureBackend):
+    """pyautogui.screenshot() (PIL Image)"""
+    name = 'pyautogui'
+    
+    def grab_raw(self, region: Optional[Sequence[int]] = None) -> 'np.ndarray':
+        import pyautogui
+        np_lib = _lazy_import_numpy()
+        
+        if region is not None:
+            screenshot = pyautogui.screenshot(region=tuple(int(v) for v in region))
+        else:
+            screenshot = pyautogui.screenshot()
+        # asarray: буфер PIL без лишней копии np.array
+        return np_lib.asarray(screenshot)
+
+
+class MssCapture(CaptureBackend):
+    """mss: прямой захват BGRA буфера (без PIL)"""
+    name = 'mss'
+    channel_order = 'bgr'
+    
+    def __init__(self):
+        import mss  # ImportError → backend недоступен
+        self._mss = mss
+        # mss не потокобезопасен: свой экземпляр на поток
+        self._local = threading.local()
+    
+    def _sct(self):
+        sct = getattr(self._local, 'sct', None)
+        if sct is None:
+            sct = self._mss.mss()
+            self._local.sct = sct
+        return sct
+    
+    def grab_raw(self, region: Optional[Sequence[int]] = None) -> 'np.ndarray':
+        np_lib = _lazy_import_numpy()
+        sct = self._sct()
+        
+        if region is not None:
+            x, y, w, h = (int(v) for v in region)
+            monitor = {'left': x, 'top': y, 'width': w, 'height': h}
+        else:
+            monitor = sct.monitors[1]  # Основной монитор
+        
+        shot = sct.grab(monitor)
+        # Буфер BGRA как numpy без копирования
+        return np_lib.frombuffer(shot.raw, dtype=np_lib.uint8).reshape(shot.height, shot.width, 4)
+    
+    def close(self):
+        sct = getattr(self._local, 'sct', None)
+        if sct is not None:
+            sct.close()
+            self._local.sct = None
+
+
+class ReplayCapture(CaptureBackend):
+    """Кадры из PNG файлов по кругу (вместо экрана)"""
+    name = 'replay'
+    channel_order = 'bgr'
+    
+    def __init__(self, source, display_scale: float = 1.0, loop: bool = True):
+        """
+        Args:
+            source: PNG файл, папка с PNG (по имени) или список numpy кадров
+            display_scale: Физических пикселей на логический (для region)
+            loop: После последнего кадра начать сначала (иначе повторять последний)
+        """
+        if isinstance(source, (str, Path)):
+            source = Path(source)
+            paths = sorted(source.glob('*.png')) if source.is_dir() else [source]
+            cv2_lib = _lazy_import_cv2()
+            frames = [cv2_lib.imread(str(p), cv2_lib.IMREAD_COLOR) for p in paths]
+            frames = [f for f in frames if f is not None]
+        else:
+            frames = list(source)
+        
+        if not frames:
+            raise ValueError(f"Нет кадров для replay: {source}")
+        
+        self.frames = frames
+        self.display_scale = display_scale
+        self.loop = loop
+        self._position = 0
+        self._lock = threading.Lock()
+    
+    def grab_raw(self, region: Optional[Sequence[int]] = None) -> 'np.ndarray':
+        with self._lock:
+            frame = self.frames[self._position]
+            if self._position + 1 < len(self.frames):
+                self._position += 1
+            elif self.loop:
+                self._position = 0
+        
+        if region is not None:
+            x, y, w, h = (int(round(v * self.display_scale)) for v in region)
+            frame = frame[y:y + h, x:x + w]
+        return frame
+
+
+def get_capture_backend(name: Optional[str] = None) -> CaptureBackend:
+    """
+    Backend захвата по имени
+    
+    Args:
+        name: pyautogui | mss | auto | replay:<путь>
+              (по умолчанию переменная MACRO_CAPTURE, иначе pyautogui)
+    """
+    name = (name or os.environ.get(CAPTURE_ENV) or DEFAULT_BACKEND).strip()
+    
+    if name.startswith('replay:'):
+        return ReplayCapture(name.split(':', 1)[1])
+    
+    name = name.lower()
+    if name in ('mss', 'auto'):
+        try:
+            return MssCapture()
+        except ImportError:
+            if name == 'mss':
+                print("⚠️  mss не установлен (pip install mss), используем pyautogui")
+    elif name != 'pyautogui':
+        print(f"⚠️  Неизвестный backend захвата: {name}, используем pyautogui")
+    
+    return PyAutoGuiCapture()
+
+
+def benchmark(backends: List[CaptureBackend], iterations: int = 30,
+              region: Optional[Sequence[int]] = None) -> Dict[str, float]:
+    """
+    Среднее время grab_gray каждого backend'а (мс)
+    
+    Args:
+        backends: Backend'ы для сравнения
+        iterations: Захватов на backend
+        region: Область захвата (None - весь экран)
+    """
+    results = {}
+    for backend in backends:
+        try:
+            backend.grab_gray(region)  # Прогрев
+        except Exception as e:
+            print(f"⏭️  {backend.name}: {e}")
+            continue
+        start = time.perf_counter()
+        for _ in range(iterations):
+            backend.grab_gray(region)
+        results[backend.name] = (time.perf_counter() - start) / iterations * 1000
+    return results
+
+
+def main():
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Бенчмарк backend\'ов захвата экрана')
+    parser.add_argument('--bench', action='store_true', help='Сравнить доступные backend\'ы')
+    parser.add_argument('--iterations', type=int, default=30, help='Захватов на backend')
+    parser.add_argument('--region', help='Область x,y,w,h (логические координаты)')
+    parser.add_argument('--replay', help='Добавить replay backend (PNG файл или папка)')
+    args = parser.parse_args()
+    
+    if not args.bench:
+        parser.print_help()
+        return
+    
+    backends = []
+    for name in ('pyautogui', 'mss'):
+        try:
+            backends.append(MssCapture() if name == 'mss' else PyAutoGuiCapture())
+        except ImportError:
+            print(f"⏭️  {name}: не установлен")
+    if args.replay:
+        backends.append(ReplayCapture(args.replay))
+    
+    region = [int(v) for v in args.region.split(',')] if args.region else None
+    
+    print(f"📸 Захват экрана: {args.iterations} кадров, область: {region or 'весь экран'}")
+    for name, ms in benchmark(backends, args.iterations, region).items():
+        print(f"   {name:10s} {ms:7.1f} мс/кадр ({1000 / ms:.0f} FPS)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+frame_cache.py
+Общий кэш кадра экрана для поиска шаблонов
+
+Экран захватывается один раз за тик опроса, и один и тот же
+grayscale кадр (numpy) отдается всем поискам шаблонов в этом тике.
+Кадр старше max_age считается устаревшим и захватывается заново.
+"""
+
+import time
+import threading
+from typing import Callable, Optional
+
+from .capture import CaptureBackend, get_capture_backend
+
+# Максимальный возраст кадра по умолчанию (сек)
+DEFAULT_MAX_AGE = 0.1
+
+
+class FrameCache:
+    """Кэш grayscale кадра на один тик опроса"""
+    
+    def __init__(self, grabber: Optional[Callable[[], 'np.ndarray']] = None,
+                 max_age: float = DEFAULT_MAX_AGE, capture: Optional[CaptureBackend] = None):
+        """
+        Args:
+            grabber: Функция захвата кадра (по умолчанию capture.grab_gray)
+            max_age: Максимальный возраст кадра в секундах (0 = всегда новый кадр)
+            capture: Backend захвата (по умолчанию get_capture_backend())
+        """
+        if grabber is None:
+            grabber = (capture or get_capture_backend()).grab_gray
+        self.grabber = grabber
+        self.max_age = max_age
+        self._frame = None
+        self._timestamp = 0.0
+        self._lock = threading.Lock()
+        self.stats = {
+            'grabs': 0,
+            'hits': 0,
+        }
+    
+    def get_gray(self) -> 'np.ndarray':
+        """Получить текущий grayscale кадр (из кэша или новый захват)"""
+        with self._lock:
+            now = time.monotonic()
+            if self._frame is not None and now - self._timestamp <= self.max_age:
+                self.stats['hits'] += 1
+                return self._frame
+            
+            self._frame = self.grabber()
+            self._timestamp = time.monotonic()
+            self.stats['grabs'] += 1
+            return self._frame
+    
+    def invalidate(self):
+        """Сбросить кадр (новый тик опроса или экран мог измениться)"""
+        with self._lock:
+            self._frame = None
+            self._timestamp = 0.0
+    
+    @property
+    def age(self) -> Optional[float]:
+        """Возраст текущего кадра в секундах (None если кадра нет)"""
+        if self._frame is None:
+            return None
+        return time.monotonic() - self._timestamp
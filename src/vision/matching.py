@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+matching.py
+Быстрые примитивы template matching (NumPy/OpenCV)
+
+- extract_peaks: выделение пиков карты matchTemplate с подавлением
+  близких дубликатов (NMS) без квадратичного цикла на Python
+- pyramid_match: поиск от грубого к точному (¼ → ½ → полное разрешение)
+"""
+
+import math
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Тяжелые импорты (ленивая загрузка)
+np = None
+cv2 = None
+
+# Уровни пирамиды (доли полного разрешения, от грубого к точному)
+PYRAMID_LEVELS = (0.25, 0.5)
+# Минимальная сторона шаблона на уровне пирамиды (px)
+PYRAMID_MIN_TEMPLATE_SIDE = 8
+# Насколько ниже threshold допускаются кандидаты на грубых уровнях
+PYRAMID_COARSE_MARGIN = 0.15
+# Максимум кандидатов с грубого уровня
+PYRAMID_MAX_CANDIDATES = 20
+# Запас окна уточнения (px текущего уровня)
+PYRAMID_REFINE_PADDING = 2
+
+
+def _lazy_import_numpy():
+    """Ленивая загрузка numpy"""
+    global np
+    if np is None:
+        import numpy as _np
+        np = _np
+    return np
+
+
+def _lazy_import_cv2():
+    """Ленивая загрузка OpenCV"""
+    global cv2
+    if cv2 is None:
+        import cv2 as _cv2
+        cv2 = _cv2
+    return cv2
+
+
+def extract_peaks(res: 'np.ndarray', threshold: float, min_distance: int,
+                  top_k: Optional[int] = None) -> List[Tuple[int, int, float]]:
+    """
+    Пики карты совпадений выше threshold с подавлением дубликатов
+    
+    Жадный NMS: берется лучший оставшийся пик, все кандидаты ближе
+    min_distance по обеим осям (квадрат, как в старом фильтре) отбрасываются.
+    Результат совпадает со старым фильтром: при равном score раньше идет
+    точка раньше в порядке строк.
+    
+    Args:
+        res: Карта matchTemplate (float32)
+        threshold: Минимальный score
+        min_distance: Дистанция подавления в пикселях карты
+        top_k: Максимум пиков (None = все)
+    
+    Returns:
+        [(x, y, score), ...] отсортировано по score (лучшие первые)
+    """
+    np_lib = _lazy_import_numpy()
+    
+    ys, xs = np_lib.nonzero(res >= threshold)
+    if len(xs) == 0:
+        return []
+    
+    return _suppress(xs, ys, res[ys, xs], min_distance, top_k)
+
+
+def _suppress(xs: 'np.ndarray', ys: 'np.ndarray', scores: 'np.ndarray', min_distance: int,
+              top_k: Optional[int] = None) -> List[Tuple[int, int, float]]:
+    """Жадный NMS по массивам координат и score"""
+    np_lib = _lazy_import_numpy()
+    
+    order = np_lib.argsort(-scores, kind='stable')
+    xs = xs[order]
+    ys = ys[order]
+    scores = scores[order]
+    
+    peaks = []
+    while len(xs) > 0:
+        x, y, score = int(xs[0]), int(ys[0]), float(scores[0])
+        peaks.append((x, y, score))
+        if top_k is not None and len(peaks) >= top_k:
+            break
+        
+        # Убрать всех соседей выбранного пика одной векторной операцией
+        keep = (np_lib.abs(xs - x) >= min_distance) | (np_lib.abs(ys - y) >= min_distance)
+        xs = xs[keep]
+        ys = ys[keep]
+        scores = scores[keep]
+    
+    return peaks
+
+
+def resize_image(image: 'np.ndarray', scale: float) -> 'np.ndarray':
+    """Масштабирование изображения (INTER_AREA при уменьшении, INTER_LINEAR при увеличении)"""
+    if scale == 1.0:
+        return image
+    cv2_lib = _lazy_import_cv2()
+    height, width = image.shape[:2]
+    size = (max(1, int(round(width * scale))), max(1, int(round(height * scale))))
+    interpolation = cv2_lib.INTER_AREA if scale < 1.0 else cv2_lib.INTER_LINEAR
+    return cv2_lib.resize(image, size, interpolation=interpolation)
+
+
+def pyramid_match(image: 'np.ndarray', template: 'np.ndarray', threshold: float, min_distance: int,
+                  levels: Sequence[float] = PYRAMID_LEVELS, top_k: Optional[int] = None,
+                  coarse_margin: float = PYRAMID_COARSE_MARGIN,
+                  max_candidates: int = PYRAMID_MAX_CANDIDATES,
+                  template_levels: Optional[Dict[float, 'np.ndarray']] = None) -> Optional[List[Tuple[int, int, float]]]:
+    """
+    Поиск от грубого к точному
+    
+    Кандидаты ищутся на самом грубом уровне (порог снижен на coarse_margin),
+    затем уточняются в маленьких окнах на следующих уровнях. Итоговый score
+    считается TM_CCOEFF_NORMED на полном разрешении, поэтому threshold
+    означает то же, что и при полном поиске.
+    
+    Args:
+        image: Кадр (grayscale)
+        template: Шаблон (grayscale)
+        threshold: Порог на полном разрешении
+        min_distance: Дистанция подавления дубликатов (px полного разрешения)
+        levels: Доли разрешения, например (0.25, 0.5)
+        top_k: Максимум совпадений
+        coarse_margin: Снижение порога на грубых уровнях
+        max_candidates: Максимум кандидатов с грубого уровня
+        template_levels: Готовые уменьшенные шаблоны {scale: array}
+            (TemplateStore), иначе уменьшаются на лету
+    
+    Returns:
+        [(x, y, score), ...] как у extract_peaks, или None если шаблон
+        слишком мал для пирамиды (нужен обычный поиск)
+    """
+    np_lib = _lazy_import_numpy()
+    cv2_lib = _lazy_import_cv2()
+    
+    th, tw = template.shape[:2]
+    scales = sorted(s for s in levels
+                    if 0 < s < 1 and min(th, tw) * s >= PYRAMID_MIN_TEMPLATE_SIDE)
+    if not scales:
+        return None
+    
+    def scaled_template(scale):
+        if template_levels and scale in template_levels:
+            return template_levels[scale]
+        return resize_image(template, scale)
+    
+    # 1. Грубый уровень: кандидаты по всему уменьшенному кадру
+    coarse = scales[0]
+    res = cv2_lib.matchTemplate(resize_image(image, coarse), scaled_template(coarse), cv2_lib.TM_CCOEFF_NORMED)
+    coarse_peaks = extract_peaks(res, threshold - coarse_margin,
+                                 max(1, int(min_distance * coarse)), top_k=max_candidates)
+    
+    # Позиции кандидатов в координатах полного разрешения
+    candidates = [(x / coarse, y / coarse) for x, y, _ in coarse_peaks]
+    
+    # 2. Уточнение: каждый следующий уровень ищет только в окнах вокруг кандидатов
+    prev_scale = coarse
+    for scale in scales[1:] + [1.0]:
+        level_image = resize_image(image, scale)
+        level_template = scaled_template(scale)
+        lh, lw = level_image.shape[:2]
+        ltw_h, ltw_w = level_template.shape[:2]
+        level_threshold = threshold if scale == 1.0 else threshold - coarse_margin
+        
+        # Ошибка позиции: 1 px предыдущего уровня = scale/prev_scale px текущего
+        radius = int(math.ceil(scale / prev_scale)) + PYRAMID_REFINE_PADDING
+        
+        refined = []
+        for px, py in candidates:
+            cx, cy = int(round(px * scale)), int(round(py * scale))
+            x0, y0 = max(0, cx - radius), max(0, cy - radius)
+            x1, y1 = min(lw, cx + radius + ltw_w), min(lh, cy + radius + ltw_h)
+            if x1 - x0 < ltw_w or y1 - y0 < ltw_h:
+                continue
+            
+            window_res = cv2_lib.matchTemplate(level_image[y0:y1, x0:x1], level_template,
+                                               cv2_lib.TM_CCOEFF_NORMED)
+            _, max_val, _, max_loc = cv2_lib.minMaxLoc(window_res)
+            if max_val >= level_threshold:
+                refined.append(((max_loc[0] + x0) / scale, (max_loc[1] + y0) / scale, float(max_val)))
+        
+        candidates = [(x, y) for x, y, _ in refined]
+        prev_scale = scale
+    
+    if not refined:
+        return []
+    
+    xs = np_lib.array([int(x) for x, _, _ in refined])
+    ys = np_lib.array([int(y) for _, y, _ in refined])
+    scores = np_lib.array([score for _, _, score in refined], dtype=np_lib.float32)
+    return _suppress(xs, ys, scores, min_distance, top_k)
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+multi_template.py
+Поиск нескольких шаблонов-кандидатов за один проход
+
+Все кандидаты из списка `templates:` проверяются на одном и том же
+кадре в каждом тике опроса, побеждает лучшее совпадение по всему набору.
+Худшая задержка: один timeout вместо N×timeout.
+
+Формат в YAML:
+    templates:
+      - templates/send_btn_long.png          # threshold шага
+      - template: templates/send_btn.png     # свой threshold
+        threshold: 0.8
+"""
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+
+@dataclass
+class TemplateCandidate:
+    """Шаблон-кандидат со своим порогом"""
+    path: str
+    threshold: float
+
+
+def parse_template_candidates(step: Dict[str, Any], default_threshold: float) -> List[TemplateCandidate]:
+    """
+    Собирает список кандидатов из шага click
+    
+    Args:
+        step: Шаг с полем template или templates
+        default_threshold: Порог по умолчанию
+    
+    Returns:
+        Список кандидатов (пустой если шаблоны не указаны)
+    """
+    threshold = float(step.get('threshold', default_threshold))
+    
+    templates = step.get('templates')
+    if templates:
+        entries = templates if isinstance(templates, list) else [templates]
+    elif step.get('template'):
+        entries = [step['template']]
+    else:
+        return []
+    
+    candidates = []
+    for entry in entries:
+        if isinstance(entry, dict):
+            path = entry.get('template') or entry.get('path')
+            if not path:
+                continue
+            candidates.append(TemplateCandidate(path, float(entry.get('threshold', threshold))))
+        else:
+            candidates.append(TemplateCandidate(str(entry), threshold))
+    
+    return candidates
+
+
+def pick_best_hit(hits: List[Tuple[TemplateCandidate, list]]) -> Optional[Tuple[TemplateCandidate, list]]:
+    """
+    Выбирает кандидата с лучшим совпадением
+    
+    Args:
+        hits: Пары (кандидат, совпадения отсортированные по score)
+    
+    Returns:
+        (кандидат, его совпадения) или None если никто не найден.
+        При равном score побеждает кандидат раньше в списке.
+    """
+    best = None
+    best_score = None
+    
+    for candidate, matches in hits:
+        if not matches:
+            continue
+        score = matches[0]['score']
+        if best_score is None or score > best_score:
+            best = (candidate, matches)
+            best_score = score
+    
+    return best
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+multiscale.py
+Поиск шаблона в нескольких масштабах
+
+Шаблон, снятый на Retina (2x), не находится на внешнем мониторе 1x
+или после изменения zoom в браузере. Поиск перебирает небольшой набор
+масштабов вокруг display_scale, запоминает победивший масштаб для
+каждого шаблона и при следующих поисках сразу использует его.
+"""
+
+import json
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Display scale, на котором обычно снимаются шаблоны (1x и Retina 2x)
+CAPTURE_SCALES = (2.0, 1.0)
+# Типичные шаги zoom браузера относительно базового масштаба
+ZOOM_FACTORS = (0.9, 1.1, 0.8, 1.25)
+# Границы разумного масштаба шаблона
+MIN_TEMPLATE_SCALE = 0.25
+MAX_TEMPLATE_SCALE = 4.0
+
+# Файл с победившими масштабами (переживает перезапуск)
+SCALE_CACHE_FILE = Path(".cache") / "template_scales.json"
+
+
+def candidate_scales(display_scale: float, zoom_factors=ZOOM_FACTORS) -> List[float]:
+    """
+    Масштабы шаблона для перебора (первым - 1.0, без изменения)
+    
+    Args:
+        display_scale: Текущий Retina scale
+        zoom_factors: Дополнительные множители (zoom браузера)
+    
+    Returns:
+        Уникальные масштабы в порядке проверки
+    """
+    bases = [1.0] + [display_scale / capture for capture in CAPTURE_SCALES]
+    
+    scales = []
+    for base in bases:
+        for factor in (1.0,) + tuple(zoom_factors):
+            scale = round(base * factor, 3)
+            if MIN_TEMPLATE_SCALE <= scale <= MAX_TEMPLATE_SCALE and scale not in scales:
+                scales.append(scale)
+    return scales
+
+
+class ScaleCache:
+    """Победивший масштаб каждого шаблона (ключ: путь + display scale)"""
+    
+    def __init__(self, cache_file: Optional[Path] = SCALE_CACHE_FILE):
+        self.cache_file = Path(cache_file) if cache_file else None
+        self._scales: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._load()
+    
+    @staticmethod
+    def _key(template_path: str, display_scale: float) -> str:
+        return f"{round(float(display_scale), 2)}|{template_path}"
+    
+    def _load(self):
+        """Загрузка сохраненных масштабов"""
+        if not self.cache_file or not self.cache_file.exists():
+            return
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                self._scales = {k: float(v) for k, v in json.load(f).items()}
+        except Exception:
+            self._scales = {}
+    
+    def _save(self):
+        """Сохранение масштабов (ошибки записи не критичны)"""
+        if not self.cache_file:
+            return
+        try:
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = self.cache_file.with_suffix('.tmp')
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(self._scales, f, indent=2, ensure_ascii=False)
+            tmp_file.replace(self.cache_file)
+        except Exception:
+            pass
+    
+    def get(self, template_path: str, display_scale: float) -> Optional[float]:
+        """Запомненный масштаб шаблона (None если еще не искали)"""
+        return self._scales.get(self._key(template_path, display_scale))
+    
+    def remember(self, template_path: str, display_scale: float, scale: float):
+        """Запомнить победивший масштаб"""
+        key = self._key(template_path, display_scale)
+        with self._lock:
+            if self._scales.get(key) == scale:
+                return
+            self._scales[key] = scale
+            self._save()
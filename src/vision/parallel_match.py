@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+parallel_match.py
+Параллельный template matching в пуле потоков
+
+OpenCV отпускает GIL внутри matchTemplate, поэтому потоки реально
+занимают несколько ядер:
+- шаг с несколькими шаблонами: каждый шаблон в своем потоке
+- один большой кадр (5K): карта совпадений считается горизонтальными
+  полосами с перекрытием в высоту шаблона и склеивается обратно
+
+Порядок результатов детерминирован (как при последовательном поиске).
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, List, Optional
+
+# Тяжелые импорты (ленивая загрузка)
+np = None
+cv2 = None
+
+# Максимум потоков по умолчанию (auto)
+MAX_AUTO_WORKERS = 8
+# Минимальная высота полосы карты совпадений (строк) - мельче не делим
+MIN_TILE_ROWS = 96
+
+
+def _lazy_import_numpy():
+    """Ленивая загрузка numpy"""
+    global np
+    if np is None:
+        import numpy as _np
+        np = _np
+    return np
+
+
+def _lazy_import_cv2():
+    """Ленивая загрузка OpenCV"""
+    global cv2
+    if cv2 is None:
+        import cv2 as _cv2
+        cv2 = _cv2
+    return cv2
+
+
+def resolve_workers(value) -> int:
+    """
+    Количество потоков из settings/шага
+    
+    Args:
+        value: Число, 'auto' или None (auto = ядра, но не больше MAX_AUTO_WORKERS)
+    """
+    if value is None or str(value).strip().lower() == 'auto':
+        return max(1, min(os.cpu_count() or 1, MAX_AUTO_WORKERS))
+    try:
+        return max(1, int(value))
+    except (TypeError, ValueError):
+        print(f"⚠️  Неверное значение match_workers: {value}, используем 1")
+        return 1
+
+
+class MatchPool:
+    """Пул потоков для поиска шаблонов (создается при первом использовании)"""
+    
+    def __init__(self, workers: int = 1):
+        """
+        Args:
+            workers: Максимум потоков (1 = последовательный поиск)
+        """
+        self.workers = max(1, int(workers))
+        self._executor = None
+        self._lock = threading.Lock()
+    
+    def map(self, func: Callable, items: Iterable, workers: Optional[int] = None) -> List:
+        """
+        Применить func ко всем items (результаты в исходном порядке)
+        
+        Args:
+            func: Функция одного элемента
+            items: Элементы
+            workers: Ограничение потоков для этого вызова
+        """
+        items = list(items)
+        limit = self.workers if workers is None else min(self.workers, max(1, int(workers)))
+        limit = min(limit, len(items))
+        if limit <= 1:
+            return [func(item) for item in items]
+        
+        executor = self._get_executor()
+        if limit == min(self.workers, len(items)):
+            return list(executor.map(func, items))
+        
+        # Лимит меньше пула: limit последовательных пачек, не больше limit потоков сразу
+        chunks = [items[len(items) * i // limit:len(items) * (i + 1) // limit] for i in range(limit)]
+        results = executor.map(lambda chunk: [func(item) for item in chunk], chunks)
+        return [result for chunk in results for result in chunk]
+    
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                    thread_name_prefix='match')
+            return self._executor
+    
+    def shutdown(self):
+        """Остановить потоки пула"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+
+def tile_rows(result_rows: int, tiles: int) -> List[tuple]:
+    """Разбиение строк карты совпадений на полосы [(y0, y1), ...]"""
+    tiles = max(1, min(tiles, result_rows // MIN_TILE_ROWS))
+    bounds = [result_rows * i // tiles for i in range(tiles + 1)]
+    return [(bounds[i], bounds[i + 1]) for i in range(tiles)]
+
+
+def tiled_match_template(image: 'np.ndarray', template: 'np.ndarray', pool: MatchPool,
+                         workers: Optional[int] = None) -> 'np.ndarray':
+    """
+    cv2.matchTemplate(TM_CCOEFF_NORMED) полосами в пуле потоков
+    
+    Полоса карты [y0, y1) считается по строкам кадра [y0, y1 + h - 1),
+    поэтому склеенная карта совпадает с картой полного поиска.
+    
+    Args:
+        image: Кадр (grayscale)
+        template: Шаблон
+        pool: Пул потоков
+        workers: Ограничение потоков (по умолчанию весь пул)
+    """
+    np_lib = _lazy_import_numpy()
+    cv2_lib = _lazy_import_cv2()
+    
+    h = template.shape[0]
+    result_rows = image.shape[0] - h + 1
+    tiles = pool.workers if workers is None else min(pool.workers, workers)
+    bands = tile_rows(result_rows, tiles) if result_rows > 0 else []
+    
+    if len(bands) <= 1:
+        return cv2_lib.matchTemplate(image, template, cv2_lib.TM_CCOEFF_NORMED)
+    
+    def match_band(band):
+        y0, y1 = band
+        return cv2_lib.matchTemplate(image[y0:y1 + h - 1], template, cv2_lib.TM_CCOEFF_NORMED)
+    
+    return np_lib.vstack(pool.map(match_band, bands, workers=tiles))
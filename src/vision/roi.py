@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+roi.py
+Поиск в области интереса (ROI) по последним найденным позициям
+
+Движок запоминает, где шаблон был найден в последний раз (ключ:
+путь шаблона + display scale), и сначала ищет в окне с отступом вокруг
+этого места. Весь кадр сканируется только при промахе.
+
+Кнопки интерфейса (например Chrome-TikTok-Like) почти не двигаются,
+поэтому большинство поисков касается малой доли пикселей.
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Минимальный отступ вокруг последней позиции (физические пиксели)
+ROI_MIN_PADDING = 48
+# Отступ относительно размера шаблона
+ROI_PADDING_RATIO = 0.5
+
+# Окно поиска: (x0, y0, x1, y1) в физических пикселях кадра
+Window = Tuple[int, int, int, int]
+
+
+class RoiTracker:
+    """Память последних позиций шаблонов"""
+    
+    def __init__(self, min_padding: int = ROI_MIN_PADDING, padding_ratio: float = ROI_PADDING_RATIO):
+        self.min_padding = min_padding
+        self.padding_ratio = padding_ratio
+        self._last_hits: Dict[Tuple[str, float], Window] = {}
+        self.stats = {
+            'roi_hits': 0,
+            'roi_misses': 0,
+            'full_scans': 0,
+        }
+    
+    @staticmethod
+    def _key(template_path: str, display_scale: float) -> Tuple[str, float]:
+        return (template_path, round(float(display_scale), 2))
+    
+    def record_hit(self, template_path: str, display_scale: float, top_lefts: Sequence[Tuple[int, int]],
+                   template_size: Tuple[int, int]):
+        """
+        Запоминает область всех найденных совпадений
+        
+        Args:
+            template_path: Путь к шаблону
+            display_scale: Текущий display scale
+            top_lefts: Левые верхние углы совпадений (физические пиксели)
+            template_size: (ширина, высота) шаблона
+        """
+        if not top_lefts:
+            return
+        w, h = template_size
+        xs = [int(pt[0]) for pt in top_lefts]
+        ys = [int(pt[1]) for pt in top_lefts]
+        self._last_hits[self._key(template_path, display_scale)] = (min(xs), min(ys), max(xs) + w, max(ys) + h)
+    
+    def last_hit(self, template_path: str, display_scale: float) -> Optional[Window]:
+        """Последняя известная область шаблона"""
+        return self._last_hits.get(self._key(template_path, display_scale))
+    
+    def padded_window(self, template_path: str, display_scale: float, frame_shape: Tuple[int, ...],
+                      template_size: Tuple[int, int]) -> Optional[Window]:
+        """Окно поиска вокруг последней позиции (None если позиция неизвестна)"""
+        bbox = self.last_hit(template_path, display_scale)
+        if bbox is None:
+            return None
+        
+        w, h = template_size
+        pad = max(self.min_padding, int(max(w, h) * self.padding_ratio))
+        return clip_window((bbox[0] - pad, bbox[1] - pad, bbox[2] + pad, bbox[3] + pad), frame_shape)
+    
+    def watch_window(self, template_paths: Sequence[str], display_scale: float,
+                     frame_shape: Tuple[int, ...]) -> Optional[Window]:
+        """
+        Общее окно вокруг последних позиций шаблонов (для ожидания по изменению кадра)
+        
+        Returns:
+            Окно, охватывающее ROI всех шаблонов, None если позиция хоть одного неизвестна
+        """
+        windows = []
+        for template_path in template_paths:
+            bbox = self.last_hit(template_path, display_scale)
+            if bbox is None:
+                return None
+            size = (bbox[2] - bbox[0], bbox[3] - bbox[1])
+            windows.append(self.padded_window(template_path, display_scale, frame_shape, size))
+        if not windows:
+            return None
+        return (min(w[0] for w in windows), min(w[1] for w in windows),
+                max(w[2] for w in windows), max(w[3] for w in windows))
+    
+    def search_windows(self, template_path: str, display_scale: float, frame_shape: Tuple[int, ...],
+                       template_size: Tuple[int, int]) -> List[Window]:
+        """
+        Порядок окон поиска: сначала ROI, потом весь кадр
+        
+        Returns:
+            Список окон (x0, y0, x1, y1)
+        """
+        full = full_window(frame_shape)
+        window = self.padded_window(template_path, display_scale, frame_shape, template_size)
+        if window is None or window == full:
+            return [full]
+        return [window, full]
+
+
+def full_window(frame_shape: Tuple[int, ...]) -> Window:
+    """Окно на весь кадр"""
+    return (0, 0, int(frame_shape[1]), int(frame_shape[0]))
+
+
+def clip_window(window: Window, frame_shape: Tuple[int, ...]) -> Window:
+    """Обрезка окна по границам кадра"""
+    height, width = int(frame_shape[0]), int(frame_shape[1])
+    x0, y0, x1, y1 = window
+    return (max(0, int(x0)), max(0, int(y0)), min(width, int(x1)), min(height, int(y1)))
+
+
+def region_to_window(region: Sequence[float], display_scale: float, frame_shape: Tuple[int, ...]) -> Window:
+    """
+    Конвертирует region шага в окно кадра
+    
+    Args:
+        region: (x, y, w, h) в логических координатах (как у pyautogui.click)
+        display_scale: Retina scale
+        frame_shape: Размер кадра (физические пиксели)
+    """
+    x, y, w, h = [float(v) for v in region]
+    return clip_window((
+        int(x * display_scale),
+        int(y * display_scale),
+        int((x + w) * display_scale),
+        int((y + h) * display_scale),
+    ), frame_shape)
+
+
+def parse_region(value) -> Optional[List[int]]:
+    """Разбор region из DSL/YAML: '100,200,400,300' или [100, 200, 400, 300]"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        parts = [p for p in value.replace('(', '').replace(')', '').split(',') if p.strip()]
+    else:
+        parts = list(value)
+    if len(parts) != 4:
+        return None
+    try:
+        return [int(float(p)) for p in parts]
+    except (TypeError, ValueError):
+        return None
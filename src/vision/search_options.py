@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+search_options.py
+Параметры поиска шаблона для одного шага click/open
+
+Собираются один раз из шага (и settings конфига) и передаются
+во все поиски шага, вместо длинного списка аргументов.
+"""
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from .roi import parse_region
+from .parallel_match import resolve_workers
+
+# Режимы поиска
+MATCH_MODE_FULL = 'full'        # matchTemplate на полном разрешении
+MATCH_MODE_PYRAMID = 'pyramid'  # от грубого к точному (¼ → ½ → 1)
+MATCH_MODES = (MATCH_MODE_FULL, MATCH_MODE_PYRAMID)
+
+
+@dataclass
+class SearchOptions:
+    """Параметры поиска шаблона"""
+    region: Optional[List[int]] = None  # (x, y, w, h) логические координаты
+    use_roi: bool = True                # Сначала искать у последней позиции
+    match_mode: str = MATCH_MODE_FULL   # full | pyramid
+    multiscale: bool = False            # Перебор масштабов шаблона
+    workers: Optional[int] = None       # Потоки поиска (None = весь пул runner)
+    max_matches: Optional[int] = None   # Максимум совпадений шаблона (None = все)
+    
+    @classmethod
+    def from_step(cls, step: Dict[str, Any], settings: Optional[Dict[str, Any]] = None) -> 'SearchOptions':
+        """
+        Параметры из шага (значения шага важнее settings конфига)
+        
+        Args:
+            step: Шаг click/open
+            settings: Секция settings конфига
+        """
+        settings = settings or {}
+        
+        match_mode = str(step.get('match_mode', settings.get('match_mode', MATCH_MODE_FULL))).lower()
+        if match_mode not in MATCH_MODES:
+            print(f"⚠️  Неизвестный match_mode: {match_mode}, используем {MATCH_MODE_FULL}")
+            match_mode = MATCH_MODE_FULL
+        
+        return cls(
+            region=parse_region(step.get('region')),
+            use_roi=_as_bool(step.get('roi', settings.get('roi', True))),
+            match_mode=match_mode,
+            multiscale=_as_bool(step.get('multiscale', settings.get('multiscale', False))),
+            workers=resolve_workers(step['match_workers']) if 'match_workers' in step else None,
+            max_matches=_as_limit(step.get('max_matches', settings.get('max_matches'))),
+        )
+
+
+def _as_bool(value) -> bool:
+    """'false'/'off'/'0' из DSL → False"""
+    if isinstance(value, str):
+        return value.strip().lower() not in ('false', 'off', 'no', '0')
+    return bool(value)
+
+
+def _as_limit(value) -> Optional[int]:
+    """Положительное число или None (0, 'all', неверное значение - без ограничения)"""
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        return None
+    return limit if limit > 0 else None
@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+template_store.py
+Постоянное хранилище предобработанных шаблонов (.cache/templates)
+
+Каждый PNG декодируется один раз: grayscale, color и уровни пирамиды
+сохраняются в .npy под ключом MD5 содержимого файла и открываются
+через memory map (read-only). Все процессы (ParallelMacroRunner,
+FileService.run_macro, воркеры) делят одни и те же страницы памяти
+вместо повторного cv2.imread.
+
+Манифест (путь → mtime, размер, хэш) позволяет не хэшировать файл
+повторно. Изменился PNG под templates/ - изменился хэш - новая запись,
+старая удаляется. Повторное обращение к шаблону в процессе - один stat
+без блокировки: (mtime, размер) те же - готовый массив, иначе PNG
+разрешается заново (долгоживущие воркеры видят измененные файлы).
+
+color.npy пишется только если store создан с color=True (runner без
+USE_GRAYSCALE) или при первом get(color=True).
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from .matching import PYRAMID_LEVELS, resize_image
+
+# Тяжелые импорты (ленивая загрузка)
+np = None
+cv2 = None
+
+TEMPLATE_STORE_DIR = Path(".cache") / "templates"
+STORE_VERSION = 1
+# Папки моложе этого возраста prune() не трогает: запись другого процесса,
+# которой еще нет в манифесте (сек)
+PRUNE_MIN_AGE = 60.0
+
+
+def _lazy_import_numpy():
+    """Ленивая загрузка numpy"""
+    global np
+    if np is None:
+        import numpy as _np
+        np = _np
+    return np
+
+
+def _lazy_import_cv2():
+    """Ленивая загрузка OpenCV"""
+    global cv2
+    if cv2 is None:
+        import cv2 as _cv2
+        cv2 = _cv2
+    return cv2
+
+
+def _signature(path: str) -> Optional[tuple]:
+    """(mtime_ns, размер) файла или None"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+class TemplateStore:
+    """Скомпилированные шаблоны с доступом через memory map"""
+    
+    def __init__(self, store_dir: Path = TEMPLATE_STORE_DIR, pyramid_levels=PYRAMID_LEVELS,
+                 color: bool = False):
+        """
+        Args:
+            store_dir: Папка хранилища
+            pyramid_levels: Масштабы уровней пирамиды
+            color: Писать color.npy при компиляции (иначе - только по запросу)
+        """
+        self.store_dir = Path(store_dir)
+        self.pyramid_levels = tuple(pyramid_levels)
+        self.color = color
+        self.manifest_file = self.store_dir / "manifest.json"
+        self._manifest = self._load_manifest()
+        self._arrays: Dict[tuple, 'np.ndarray'] = {}
+        self._resolved: Dict[tuple, tuple] = {}  # (путь, имя) → ((mtime_ns, размер), массив)
+        self._levels: Dict[str, tuple] = {}  # путь → ((mtime_ns, размер), уровни)
+        self._lock = threading.Lock()
+        self._defer_save = False  # warm(): манифест пишется один раз в конце
+        self._manifest_dirty = False
+        self.stats = {
+            'compiled': 0,
+            'mapped': 0,
+            'manifest_writes': 0,
+            'pruned': 0,
+        }
+    
+    # ==================== Манифест ====================
+    
+    def _load_manifest(self) -> dict:
+        """Загрузка манифеста (путь → mtime, размер, хэш)"""
+        try:
+            with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == STORE_VERSION:
+                return data.get('files', {})
+        except Exception:
+            pass
+        return {}
+    
+    def _save_manifest(self):
+        """Атомарная запись манифеста (несколько процессов не ломают файл)"""
+        self._manifest_dirty = False
+        self.stats['manifest_writes'] += 1
+        try:
+            self.store_dir.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.store_dir, suffix='.json')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'version': STORE_VERSION, 'files': self._manifest}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.manifest_file)
+        except Exception:
+            pass
+    
+    def content_hash(self, template_path: str) -> Optional[str]:
+        """
+        MD5 содержимого PNG (через манифест, если файл не менялся)
+        
+        Returns:
+            Хэш или None если файла нет
+        """
+        key = os.path.normpath(template_path)
+        try:
+            stat = os.stat(template_path)
+        except OSError:
+            return None
+        
+        entry = self._manifest.get(key)
+        if entry and entry['mtime_ns'] == stat.st_mtime_ns and entry['size'] == stat.st_size:
+            return entry['hash']
+        
+        with open(template_path, 'rb') as f:
+            file_hash = hashlib.md5(f.read()).hexdigest()
+        
+        self._manifest[key] = {
+            'mtime_ns': stat.st_mtime_ns,
+            'size': stat.st_size,
+            'hash': file_hash,
+        }
+        if entry and entry['hash'] != file_hash:
+            self._remove_entry(entry['hash'])
+        
+        self._manifest_dirty = True
+        if not self._defer_save:
+            self._save_manifest()
+        return file_hash
+    
+    # ==================== Компиляция ====================
+    
+    def _entry_dir(self, file_hash: str) -> Path:
+        return self.store_dir / file_hash
+    
+    def _remove_entry(self, file_hash: str):
+        """Удалить запись, если на нее не ссылается другой путь манифеста"""
+        if any(entry['hash'] == file_hash for entry in self._manifest.values()):
+            return
+        shutil.rmtree(self._entry_dir(file_hash), ignore_errors=True)
+        for key in [key for key in self._arrays if key[0] == file_hash]:
+            del self._arrays[key]
+        self.stats['pruned'] += 1
+    
+    @staticmethod
+    def _level_name(scale: float) -> str:
+        return f"gray_{scale:g}.npy"
+    
+    @staticmethod
+    def _decode(template_path: str, flags: int) -> Optional['np.ndarray']:
+        np_lib = _lazy_import_numpy()
+        cv2_lib = _lazy_import_cv2()
+        with open(template_path, 'rb') as f:
+            data = np_lib.frombuffer(f.read(), dtype=np_lib.uint8)
+        return cv2_lib.imdecode(data, flags)
+    
+    def _compile(self, template_path: str, file_hash: str) -> bool:
+        """Декодирование PNG и запись представлений в .npy (color - только если нужен)"""
+        np_lib = _lazy_import_numpy()
+        cv2_lib = _lazy_import_cv2()
+        
+        gray = self._decode(template_path, cv2_lib.IMREAD_GRAYSCALE)
+        color = self._decode(template_path, cv2_lib.IMREAD_COLOR) if self.color else None
+        if gray is None or (self.color and color is None):
+            return False
+        
+        # Пишем во временную папку и переименовываем целиком:
+        # другой процесс видит либо полную запись, либо ничего
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        tmp_dir = Path(tempfile.mkdtemp(dir=self.store_dir, prefix='.tmp-'))
+        try:
+            np_lib.save(tmp_dir / "gray.npy", gray)
+            if color is not None:
+                np_lib.save(tmp_dir / "color.npy", color)
+            for scale in self.pyramid_levels:
+                np_lib.save(tmp_dir / self._level_name(scale), resize_image(gray, scale))
+            try:
+                os.rename(tmp_dir, self._entry_dir(file_hash))
+            except OSError:
+                pass  # Запись уже создана другим процессом
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        
+        self.stats['compiled'] += 1
+        return True
+    
+    def _add_color(self, template_path: str, file_hash: str) -> bool:
+        """Дописать color.npy в готовую запись (атомарно, как и всю запись)"""
+        np_lib = _lazy_import_numpy()
+        color = self._decode(template_path, _lazy_import_cv2().IMREAD_COLOR)
+        if color is None:
+            return False
+        entry_dir = self._entry_dir(file_hash)
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=entry_dir, suffix='.npy')
+            with os.fdopen(fd, 'wb') as f:
+                np_lib.save(f, color)
+            os.replace(tmp_path, entry_dir / "color.npy")
+        except OSError:
+            return False
+        return True
+    
+    def _map(self, file_hash: str, name: str) -> Optional['np.ndarray']:
+        """Открыть .npy через memory map (read-only, с кэшем в процессе)"""
+        key = (file_hash, name)
+        if key in self._arrays:
+            return self._arrays[key]
+        
+        path = self._entry_dir(file_hash) / name
+        if not path.exists():
+            return None
+        
+        np_lib = _lazy_import_numpy()
+        array = np_lib.load(path, mmap_mode='r')
+        self._arrays[key] = array
+        self.stats['mapped'] += 1
+        return array
+    
+    # ==================== API ====================
+    
+    def get(self, template_path: str, color: bool = False) -> Optional['np.ndarray']:
+        """
+        Предобработанный шаблон (компилируется при первом обращении)
+        
+        Args:
+            template_path: Путь к PNG
+            color: True - BGR, False - grayscale
+        
+        Returns:
+            Read-only массив или None если файла нет / не декодируется
+        """
+        return self._get(template_path, "color.npy" if color else "gray.npy")
+    
+    def get_level(self, template_path: str, scale: float) -> Optional['np.ndarray']:
+        """Уровень пирамиды grayscale шаблона (например 0.25 или 0.5)"""
+        if scale not in self.pyramid_levels:
+            return None
+        return self._get(template_path, self._level_name(scale))
+    
+    def levels(self, template_path: str) -> Dict[float, 'np.ndarray']:
+        """Все предвычисленные уровни пирамиды шаблона"""
+        key = os.path.normpath(template_path)
+        signature = _signature(template_path)
+        cached = self._levels.get(key)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        
+        levels = {}
+        for scale in self.pyramid_levels:
+            level = self.get_level(template_path, scale)
+            if level is not None:
+                levels[scale] = level
+        if levels:
+            self._levels[key] = (signature, levels)
+        return levels
+    
+    def _get(self, template_path: str, name: str) -> Optional['np.ndarray']:
+        key = (os.path.normpath(template_path), name)
+        cached = self._resolved.get(key)
+        if cached is not None and cached[0] == _signature(template_path):
+            return cached[1]
+        
+        with self._lock:
+            file_hash = self.content_hash(template_path)
+            if file_hash is None:
+                return None
+            entry = self._manifest[key[0]]
+            
+            array = None
+            # Вторая попытка: запись могла удалить другой процесс между проверкой и чтением
+            for _ in range(2):
+                if not self._entry_dir(file_hash).exists():
+                    if not self._compile(template_path, file_hash):
+                        return None
+                array = self._map(file_hash, name)
+                if array is None and name == "color.npy":
+                    # Запись без color.npy (store только grayscale)
+                    if not self._add_color(template_path, file_hash):
+                        return None
+                    array = self._map(file_hash, name)
+                if array is not None:
+                    break
+            
+            if array is not None:
+                self._resolved[key] = ((entry['mtime_ns'], entry['size']), array)
+            return array
+    
+    def warm(self, templates_dir: str = "templates") -> int:
+        """
+        Компиляция всех PNG под templates_dir
+        
+        Returns:
+            Количество шаблонов в хранилище
+        """
+        count = 0
+        self._defer_save = True
+        try:
+            for png_file in sorted(Path(templates_dir).rglob("*.png")):
+                if self.get(str(png_file)) is not None:
+                    count += 1
+        finally:
+            with self._lock:
+                self._defer_save = False
+                if self._manifest_dirty:
+                    self._save_manifest()
+        self.prune()
+        return count
+    
+    def prune(self, min_age: float = PRUNE_MIN_AGE) -> int:
+        """
+        Удаление записей, на которые не ссылается манифест
+        (прежние версии PNG, удаленные файлы, брошенные временные папки)
+        
+        Args:
+            min_age: Не трогать папки моложе (сек)
+        
+        Returns:
+            Количество удаленных папок
+        """
+        if not self.store_dir.exists():
+            return 0
+        
+        with self._lock:
+            stale = [key for key in self._manifest if not os.path.exists(key)]
+            for key in stale:
+                del self._manifest[key]
+            if stale:
+                self._save_manifest()
+            
+            # Записи, которые использует другой процесс, остаются
+            referenced = {entry['hash'] for entry in self._manifest.values()}
+            referenced.update(entry['hash'] for key, entry in self._load_manifest().items()
+                              if os.path.exists(key))
+            
+            removed = 0
+            now = time.time()
+            for path in self.store_dir.iterdir():
+                if not path.is_dir() or path.name in referenced:
+                    continue
+                try:
+                    if now - path.stat().st_mtime < min_age:
+                        continue
+                except OSError:
+                    continue
+                shutil.rmtree(path, ignore_errors=True)
+                for key in [key for key in self._arrays if key[0] == path.name]:
+                    del self._arrays[key]
+                removed += 1
+            
+            self.stats['pruned'] += removed
+            return removed
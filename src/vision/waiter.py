@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+waiter.py
+Ожидание появления шаблона по изменению кадра
+
+Вместо фиксированного опроса раз в 0.5с кадры проверяются часто,
+но полный template matching запускается только если нужная область
+экрана изменилась. Пока экран статичен, интервал опроса растет
+(адаптивный backoff), при изменениях - снова сокращается.
+
+По умолчанию сравнивается окно вокруг последней позиции шаблона (ROI),
+поэтому видео в другой части экрана не запускает поиск. Полный поиск
+не чаще match_min_interval, а раз в rescan_interval - даже без
+изменений в окне (кнопка могла появиться в другом месте).
+
+Опрос экономит template matching, а не захват: grab() снимает кадр
+целиком в полном разрешении, уменьшается только копия для сравнения.
+"""
+
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# Тяжелые импорты (ленивая загрузка)
+np = None
+cv2 = None
+
+# Интервалы опроса (сек)
+DEFAULT_POLL_MIN = 0.03
+DEFAULT_POLL_MAX = 0.5
+DEFAULT_POLL_BACKOFF = 1.5
+
+# Минимальный интервал между полными поисками (сек)
+DEFAULT_MATCH_MIN_INTERVAL = 0.25
+# Поиск без изменений в окне сравнения (сек, 0 - только по изменению)
+DEFAULT_RESCAN_INTERVAL = 2.0
+
+# Порог изменения: максимальное отличие пикселя (0-255) уменьшенного кадра
+# (пиксель уменьшенного кадра усредняет блок 8x8, шум сглаживается,
+# а новая кнопка меняет несколько пикселей сильно - среднее по кадру ее бы не заметило)
+DEFAULT_CHANGE_THRESHOLD = 8.0
+
+# Масштаб уменьшенной копии кадра для сравнения
+SAMPLE_SCALE = 0.125
+
+
+def _lazy_import_numpy():
+    """Ленивая загрузка numpy"""
+    global np
+    if np is None:
+        import numpy as _np
+        np = _np
+    return np
+
+
+def _lazy_import_cv2():
+    """Ленивая загрузка OpenCV"""
+    global cv2
+    if cv2 is None:
+        import cv2 as _cv2
+        cv2 = _cv2
+    return cv2
+
+
+@dataclass
+class WaitPolicy:
+    """Параметры ожидания"""
+    poll_min: float = DEFAULT_POLL_MIN                    # Интервал сразу после изменения экрана
+    poll_max: float = DEFAULT_POLL_MAX                    # Предел интервала для статичного экрана
+    backoff: float = DEFAULT_POLL_BACKOFF                 # Множитель интервала без изменений
+    change_threshold: float = DEFAULT_CHANGE_THRESHOLD    # 0 - матчить каждый кадр
+    match_min_interval: float = DEFAULT_MATCH_MIN_INTERVAL  # Пауза между полными поисками
+    rescan_interval: float = DEFAULT_RESCAN_INTERVAL      # Поиск без изменений в окне (0 - выкл.)
+    
+    @classmethod
+    def from_step(cls, step: Dict[str, Any], settings: Optional[Dict[str, Any]] = None) -> 'WaitPolicy':
+        """
+        Параметры из шага (значения шага важнее settings конфига)
+        
+        Args:
+            step: Шаг click/open
+            settings: Секция settings конфига
+        """
+        settings = settings or {}
+        
+        def value(key, default):
+            raw = step.get(key, settings.get(key, default))
+            try:
+                return float(raw)
+            except (TypeError, ValueError):
+                print(f"⚠️  Неверное значение {key}: {raw}, используем {default}")
+                return default
+        
+        poll_min = max(0.0, value('poll_min', DEFAULT_POLL_MIN))
+        return cls(
+            poll_min=poll_min,
+            poll_max=max(poll_min, value('poll_max', DEFAULT_POLL_MAX)),
+            backoff=max(1.0, value('poll_backoff', DEFAULT_POLL_BACKOFF)),
+            change_threshold=max(0.0, value('change_threshold', DEFAULT_CHANGE_THRESHOLD)),
+            match_min_interval=max(0.0, value('match_min_interval', DEFAULT_MATCH_MIN_INTERVAL)),
+            rescan_interval=max(0.0, value('rescan_interval', DEFAULT_RESCAN_INTERVAL)),
+        )
+
+
+def frame_sample(gray: 'np.ndarray', window: Optional[Tuple[int, int, int, int]] = None,
+                 scale: float = SAMPLE_SCALE) -> 'np.ndarray':
+    """
+    Уменьшенная копия области кадра для дешевого сравнения
+    
+    Args:
+        gray: Кадр (grayscale)
+        window: (x0, y0, x1, y1) в пикселях кадра, None - весь кадр
+        scale: Масштаб уменьшения
+    """
+    cv2_lib = _lazy_import_cv2()
+    
+    if window is not None:
+        x0, y0, x1, y1 = window
+        if x1 > x0 and y1 > y0:
+            gray = gray[y0:y1, x0:x1]
+    
+    height, width = gray.shape[:2]
+    size = (max(1, int(width * scale)), max(1, int(height * scale)))
+    return cv2_lib.resize(gray, size, interpolation=cv2_lib.INTER_AREA)
+
+
+class ChangeGate:
+    """Решает, нужен ли полный поиск: изменилась ли область с последнего поиска"""
+    
+    def __init__(self, threshold: float = DEFAULT_CHANGE_THRESHOLD,
+                 window=None):
+        """
+        Args:
+            threshold: Порог отличия пикселя уменьшенного кадра (0-255)
+            window: Область кадра (x0, y0, x1, y1) или функция от размера кадра
+                (может вернуть None), None - весь кадр
+        """
+        self.threshold = threshold
+        self.window = window
+        self._reference = None
+    
+    def changed(self, gray: 'np.ndarray') -> bool:
+        """
+        Изменился ли кадр относительно кадра последнего поиска
+        
+        Сравнение идет с кадром, на котором был последний поиск (а не с
+        предыдущим опросом), поэтому медленная анимация тоже накапливается.
+        """
+        np_lib = _lazy_import_numpy()
+        
+        window = self.window(gray.shape) if callable(self.window) else self.window
+        sample = frame_sample(gray, window)
+        if self._reference is None or self._reference.shape != sample.shape or self.threshold <= 0:
+            self._reference = sample
+            return True
+        
+        diff = int(np_lib.max(np_lib.abs(sample.astype(np_lib.int16) - self._reference)))
+        if diff < self.threshold:
+            return False
+        
+        self._reference = sample
+        return True
+    
+    def reset(self):
+        """Следующий кадр всегда считается измененным"""
+        self._reference = None
+
+
+def wait_for_match(match: Callable[['np.ndarray'], tuple], grab: Callable[[], 'np.ndarray'],
+                   timeout: float, policy: Optional[WaitPolicy] = None,
+                   window=None,
+                   clock: Callable[[], float] = time.monotonic,
+                   sleep: Callable[[float], None] = time.sleep) -> Tuple[tuple, Dict[str, int]]:
+    """
+    Опрос экрана до успешного поиска или таймаута
+    
+    Args:
+        match: Поиск по кадру, возвращает кортеж (найдено, ...)
+        grab: Захват нового кадра
+        timeout: Максимальное время ожидания (сек)
+        policy: Интервалы и порог изменения
+        window: Область кадра (см. ChangeGate), изменения вне нее
+            замечаются только поиском раз в rescan_interval
+        clock, sleep: Часы и пауза (подменяются в тестах)
+    
+    Returns:
+        (результат последнего поиска, статистика {'samples', 'matches', 'skipped'})
+    """
+    policy = policy or WaitPolicy()
+    gate = ChangeGate(policy.change_threshold, window)
+    stats = {'samples': 0, 'matches': 0, 'skipped': 0}
+    
+    result = (False,)
+    interval = policy.poll_min
+    deadline = clock() + timeout
+    last_match = None
+    # Изменение замечено, но поиск отложен (match_min_interval)
+    pending = False
+    
+    while True:
+        gray = grab()
+        stats['samples'] += 1
+        now = clock()
+        
+        pending = gate.changed(gray) or pending
+        since_match = None if last_match is None else now - last_match
+        rescan = (since_match is not None and policy.rescan_interval > 0
+                  and since_match >= policy.rescan_interval)
+        
+        if (pending and (since_match is None or since_match >= policy.match_min_interval)) or rescan:
+            result = match(gray)
+            stats['matches'] += 1
+            last_match = now
+            pending = False
+            if result[0]:
+                break
+            # Экран меняется - опрашиваем чаще
+            interval = policy.poll_min
+        elif pending:
+            stats['skipped'] += 1
+            # Поиск не чаще match_min_interval - следующий кадр к этому моменту
+            interval = max(policy.poll_min, policy.match_min_interval - since_match)
+        else:
+            stats['skipped'] += 1
+            # Экран статичен - опрашиваем реже
+            interval = min(policy.poll_max, max(interval, 0.001) * policy.backoff)
+        
+        remaining = deadline - clock()
+        if remaining <= 0:
+            break
+        sleep(min(interval, remaining))
+    
+    return result, stats
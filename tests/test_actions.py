@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+test_actions.py
+🎬 Тестирование реестра действий (src/core/actions.py)
+
+Проверяет:
+- Регистрацию действий плагинов и связывание с runner'ом
+- Нормализацию параметров шагов (один раз до запуска)
+- Список известных действий для atlas_validator
+"""
+
+import sys
+from pathlib import Path
+
+# Добавляем корень проекта в путь
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.core import actions
+from src.core.actions import (
+    BUILTIN_ACTIONS, bind_actions, get_action, known_actions, normalize_steps, register_action,
+    unregister_action, unskippable_actions,
+)
+from src.core.atlas_validator import validate_steps
+
+
+class _Runner:
+    """Минимальный runner: обработчики получают его первым аргументом"""
+    
+    def __init__(self):
+        self.calls = []
+
+
+def test_register_and_bind():
+    """Тест регистрации и связывания обработчиков"""
+    print("="*60)
+    print("🧪 Тест 1: Регистрация действий")
+    print("="*60)
+    
+    def beep(runner, step):
+        runner.calls.append(step.get('times', 1))
+        return True
+    
+    try:
+        register_action('test_beep', beep, normalize=lambda step: {**step, 'times': int(step['times'])})
+        register_action('test_silent', skippable=False)(beep)
+        
+        assert get_action('test_beep').handler is beep
+        assert {'test_beep', 'test_silent'} <= known_actions()
+        assert 'test_silent' in unskippable_actions() and 'test_beep' not in unskippable_actions()
+        print("✅ Функция и декоратор")
+        
+        runner = _Runner()
+        handlers = bind_actions(runner)
+        assert handlers['test_beep']({'times': 3}) is True
+        assert runner.calls == [3], "Обработчик связан с runner"
+        print("✅ bind_actions")
+        
+        try:
+            register_action('test_beep', lambda runner, step: False)
+            assert False, "Повторная регистрация другим обработчиком - ошибка"
+        except ValueError:
+            pass
+        register_action('test_beep', beep)  # Тот же обработчик - без ошибки
+        print("✅ Защита от перезаписи")
+        
+        assert validate_steps([{'action': 'test_beep'}]) == [], "Validator знает действия плагинов"
+    finally:
+        unregister_action('test_beep')
+        unregister_action('test_silent')
+    
+    assert 'test_beep' not in known_actions()
+    assert validate_steps([{'action': 'test_beep'}]), "После удаления действие неизвестно"
+    print("✅ unregister_action")
+    print()
+
+
+def test_normalization():
+    """Тест нормализации параметров"""
+    print("="*60)
+    print("🧪 Тест 2: Нормализация шагов")
+    print("="*60)
+    
+    saved = dict(actions._REGISTRY)
+    try:
+        # Встроенные нормализаторы без импорта MacroRunner (pyautogui)
+        handler = lambda runner, step: True
+        register_action('repeat', handler, normalize=actions.normalize_repeat, replace=True)
+        register_action('wait', handler, normalize=actions.normalize_wait, replace=True)
+        register_action('scroll', handler, normalize=actions.normalize_scroll, replace=True)
+        register_action('hotkey', handler, normalize=actions.normalize_hotkey, replace=True)
+        register_action('click', handler, normalize=actions.normalize_click, replace=True)
+        
+        source = [
+            {'action': 'repeat', 'times': '3', 'steps': [
+                {'action': 'wait', 'duration': '1.5'},
+                {'action': 'scroll', 'direction': 'Down ', 'amount': '10'},
+            ]},
+            {'action': 'repeat', 'times': '{count}', 'steps': []},
+            {'action': 'hotkey', 'keys': 'ctrl + c'},
+            {'action': 'click', 'position': 'absolute', 'x': '10', 'y': 20.0, 'clicks': '2'},
+            {'action': 'wait', 'duration': 'abc'},
+            {'action': 'unknown', 'value': '1'},
+        ]
+        steps = normalize_steps(source)
+    finally:
+        actions._REGISTRY.clear()
+        actions._REGISTRY.update(saved)
+    
+    assert steps[0]['times'] == 3 and steps[0]['steps'][0]['duration'] == 1.5
+    assert steps[0]['steps'][1] == {'action': 'scroll', 'direction': 'down', 'amount': 10}
+    print("✅ repeat/wait/scroll (вложенные шаги тоже)")
+    
+    assert steps[1]['times'] == '{count}', "Переменные подставляются во время выполнения"
+    assert steps[2]['keys'] == ['ctrl', 'c']
+    assert (steps[3]['x'], steps[3]['y'], steps[3]['clicks']) == (10, 20, 2)
+    assert steps[4]['duration'] == 'abc', "Неверное значение остается - ошибку сообщит обработчик"
+    assert steps[5] == {'action': 'unknown', 'value': '1'}
+    assert source[0]['times'] == '3', "Исходные шаги не меняются"
+    print("✅ Переменные, hotkey, click, неверные значения")
+    print()
+
+
+def test_builtin_names():
+    """Тест списка встроенных действий"""
+    print("="*60)
+    print("🧪 Тест 3: Встроенные действия")
+    print("="*60)
+    
+    assert {'repeat', 'click', 'wait', 'selenium_extract'} <= BUILTIN_ACTIONS
+    assert BUILTIN_ACTIONS <= known_actions()
+    print(f"✅ Встроенных действий: {len(BUILTIN_ACTIONS)}")
+    print()
+
+
+def run_all_tests():
+    """Запуск всех тестов"""
+    print("\n" + "="*60)
+    print("🎬 ТЕСТИРОВАНИЕ РЕЕСТРА ДЕЙСТВИЙ".center(60))
+    print("="*60)
+    
+    tests = [
+        test_register_and_bind,
+        test_normalization,
+        test_builtin_names,
+    ]
+    
+    passed = 0
+    failed = 0
+    
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except AssertionError as e:
+            print(f"\n❌ FAILED: {e}\n")
+            failed += 1
+        except Exception as e:
+            print(f"\n❌ ERROR: {e}\n")
+            failed += 1
+    
+    print("="*60)
+    if failed == 0:
+        print("🎉 ВСЕ ТЕСТЫ РЕЕСТРА ПРОШЛИ!".center(60))
+    else:
+        print("⚠️  ЕСТЬ ПРОБЛЕМЫ С РЕЕСТРОМ!".center(60))
+    print("="*60)
+    print(f"✅ Пройдено: {passed}/{len(tests)}")
+    if failed:
+        print(f"❌ Провалено: {failed}/{len(tests)}")
+    print("="*60)
+    
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+test_atlas_grammar.py
+📝 Тестирование грамматики Atlas DSL (src/core/atlas_grammar.py)
+
+Проверяет:
+- AST с позициями (строка/колонка) и блоки repeat/try/catch/end
+- Преобразование AST в шаги через таблицу команд парсера
+- Точные ошибки: диагностика в обычном режиме, AtlasSyntaxError в strict
+- Развертывание DSL переменных: вложенность, кэш, циклические ссылки
+- Потоковый разбор: шаги по мере закрытия блоков
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Добавляем корень проекта в путь
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.core.atlas_grammar import (
+    AtlasSyntaxError, Command, Repeat, Try, VariableRef, iter_program, parse_program,
+)
+from src.core.atlas_dsl_parser import AtlasDSLParser
+
+
+def _parser(tmp_dir: str, strict: bool = False) -> AtlasDSLParser:
+    """Парсер без шаблонов и селекторов проекта"""
+    return AtlasDSLParser(templates_base_path=tmp_dir, dom_selectors_path=tmp_dir, strict=strict)
+
+
+def test_ast_positions_and_blocks():
+    """Тест AST: позиции и вложенные блоки"""
+    print("="*60)
+    print("🧪 Тест 1: AST и блоки")
+    print("="*60)
+    
+    source = "\n".join([
+        "# комментарий",
+        "open ChromeApp",
+        "repeat 2:",
+        "    click Like threshold=0.8",
+        "    repeat 3:",
+        "        wait 1s",
+        "    end",
+        "    scroll down",
+        "try:",
+        "    ${TikTokLike}",
+        "catch:",
+        "    log \"fail\"",
+        "end",
+    ])
+    program = parse_program(source, {'open', 'click', 'wait', 'scroll', 'log'})
+    
+    assert not program.diagnostics, program.diagnostics
+    assert [type(node) for node in program.body] == [Command, Repeat, Try]
+    
+    opener, loop, block = program.body
+    assert (opener.line, opener.column, opener.name, opener.text) == (2, 1, 'open', 'ChromeApp')
+    assert loop.times == 2 and loop.line == 3
+    assert [type(node) for node in loop.body] == [Command, Repeat, Command], "end закрывает только свой блок"
+    assert loop.body[0].column == 5 and loop.body[0].args == ['Like', 'threshold=0.8']
+    assert loop.body[1].body[0].line == 6
+    assert loop.body[2].name == 'scroll', "Строка после end остается во внешнем repeat"
+    print("✅ repeat/end с вложенностью")
+    
+    assert isinstance(block.body[0], VariableRef) and block.body[0].name == 'TikTokLike'
+    assert block.catch_body[0].name == 'log' and block.catch_body[0].line == 12
+    print("✅ try/catch/end")
+    print()
+
+
+def test_lowering_to_steps():
+    """Тест преобразования AST в шаги"""
+    print("="*60)
+    print("🧪 Тест 2: Шаги из AST")
+    print("="*60)
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        parser = _parser(tmp_dir)
+        parsed = parser.parse("\n".join([
+            "click (500, 300)",
+            "repeat 2:",
+            "  press Enter",
+            "  hotkey ctrl + c",
+            "try:",
+            "  type \"#trending\"",
+            "catch:",
+            "  log \"Не найдено\"",
+            "  abort",
+            "end",
+        ]))
+    
+    steps = parsed['steps']
+    assert steps[0] == {'action': 'click', 'position': 'absolute', 'x': 500, 'y': 300, 'clicks': 1,
+                        'description': 'Клик в (500, 300)'}
+    
+    loop = steps[1]
+    assert loop['action'] == 'repeat' and loop['times'] == 2
+    assert [s['action'] for s in loop['steps']] == ['key', 'hotkey']
+    assert loop['steps'][0]['key'] == 'enter' and loop['steps'][1]['keys'] == ['ctrl', 'c']
+    print("✅ click/repeat/press/hotkey")
+    
+    block = steps[2]
+    assert block['action'] == 'try'
+    assert block['try_steps'] == [{'action': 'type', 'text': '#trending', 'description': 'Ввод текста'}]
+    assert [s['action'] for s in block['catch_steps']] == ['log', 'abort']
+    assert block['catch_steps'][0]['message'] == 'Не найдено'
+    assert not parser.diagnostics
+    print("✅ try/catch/log/abort")
+    print()
+
+
+def test_errors_with_positions():
+    """Тест ошибок: диагностика и strict режим"""
+    print("="*60)
+    print("🧪 Тест 3: Ошибки с позициями")
+    print("="*60)
+    
+    source = "wait 1s\n  frobnicate now\nclick\nend\n"
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        parser = _parser(tmp_dir)
+        parsed = parser.parse(source, filename='macro.atlas')
+        assert [s['action'] for s in parsed['steps']] == ['wait']
+        
+        errors = [(d.severity, d.line, d.column) for d in parser.diagnostics]
+        assert errors == [('error', 2, 3), ('error', 3, 1), ('warning', 4, 1)], errors
+        assert 'frobnicate' in parser.diagnostics[0].message
+        print("✅ Диагностика: неизвестная команда, нет аргумента, лишний end")
+        
+        try:
+            _parser(tmp_dir, strict=True).parse(source, filename='macro.atlas')
+            assert False, "strict должен бросить AtlasSyntaxError"
+        except AtlasSyntaxError as e:
+            assert (e.line, e.column, e.filename) == (2, 3, 'macro.atlas')
+            assert 'macro.atlas:2:3' in str(e)
+        print("✅ strict: AtlasSyntaxError")
+        
+        try:
+            parser.parse("wait 1s\nwait 5s # комментарий\n")
+            assert False, "Неверная длительность - ошибка"
+        except ValueError as e:
+            assert isinstance(e, AtlasSyntaxError) and e.line == 2
+        print("✅ Неверное значение аргумента")
+    print()
+
+
+def test_variable_expansion_cache():
+    """Тест развертывания переменных: вложенность, кэш, циклы"""
+    print("="*60)
+    print("🧪 Тест 4: DSL переменные")
+    print("="*60)
+    
+    variables = "\n".join([
+        "${Like}", "-----", "click Like", "wait 1s", "",
+        "${AutoLikes}", "-----", "repeat {count}:", "  ${Like}", "  scroll down", "",
+        "${SearchAndLike}", "-----", "type \"{query}\"", "${AutoLikes:3}", "",
+        "${Ping}", "-----", "${Pong}", "",
+        "${Pong}", "-----", "${Ping}", "",
+    ])
+    
+    old_cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.chdir(tmp_dir)
+        try:
+            Path('templates').mkdir()
+            Path('templates', 'DSL_VARIABLES.txt').write_text(variables, encoding='utf-8')
+            parser = AtlasDSLParser()
+            
+            parsed = parser.parse("${SearchAndLike:#python}\n${AutoLikes:2}\n${SearchAndLike:#python}\n")
+            steps = parsed['steps']
+            assert [s['action'] for s in steps] == ['type', 'repeat', 'repeat', 'type', 'repeat'], steps
+            assert steps[0]['text'] == '#python'
+            assert steps[1]['times'] == 3 and steps[2]['times'] == 2
+            assert [s['action'] for s in steps[1]['steps']] == ['click', 'wait', 'scroll'], "Вложенная ${Like}"
+            print("✅ Вложенные переменные и repeat {count}:")
+            
+            assert steps[3:] == steps[:1] + steps[1:2], "Повтор из кэша - те же шаги"
+            assert parser.expansion_stats['hits'] >= 1
+            assert parser.expansion_stats['parsed'] == 3, "Тело каждой переменной разбирается один раз"
+            steps[0]['text'] = 'changed'
+            again = parser.parse("${SearchAndLike:#python}")['steps']
+            assert again[0]['text'] == '#python', "Кэш отдает копии"
+            print(f"✅ Кэш: {parser.expansion_stats}")
+            
+            parsed = parser.parse("wait 1s\n${Ping}\n")
+            assert [s['action'] for s in parsed['steps']] == ['wait']
+            assert any('циклическая' in d.message for d in parser.diagnostics)
+            try:
+                AtlasDSLParser(strict=True).parse("${Ping}")
+                assert False, "Цикл в strict режиме - ошибка"
+            except AtlasSyntaxError as e:
+                assert '${Ping} → ${Pong} → ${Ping}' in str(e)
+            print("✅ Циклическая ссылка")
+        finally:
+            os.chdir(old_cwd)
+    print()
+
+
+def test_streaming_parse():
+    """Тест потокового разбора"""
+    print("="*60)
+    print("🧪 Тест 5: Потоковый разбор")
+    print("="*60)
+    
+    lines = [
+        "open ChromeApp",
+        "repeat 2:",
+        "  click Like",
+        "  wait 1s",
+        "end",
+        "scroll down",
+        "repeat 3:",
+        "  press Enter",
+    ]
+    consumed = []
+    
+    def source():
+        for line in lines:
+            consumed.append(line)
+            yield line + "\n"
+    
+    diagnostics = []
+    nodes = iter_program(source(), {'open', 'click', 'wait', 'scroll', 'press'}, diagnostics)
+    first = next(nodes)
+    assert first.name == 'open' and consumed == lines[:1], "Команда отдается до чтения следующих строк"
+    loop = next(nodes)
+    assert isinstance(loop, Repeat) and len(loop.body) == 2
+    assert consumed == lines[:5], "Блок отдается на end"
+    assert next(nodes).name == 'scroll'
+    last = next(nodes)
+    assert isinstance(last, Repeat) and last.times == 3, "Незакрытый блок отдается в конце"
+    assert list(nodes) == [] and not diagnostics
+    print("✅ iter_program: ленивое чтение строк")
+    
+    source_text = "\n".join(lines + ["frobnicate", "try:", "  type \"x\"", "catch:", "  abort", "end"])
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        parser = _parser(tmp_dir)
+        streamed = list(parser.iter_parse(source_text, filename='big.atlas'))
+        stream_errors = [(d.line, d.message) for d in parser.diagnostics]
+        parsed = parser.parse(source_text, filename='big.atlas')
+        assert streamed == parsed['steps'], "Те же шаги, что и parse()"
+        assert stream_errors == [(d.line, d.message) for d in parser.diagnostics]
+        
+        atlas = Path(tmp_dir) / 'big.atlas'
+        atlas.write_text(source_text, encoding='utf-8')
+        assert list(parser.iter_parse_file(str(atlas))) == parsed['steps']
+        
+        try:
+            list(_parser(tmp_dir, strict=True).iter_parse(source_text))
+            assert False, "strict: ошибка в потоке"
+        except AtlasSyntaxError as e:
+            assert e.line == 9
+    print("✅ iter_parse / iter_parse_file совпадают с parse()")
+    print()
+
+
+def run_all_tests():
+    """Запуск всех тестов"""
+    print("\n" + "="*60)
+    print("📝 ТЕСТИРОВАНИЕ ГРАММАТИКИ ATLAS DSL".center(60))
+    print("="*60)
+    
+    tests = [
+        test_ast_positions_and_blocks,
+        test_lowering_to_steps,
+        test_errors_with_positions,
+        test_variable_expansion_cache,
+        test_streaming_parse,
+    ]
+    
+    passed = 0
+    failed = 0
+    
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except AssertionError as e:
+            print(f"\n❌ FAILED: {e}\n")
+            failed += 1
+        except Exception as e:
+            print(f"\n❌ ERROR: {e}\n")
+            failed += 1
+    
+    print("="*60)
+    if failed == 0:
+        print("🎉 ВСЕ ТЕСТЫ ГРАММАТИКИ ПРОШЛИ!".center(60))
+    else:
+        print("⚠️  ЕСТЬ ПРОБЛЕМЫ С ГРАММАТИКОЙ!".center(60))
+    print("="*60)
+    print(f"✅ Пройдено: {passed}/{len(tests)}")
+    if failed:
+        print(f"❌ Провалено: {failed}/{len(tests)}")
+    print("="*60)
+    
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
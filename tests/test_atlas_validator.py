@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+test_atlas_validator.py
+🔍 Тестирование статической проверки макросов (src/core/atlas_validator.py)
+
+Проверяет:
+- Шаблоны на диске (один или несколько кандидатов)
+- Неподдерживаемые действия, селекторы, неразвернутые переменные
+- Недостижимые шаги (после abort, repeat 0, пустой try)
+- Проверку файлов .atlas и YAML
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Добавляем корень проекта в путь
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.core.actions import BUILTIN_ACTIONS
+from src.core.atlas_validator import validate_file, validate_steps
+
+
+def _by_path(issues):
+    """{путь шага: [(уровень, сообщение)]}"""
+    result = {}
+    for issue in issues:
+        result.setdefault(issue.step_path, []).append((issue.severity, issue.message))
+    return result
+
+
+def test_step_checks():
+    """Тест проверок шагов"""
+    print("="*60)
+    print("🧪 Тест 1: Проверки шагов")
+    print("="*60)
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        existing = os.path.join(tmp_dir, 'Like.png')
+        Path(existing).write_bytes(b'png')
+        missing = os.path.join(tmp_dir, 'Missing.png')
+        
+        steps = [
+            {'action': 'click', 'template': existing},
+            {'action': 'click', 'template': missing, 'description': 'Клик по Missing'},
+            {'action': 'click', 'templates': [existing, {'template': missing}]},
+            {'action': 'click', 'position': 'absolute', 'x': 1, 'y': 2},
+            {'action': 'click'},
+            {'action': 'selenium_click', 'selector': ''},
+            {'action': 'expand_variable', 'variable': 'Unknown', 'params': {}},
+            {'action': 'teleport'},
+            {'action': 'repeat', 'times': 2, 'steps': [{'action': 'wait', 'duration': 1}, 'oops']},
+        ]
+        issues = _by_path(validate_steps(steps, 'demo'))
+        
+        guarded = [{'action': 'try', 'try_steps': [{'action': 'click', 'template': missing}],
+                    'catch_steps': [{'action': 'click', 'template': missing}]}]
+        try_issues = _by_path(validate_steps(guarded, known_actions=BUILTIN_ACTIONS | {'try'}))
+    
+    assert '1' not in issues and '4' not in issues, "Существующий шаблон и координаты - без замечаний"
+    assert issues['2'] == [('error', f"шаблон не найден: {missing}")]
+    assert issues['3'] == [('warning', f"шаблон не найден: {missing}")], "Есть другой кандидат - предупреждение"
+    assert try_issues['1.try.1'] == [('warning', f"шаблон не найден: {missing}")], "В try - предупреждение"
+    assert try_issues['1.catch.1'] == [('error', f"шаблон не найден: {missing}")]
+    print("✅ Шаблоны")
+    
+    assert issues['5'] == [('error', "click без шаблона и координат")]
+    assert issues['6'] == [('error', "selenium_click без selector")]
+    assert issues['7'] == [('error', "переменная ${Unknown} не развернута")]
+    assert issues['8'] == [('error', "действие 'teleport' не поддерживается runner'ом")]
+    assert issues['9.2'][0][0] == 'error', "Вложенные шаги тоже проверяются"
+    print("✅ Селекторы, переменные, действия")
+    print()
+
+
+def test_unreachable_steps():
+    """Тест недостижимых шагов"""
+    print("="*60)
+    print("🧪 Тест 2: Недостижимые шаги")
+    print("="*60)
+    
+    actions = BUILTIN_ACTIONS | {'try', 'log', 'abort'}
+    steps = [
+        {'action': 'try', 'try_steps': [], 'catch_steps': [{'action': 'log', 'message': 'x'}]},
+        {'action': 'repeat', 'times': 0, 'steps': [{'action': 'wait', 'duration': 1}]},
+        {'action': 'abort', 'message': None},
+        {'action': 'wait', 'duration': 1},
+    ]
+    issues = _by_path(validate_steps(steps, known_actions=actions))
+    
+    assert issues['1'] == [('warning', "catch недостижим: пустой блок try")]
+    assert issues['2'] == [('warning', "repeat 0: тело никогда не выполняется")]
+    assert issues['4'] == [('warning', "недостижимый шаг (после abort в шаге 3)")]
+    assert '3' not in issues
+    print("✅ try/repeat 0/abort")
+    
+    issues = _by_path(validate_steps(steps, known_actions={'wait', 'repeat'}))
+    assert ('error', "действие 'try' не поддерживается runner'ом") in issues['1']
+    assert issues['1.catch.1'] == [('error', "действие 'log' не поддерживается runner'ом")]
+    print("✅ Действия вне runner'а - ошибка")
+    
+    issues = _by_path(validate_steps([
+        {'action': 'wait', 'duration': 1, 'retry': 3},
+        {'action': 'wait', 'duration': 1, 'retry': {'attempts': 0}},
+        {'action': 'wait', 'duration': 1, 'retry': {'tries': 2}},
+    ]))
+    assert '1' not in issues
+    assert issues['2'][0][0] == 'error' and issues['3'][0][0] == 'error'
+    print("✅ Неверная политика retry")
+    print()
+
+
+def test_validate_files():
+    """Тест проверки .atlas и YAML"""
+    print("="*60)
+    print("🧪 Тест 3: Файлы")
+    print("="*60)
+    
+    old_cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.chdir(tmp_dir)
+        try:
+            Path('templates').mkdir()
+            Path('templates', 'Like.png').write_bytes(b'png')
+            Path('good.atlas').write_text("click Like\nwait 1s\n", encoding='utf-8')
+            Path('bad.atlas').write_text("click Nope\n${Missing}\nfrobnicate\n", encoding='utf-8')
+            Path('seq.yaml').write_text(
+                "sequences:\n  demo:\n    steps:\n      - action: click\n        template: templates/Like.png\n"
+                "      - action: fly\n", encoding='utf-8')
+            
+            report = validate_file('good.atlas')
+            assert report.ok and not report.issues and report.steps == 2, report.issues
+            print(f"✅ good.atlas ({report.seconds * 1000:.1f} мс)")
+            
+            report = validate_file('bad.atlas')
+            messages = [issue.message for issue in report.errors]
+            assert not report.ok
+            assert any('неизвестная команда: frobnicate' in m for m in messages)
+            assert any('${Missing} не найдена' in m for m in messages), "Ненайденная переменная - ошибка"
+            assert any('templates/Nope.png' in m for m in messages), "Подставленный путь шаблона проверяется"
+            print("✅ bad.atlas: команда, переменная, шаблон")
+            
+            report = validate_file('seq.yaml')
+            assert [issue.message for issue in report.issues] == ["действие 'fly' не поддерживается runner'ом"]
+            assert report.issues[0].sequence == 'demo' and report.issues[0].step_path == '2'
+            print("✅ YAML конфиг")
+            
+            assert not validate_file('nothing.atlas').ok
+            print("✅ Отсутствующий файл")
+        finally:
+            os.chdir(old_cwd)
+    print()
+
+
+def run_all_tests():
+    """Запуск всех тестов"""
+    print("\n" + "="*60)
+    print("🔍 ТЕСТИРОВАНИЕ ПРОВЕРКИ МАКРОСОВ".center(60))
+    print("="*60)
+    
+    tests = [
+        test_step_checks,
+        test_unreachable_steps,
+        test_validate_files,
+    ]
+    
+    passed = 0
+    failed = 0
+    
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except AssertionError as e:
+            print(f"\n❌ FAILED: {e}\n")
+            failed += 1
+        except Exception as e:
+            print(f"\n❌ ERROR: {e}\n")
+            failed += 1
+    
+    print("="*60)
+    if failed == 0:
+        print("🎉 ВСЕ ТЕСТЫ ПРОВЕРКИ ПРОШЛИ!".center(60))
+    else:
+        print("⚠️  ЕСТЬ ПРОБЛЕМЫ С ПРОВЕРКОЙ!".center(60))
+    print("="*60)
+    print(f"✅ Пройдено: {passed}/{len(tests)}")
+    if failed:
+        print(f"❌ Провалено: {failed}/{len(tests)}")
+    print("="*60)
+    
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
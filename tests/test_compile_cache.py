@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+test_compile_cache.py
+💾 Тестирование кэша скомпилированных .atlas (src/core/compile_cache.py)
+
+Проверяет:
+- Манифест зависимостей парсера (переменные, селекторы, папки шаблонов)
+- Попадание в кэш при неизменных входах
+- Инвалидацию при изменении любой зависимости или версии парсера
+- Формат записей (.atlc): только встроенные типы, без классов
+"""
+
+import os
+import pickle
+import struct
+import sys
+import tempfile
+from pathlib import Path
+
+# Добавляем корень проекта в путь
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.core.atlas_dsl_parser import AtlasDSLParser, PARSER_VERSION
+from src.core import compiled_program
+from src.core.compile_cache import CompileCache
+
+
+def _make_project(root: Path):
+    """Мини-проект: шаблоны, переменные, селекторы и .atlas"""
+    (root / 'templates' / 'Chrome').mkdir(parents=True)
+    (root / 'templates' / 'Chrome' / 'Chrome-NewTab.png').write_bytes(b'png')
+    (root / 'templates' / 'DSL_VARIABLES.txt').write_text(
+        "${Open}\n--------\nclick NewTab\nwait 1s\n", encoding='utf-8')
+    (root / 'dom_selectors' / 'tiktok').mkdir(parents=True)
+    (root / 'dom_selectors' / 'tiktok' / 'selectors.json').write_text('{"Like": {"css": ".like"}}',
+                                                                      encoding='utf-8')
+    atlas = root / 'macro.atlas'
+    atlas.write_text("${Open}\nclick NewTab\n", encoding='utf-8')
+    return atlas
+
+
+def _bump_mtime(path: Path):
+    """Сдвинуть mtime (файловые системы с грубым mtime)"""
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def _compile(cache: CompileCache, atlas: Path):
+    """Как MacroRunner._load_config: кэш или парсинг с сохранением"""
+    cached = cache.load(str(atlas))
+    if cached is not None:
+        return cached, True
+    parser = AtlasDSLParser()
+    parsed = parser.parse_file(str(atlas))
+    cache.save(str(atlas), parsed, parser.get_dependencies())
+    return parsed, False
+
+
+def test_parser_dependencies():
+    """Тест манифеста зависимостей парсера"""
+    print("="*60)
+    print("🧪 Тест 1: Зависимости парсера")
+    print("="*60)
+    
+    old_cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.chdir(tmp_dir)
+        try:
+            atlas = _make_project(Path(tmp_dir))
+            parser = AtlasDSLParser()
+            assert parser.get_dependencies() == {'files': {}, 'dirs': {}}, "Конструктор ничего не читает"
+            parser.parse_file(str(atlas))
+            deps = parser.get_dependencies()
+        finally:
+            os.chdir(old_cwd)
+    
+    files = set(deps['files'])
+    assert str(Path('templates') / 'DSL_VARIABLES.txt') in files
+    assert str(Path('dsl_references') / 'USER_VARIABLES.txt') in files, "Отсутствующий файл тоже зависимость"
+    assert deps['files'][str(Path('dsl_references') / 'USER_VARIABLES.txt')] is None
+    assert str(Path('dom_selectors') / 'tiktok' / 'selectors.json') in files
+    assert {'templates', str(Path('templates') / 'Chrome')} <= set(deps['dirs']), "Папки шаблонов"
+    print(f"✅ Файлов: {len(deps['files'])}, папок: {len(deps['dirs'])}")
+    print()
+
+
+def test_cache_hit_and_invalidation():
+    """Тест попадания в кэш и инвалидации по зависимостям"""
+    print("="*60)
+    print("🧪 Тест 2: Инвалидация кэша")
+    print("="*60)
+    
+    old_cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.chdir(tmp_dir)
+        try:
+            root = Path(tmp_dir)
+            atlas = _make_project(root)
+            cache = CompileCache(root / '.cache')
+            
+            first, from_cache = _compile(cache, atlas)
+            assert not from_cache
+            second, from_cache = _compile(cache, atlas)
+            assert from_cache and second == first, "Неизмененные входы → из кэша"
+            print("✅ Повторная загрузка из кэша")
+            
+            variables = root / 'templates' / 'DSL_VARIABLES.txt'
+            variables.write_text("${Open}\n--------\nclick NewTab\nwait 2s\n", encoding='utf-8')
+            _bump_mtime(variables)
+            parsed, from_cache = _compile(cache, atlas)
+            assert not from_cache, f"Изменение переменных → перекомпиляция ({cache.last_miss_reason})"
+            assert any(step.get('duration') == 2.0 for step in parsed['steps']), "Новое значение переменной"
+            print("✅ DSL_VARIABLES.txt")
+            
+            _compile(cache, atlas)
+            new_png = root / 'templates' / 'Chrome' / 'Chrome-Close.png'
+            new_png.write_bytes(b'png')
+            _bump_mtime(new_png.parent)
+            _, from_cache = _compile(cache, atlas)
+            assert not from_cache, "Новый PNG → перекомпиляция"
+            print("✅ Набор PNG под templates/")
+            
+            user_vars = root / 'dsl_references' / 'USER_VARIABLES.txt'
+            user_vars.parent.mkdir()
+            user_vars.write_text("${Mine}\n--------\nwait 1s\n", encoding='utf-8')
+            _, from_cache = _compile(cache, atlas)
+            assert not from_cache, "Появление USER_VARIABLES.txt → перекомпиляция"
+            print("✅ Новый файл переменных")
+            
+            _compile(cache, atlas)
+            other_version = CompileCache(root / '.cache', parser_version=PARSER_VERSION + '-next')
+            assert other_version.load(str(atlas)) is None, "Другая версия парсера → промах"
+            print("✅ Версия парсера")
+            
+            copy = root / 'copy.atlas'
+            copy.write_bytes(atlas.read_bytes())
+            assert cache.load(str(copy)) is None, "Тот же текст в другом файле → своя запись"
+            # Как MacroRunner: имя последовательности - имя файла
+            cache.save(str(atlas), {'sequences': {'macro': first}})
+            cache.save(str(copy), {'sequences': {'copy': first}})
+            assert list(cache.load(str(atlas))['sequences']) == ['macro']
+            assert list(cache.load('copy.atlas')['sequences']) == ['copy'], "Относительный путь - та же запись"
+            print("✅ Одинаковые по тексту файлы")
+        finally:
+            os.chdir(old_cwd)
+    
+    print()
+
+
+def test_binary_format():
+    """Тест формата записей кэша (compiled_program)"""
+    print("="*60)
+    print("🧪 Тест 3: Формат .atlc")
+    print("="*60)
+    
+    program = {
+        'sequences': {'demo': {'name': 'Demo', 'steps': [
+            {'action': 'click', 'template': 'templates/Like.png', 'clicks': 1, 'threshold': 0.8,
+             'region': [0, 0, 800, 600], 'description': 'Клик по Like'},
+            {'action': 'repeat', 'times': 3, 'steps': [
+                {'action': 'wait', 'duration': 1.5, 'description': 'Пауза 1.5с'},
+                {'action': 'selenium_init', 'url': None, 'description': 'Selenium init'},
+            ]},
+            {'action': 'key', 'key': 'enter', 'big': -(1 << 40), 'flag': True},
+        ]}},
+        'settings': {'match_workers': 'auto', 'empty': {}, 'nested': [[], [False]]},
+    }
+    
+    data = compiled_program.dumps(program)
+    assert data[:4] == b'ATLC'
+    assert compiled_program.loads(data) == program, "Круговое преобразование без потерь"
+    print(f"✅ Круговое преобразование ({len(data)} байт)")
+    
+    for broken in (data[:-1], b'XXXX' + data[4:], pickle.dumps(program)):
+        try:
+            compiled_program.loads(broken)
+            assert False, "Поврежденные данные должны отклоняться"
+        except compiled_program.CompiledFormatError:
+            pass
+    print("✅ Обрезанные данные, чужая сигнатура и pickle отклоняются")
+    
+    # pickle с классом внутри правильного заголовка: find_class запрещен
+    payload = pickle.dumps({'steps': [Path('templates/Like.png')]}, protocol=5)
+    forged = b'ATLC' + struct.pack('<HI', compiled_program.FORMAT_VERSION, len(payload)) + payload
+    try:
+        compiled_program.loads(forged)
+        assert False, "Классы и функции в данных должны отклоняться"
+    except compiled_program.CompiledFormatError as e:
+        assert 'pathlib' in str(e)
+    print("✅ Данные с классами отклоняются")
+    
+    try:
+        compiled_program.dumps({'when': object()})
+        assert False, "Произвольные объекты не кодируются"
+    except TypeError:
+        pass
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        root = Path(tmp_dir)
+        config = root / 'sequences.yaml'
+        config.write_text("sequences:\n  demo:\n    steps:\n      - action: wait\n        duration: 1\n",
+                          encoding='utf-8')
+        cache = CompileCache(root / '.cache')
+        cache.save(str(config), program)
+        assert [p.suffix for p in (root / '.cache').iterdir()] == ['.atlc']
+        assert cache.load(str(config)) == program, "YAML конфиг из кэша"
+        print("✅ CompileCache хранит записи в .atlc")
+    print()
+
+
+def run_all_tests():
+    """Запуск всех тестов"""
+    print("\n" + "="*60)
+    print("💾 ТЕСТИРОВАНИЕ КЭША КОМПИЛЯЦИИ".center(60))
+    print("="*60)
+    
+    tests = [
+        test_parser_dependencies,
+        test_cache_hit_and_invalidation,
+        test_binary_format,
+    ]
+    
+    passed = 0
+    failed = 0
+    
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except AssertionError as e:
+            print(f"\n❌ FAILED: {e}\n")
+            failed += 1
+        except Exception as e:
+            print(f"\n❌ ERROR: {e}\n")
+            failed += 1
+    
+    print("="*60)
+    if failed == 0:
+        print("🎉 ВСЕ ТЕСТЫ КЭША ПРОШЛИ!".center(60))
+    else:
+        print("⚠️  ЕСТЬ ПРОБЛЕМЫ С КЭШЕМ!".center(60))
+    print("="*60)
+    print(f"✅ Пройдено: {passed}/{len(tests)}")
+    if failed:
+        print(f"❌ Провалено: {failed}/{len(tests)}")
+    print("="*60)
+    
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+test_dom_extract.py
+📄 Тестирование пакетного извлечения DOM (src/engines/dom_extract.py)
+
+Проверяет:
+- Один execute_script на все элементы селектора
+- Параметр attributes и фильтры текстов
+- Запасной путь: тексты читаются только по запросу
+"""
+
+import sys
+from pathlib import Path
+
+# Добавляем корень проекта в путь
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.engines.dom_extract import (
+    EXTRACT_SCRIPT, ElementTexts, extract_elements, is_meaningful, is_service_text, parse_attributes,
+)
+
+
+class _FakeDriver:
+    """Драйвер без браузера: считает запросы"""
+    
+    def __init__(self, items):
+        self.items = items
+        self.calls = []
+    
+    def execute_script(self, script, *args):
+        self.calls.append((script, args))
+        return [dict(item) for item in self.items]
+
+
+class _FakeElement:
+    def __init__(self, text, reads):
+        self._text = text
+        self._reads = reads
+    
+    @property
+    def text(self):
+        self._reads.append(self._text)
+        return self._text
+
+
+def test_single_request():
+    """Тест одного запроса на все элементы"""
+    print("="*60)
+    print("🧪 Тест 1: Один запрос")
+    print("="*60)
+    
+    rect = {'x': 0, 'y': 0, 'width': 100, 'height': 20}
+    driver = _FakeDriver([
+        {'index': i, 'text': f"  Комментарий номер {i}\n", 'attrs': {'data-id': str(i)}, 'rect': rect}
+        for i in range(300)
+    ] + [{'index': 300, 'text': None, 'attrs': {}, 'rect': rect}])
+    
+    items = extract_elements(driver, 'div.comment', ['data-id'])
+    assert len(driver.calls) == 1, "300 элементов - один запрос"
+    assert driver.calls[0] == (EXTRACT_SCRIPT, ('div.comment', ['data-id']))
+    assert len(items) == 301 and items[0]['text'] == "Комментарий номер 0"
+    assert items[-1]['text'] == '', "Скрытый элемент - пустой текст"
+    assert items[5]['attrs'] == {'data-id': '5'} and items[5]['rect'] == rect
+    print("✅ Текст, атрибуты и координаты за один execute_script")
+    
+    assert extract_elements(_FakeDriver([]), 'div') == []
+    print("✅ Нет совпадений")
+    print()
+
+
+def test_filters():
+    """Тест параметров и фильтров"""
+    print("="*60)
+    print("🧪 Тест 2: Фильтры")
+    print("="*60)
+    
+    assert parse_attributes(None) == []
+    assert parse_attributes('href, data-id,') == ['href', 'data-id']
+    assert parse_attributes(['href']) == ['href']
+    print("✅ attributes: список или строка")
+    
+    assert not is_meaningful('') and not is_meaningful('Нет!!') and is_meaningful('Хорошо!')
+    assert is_service_text('Показать ещё 5') and not is_service_text('Отличное видео')
+    print("✅ Пустые, короткие и служебные тексты")
+    print()
+
+
+def test_fallback_lazy():
+    """Тест запасного пути"""
+    print("="*60)
+    print("🧪 Тест 3: Поэлементное чтение")
+    print("="*60)
+    
+    reads = []
+    texts = ElementTexts([_FakeElement(text, reads) for text in ('', 'Ответить', 'Первый', None)])
+    
+    assert len(texts) == 4 and reads == [], "Тексты не читаются заранее"
+    assert texts[2] == 'Первый' and texts[2] == 'Первый'
+    assert reads == ['Первый'], "Повторное обращение - из кэша"
+    assert texts[3] == '' and texts[0:2] == ['', 'Ответить']
+    assert list(texts) == ['', 'Ответить', 'Первый', '']
+    print("✅ Только нужные элементы, один запрос на элемент")
+    print()
+
+
+def run_all_tests():
+    """Запуск всех тестов"""
+    print("\n" + "="*60)
+    print("📄 ТЕСТИРОВАНИЕ ИЗВЛЕЧЕНИЯ DOM".center(60))
+    print("="*60)
+    
+    tests = [
+        test_single_request,
+        test_filters,
+        test_fallback_lazy,
+    ]
+    
+    passed = 0
+    failed = 0
+    
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except AssertionError as e:
+            print(f"\n❌ FAILED: {e}\n")
+            failed += 1
+        except Exception as e:
+            print(f"\n❌ ERROR: {e}\n")
+            failed += 1
+    
+    print("="*60)
+    if failed == 0:
+        print("🎉 ВСЕ ТЕСТЫ ИЗВЛЕЧЕНИЯ ПРОШЛИ!".center(60))
+    else:
+        print("⚠️  ЕСТЬ ПРОБЛЕМЫ С ИЗВЛЕЧЕНИЕМ!".center(60))
+    print("="*60)
+    print(f"✅ Пройдено: {passed}/{len(tests)}")
+    if failed:
+        print(f"❌ Провалено: {failed}/{len(tests)}")
+    print("="*60)
+    
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+test_driver_pool.py
+🚗 Тестирование пула WebDriver сессий (src/engines/driver_pool.py)
+
+Проверяет:
+- Кэш пути к chromedriver (процесс и диск)
+- Аренду и возврат сессий, повторное использование по ключу
+- Проверку связи: мертвая сессия создается заново
+- Ожидание занятой сессии, закрытие пула
+- Несколько Chrome без профиля: занятая сессия не ждет
+"""
+
+import os
+import stat
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# Добавляем корень проекта в путь
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.engines import driver_pool
+from src.engines.driver_pool import DriverPool, resolve_chromedriver
+
+
+class _FakeService:
+    def __init__(self):
+        self.stopped = False
+    
+    def stop(self):
+        self.stopped = True
+
+
+class _FakeDriver:
+    """Сессия без браузера"""
+    
+    def __init__(self, params):
+        self.params = params
+        self.alive = True
+        self.quit_called = False
+        self.service = _FakeService()
+    
+    def quit(self):
+        self.quit_called = True
+
+
+def _healthy(driver):
+    return driver.alive
+
+
+def test_resolve_chromedriver():
+    """Тест кэша пути к chromedriver"""
+    print("="*60)
+    print("🧪 Тест 1: Путь к chromedriver")
+    print("="*60)
+    
+    saved_env = os.environ.pop('CHROMEDRIVER_PATH', None)
+    saved_legacy = driver_pool.LEGACY_DRIVER_PATHS
+    driver_pool.LEGACY_DRIVER_PATHS = []
+    driver_pool._resolved_path = None
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            binary = Path(tmp_dir, 'chromedriver')
+            binary.write_text('#!/bin/sh\n', encoding='utf-8')
+            binary.chmod(binary.stat().st_mode | stat.S_IEXEC)
+            cache = os.path.join(tmp_dir, 'cache', 'chromedriver.json')
+            installs = []
+            install = lambda: installs.append(1) or str(binary)
+            
+            assert resolve_chromedriver(cache, install) == str(binary)
+            assert resolve_chromedriver(cache, install) == str(binary)
+            assert len(installs) == 1 and Path(cache).exists()
+            print("✅ Кэш процесса")
+            
+            driver_pool._resolved_path = None  # Новый процесс
+            assert resolve_chromedriver(cache, install) == str(binary) and len(installs) == 1
+            print("✅ Кэш на диске")
+            
+            assert resolve_chromedriver(cache, install, refresh=True) == str(binary) and len(installs) == 2
+            binary.unlink()
+            driver_pool._resolved_path = None
+            try:
+                resolve_chromedriver(cache, lambda: (_ for _ in ()).throw(RuntimeError('offline')))
+                assert False, "Удаленный драйвер в кэше не используется"
+            except RuntimeError:
+                pass
+            print("✅ refresh и недействительный кэш")
+    finally:
+        driver_pool.LEGACY_DRIVER_PATHS = saved_legacy
+        driver_pool._resolved_path = None
+        if saved_env is not None:
+            os.environ['CHROMEDRIVER_PATH'] = saved_env
+    print()
+
+
+def test_lease_and_reuse():
+    """Тест аренды и повторного использования"""
+    print("="*60)
+    print("🧪 Тест 2: Аренда сессий")
+    print("="*60)
+    
+    pool = DriverPool(factory=_FakeDriver, health_check=_healthy)
+    
+    first = pool.attach('127.0.0.1:9222')
+    pool.release(first)
+    assert pool.attach('127.0.0.1:9222') is first, "Тот же Chrome - та же сессия"
+    other = pool.attach('127.0.0.1:9223')
+    assert other is not first and len(pool) == 2
+    assert pool.stats == {'created': 2, 'reused': 1, 'discarded': 0}
+    assert pool.is_attached(first)
+    print("✅ Повторное использование по debug порту")
+    
+    headless = pool.launch('/tmp/profile-a', headless=True, arguments=['--no-sandbox'])
+    assert headless.params['arguments'] == ['--no-sandbox'] and not pool.is_attached(headless)
+    pool.release(headless)
+    assert pool.launch('/tmp/profile-a', headless=True) is headless
+    assert pool.launch('/tmp/profile-a') is not headless, "Другой режим - другая сессия"
+    print("✅ Ключ профиля")
+    
+    pool.release(first)
+    first.alive = False
+    fresh = pool.attach('127.0.0.1:9222')
+    assert fresh is not first and first.service.stopped and not first.quit_called
+    print("✅ Мертвая сессия пересоздается (Chrome пользователя не закрывается)")
+    
+    pool.discard(headless)
+    assert headless.quit_called and not pool.owns(headless)
+    pool.close_all()
+    assert len(pool) == 0 and fresh.service.stopped
+    print("✅ discard и close_all")
+    print()
+
+
+def test_wait_for_lease():
+    """Тест ожидания занятой сессии"""
+    print("="*60)
+    print("🧪 Тест 3: Занятая сессия")
+    print("="*60)
+    
+    created = []
+    
+    def slow_factory(params):
+        time.sleep(0.05)
+        driver = _FakeDriver(params)
+        created.append(driver)
+        return driver
+    
+    pool = DriverPool(factory=slow_factory, health_check=_healthy)
+    results = []
+    
+    def run():
+        driver = pool.attach()
+        results.append(driver)
+        time.sleep(0.02)
+        pool.release(driver)
+    
+    threads = [threading.Thread(target=run) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(created) == 1 and len(results) == 3 and len(set(map(id, results))) == 1, \
+        "Один Chrome - одна сессия, макросы ждут очереди"
+    print("✅ Параллельные макросы получают сессию по очереди")
+    
+    driver = pool.attach()
+    try:
+        pool.attach(timeout=0.05)
+        assert False, "Занятая сессия - TimeoutError"
+    except TimeoutError:
+        pass
+    pool.release(driver)
+    
+    failing = DriverPool(factory=lambda params: (_ for _ in ()).throw(RuntimeError('no chrome')))
+    for _ in range(2):
+        try:
+            failing.attach(timeout=0.05)
+            assert False
+        except RuntimeError:
+            pass
+    assert len(failing) == 0, "Ошибка создания не оставляет занятое место"
+    print("✅ Таймаут и ошибка создания")
+    print()
+
+
+def test_launch_without_profile():
+    """Тест параллельных запусков Chrome без профиля"""
+    print("="*60)
+    print("🧪 Тест 4: Chrome без профиля")
+    print("="*60)
+    
+    pool = DriverPool(factory=_FakeDriver, health_check=_healthy, max_idle_spawned=2)
+    
+    first = pool.launch(headless=True)
+    started = time.monotonic()
+    second = pool.launch(headless=True, timeout=None)
+    assert time.monotonic() - started < 0.5, "Занятая сессия без профиля не ждет"
+    assert second is not first and len(pool) == 2
+    print("✅ Второй макрос получает свой Chrome сразу")
+    
+    pool.release(second)
+    assert pool.launch(headless=True) is second, "Свободная сессия используется повторно"
+    pool.release(first)
+    pool.release(second)
+    assert {pool.launch(headless=True), pool.launch(headless=True)} == {first, second}
+    assert pool.stats['created'] == 2 and len(pool) == 2
+    print("✅ Свободные сессии раньше новых запусков")
+    
+    pool.discard(first)
+    third = pool.launch(headless=True)
+    assert third not in (first, second) and len(pool) == 2
+    pool.close_all()
+    assert first.quit_called and second.quit_called and third.quit_called
+    print("✅ discard и close_all")
+    
+    # Профиль открыт только в одном Chrome - ждем, но не бесконечно
+    profile = pool.launch('/tmp/profile-b')
+    try:
+        pool.launch('/tmp/profile-b', timeout=0.05)
+        assert False, "Занятый профиль - TimeoutError"
+    except TimeoutError:
+        pass
+    pool.release(profile)
+    assert driver_pool.LEASE_TIMEOUT is not None and driver_pool.LEASE_TIMEOUT > 0
+    print("✅ Профиль ждет с конечным таймаутом")
+    
+    # Пик из трех макросов: после него свободным остается один Chrome
+    pool = DriverPool(factory=_FakeDriver, health_check=_healthy)
+    drivers = [pool.launch() for _ in range(3)]
+    for driver in drivers:
+        pool.release(driver)
+    assert len(pool) == 1 and pool.stats['discarded'] == 2
+    assert drivers[1].quit_called and drivers[2].quit_called and not drivers[0].quit_called
+    assert pool.launch() is drivers[0], "Остается сессия с основным ключом"
+    profile = pool.launch('/tmp/profile-c')
+    pool.release(profile)
+    assert not profile.quit_called, "Сессии с профилем не закрываются"
+    print("✅ Лишние свободные Chrome без профиля закрываются")
+    print()
+
+
+def run_all_tests():
+    """Запуск всех тестов"""
+    print("\n" + "="*60)
+    print("🚗 ТЕСТИРОВАНИЕ ПУЛА WEBDRIVER".center(60))
+    print("="*60)
+    
+    tests = [
+        test_resolve_chromedriver,
+        test_lease_and_reuse,
+        test_wait_for_lease,
+        test_launch_without_profile,
+    ]
+    
+    passed = 0
+    failed = 0
+    
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except AssertionError as e:
+            print(f"\n❌ FAILED: {e}\n")
+            failed += 1
+        except Exception as e:
+            print(f"\n❌ ERROR: {e}\n")
+            failed += 1
+    
+    print("="*60)
+    if failed == 0:
+        print("🎉 ВСЕ ТЕСТЫ ПУЛА ПРОШЛИ!".center(60))
+    else:
+        print("⚠️  ЕСТЬ ПРОБЛЕМЫ С ПУЛОМ!".center(60))
+    print("="*60)
+    print(f"✅ Пройдено: {passed}/{len(tests)}")
+    if failed:
+        print(f"❌ Провалено: {failed}/{len(tests)}")
+    print("="*60)
+    
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+test_instance_worker.py
+🧵 Тестирование воркеров экземпляров (src/engines/instance_worker.py)
+
+Проверяет:
+- Выполнение макроса в потоке экземпляра на его драйвере
+- Один runner на экземпляр (повторные макросы без создания runner'а)
+- Поток результатов через общую очередь
+- Перезагрузку макроса, измененного по тому же пути
+- Runner до первого макроса, задание с url без драйвера
+"""
+
+import queue
+import sys
+from pathlib import Path
+
+# Добавляем корень проекта в путь
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.engines.instance_worker import InstanceWorker
+
+
+class _FakeDriver:
+    """Драйвер без браузера: запоминает переходы"""
+    
+    def __init__(self):
+        self.urls = []
+    
+    def get(self, url):
+        self.urls.append(url)
+
+
+class _FakeRunner:
+    """Runner без pyautogui: успех для всех макросов кроме fail"""
+    
+    created = []
+    
+    def __init__(self, config_path, driver):
+        self.config_path = config_path
+        self.driver = driver
+        self.loaded = [config_path]
+        self.execution_state = {}
+        _FakeRunner.created.append(self)
+    
+    def load_config(self, config_path):
+        self.config_path = config_path
+        self.loaded.append(config_path)
+    
+    def run_sequence(self, sequence_name, delay=3):
+        assert delay == 0, "Без задержки перед запуском"
+        if sequence_name == 'fail':
+            self.execution_state = {'failed_step': {'action': 'click', 'error': 'шаблон не найден'}}
+            return False
+        if sequence_name == 'crash':
+            raise RuntimeError('boom')
+        self.execution_state = {'sequence_name': sequence_name, 'failed_step': None}
+        return True
+
+
+def test_run_job():
+    """Тест выполнения одного макроса"""
+    print("="*60)
+    print("🧪 Тест 1: Макрос на драйвере экземпляра")
+    print("="*60)
+    
+    _FakeRunner.created = []
+    driver = _FakeDriver()
+    worker = InstanceWorker(3, driver, queue.Queue(), runner_factory=_FakeRunner)
+    
+    result = worker.run_job('macros/like.atlas', url='https://example.com')
+    assert result['success'] and result['instance_id'] == 3 and result['error'] is None
+    assert driver.urls == ['https://example.com']
+    assert _FakeRunner.created[0].driver is driver, "Runner получает драйвер экземпляра"
+    assert result['execution_state']['sequence_name'] == 'like'
+    assert result['startup'] is not None and result['seconds'] >= result['startup']
+    print(f"✅ Успех, запуск {result['startup'] * 1000:.2f} мс")
+    
+    result = worker.run_job('macros/fail.atlas')
+    assert not result['success'] and result['error'] == 'шаблон не найден'
+    result = worker.run_job('macros/crash.atlas')
+    assert not result['success'] and result['error'] == 'boom'
+    print("✅ Ошибка шага и исключение")
+    
+    assert len(_FakeRunner.created) == 1, "Runner создается один раз на экземпляр"
+    assert _FakeRunner.created[0].loaded == ['macros/like.atlas', 'macros/fail.atlas', 'macros/crash.atlas']
+    print("✅ Один runner, конфиги перезагружаются")
+    print()
+
+
+def test_worker_threads():
+    """Тест потоков и очереди результатов"""
+    print("="*60)
+    print("🧪 Тест 2: Потоки экземпляров")
+    print("="*60)
+    
+    _FakeRunner.created = []
+    results = queue.Queue()
+    workers = [InstanceWorker(i, _FakeDriver(), results, runner_factory=_FakeRunner) for i in range(3)]
+    for worker in workers:
+        worker.start()
+    
+    for worker in workers:
+        worker.submit('macros/like.atlas')
+        worker.submit('macros/fail.atlas' if worker.instance_id == 1 else 'macros/like.atlas')
+    
+    received = [results.get(timeout=5) for _ in range(6)]
+    for worker in workers:
+        worker.stop()
+    for worker in workers:
+        worker.join(timeout=5)
+        assert not worker.is_alive(), "Поток завершается после stop()"
+    
+    assert sorted(r['instance_id'] for r in received) == [0, 0, 1, 1, 2, 2]
+    assert [r['success'] for r in received].count(False) == 1
+    assert len(_FakeRunner.created) == 3, "Свой runner у каждого экземпляра"
+    assert {runner.driver for runner in _FakeRunner.created} == {worker.driver for worker in workers}
+    print(f"✅ Результатов: {len(received)}, потоков: {len(workers)}")
+    print()
+
+
+class _FileRunner(_FakeRunner):
+    """Runner, который читает шаги из файла при загрузке конфига"""
+    
+    def __init__(self, config_path, driver):
+        super().__init__(config_path, driver)
+        self.steps = Path(config_path).read_text(encoding='utf-8')
+        self.logged = []
+    
+    def load_config(self, config_path):
+        super().load_config(config_path)
+        self.steps = Path(config_path).read_text(encoding='utf-8')
+    
+    def run_sequence(self, sequence_name, delay=3):
+        self.logged.append(self.steps)
+        return super().run_sequence(sequence_name, delay)
+
+
+def test_reload_edited_macro():
+    """Тест перезагрузки измененного макроса по тому же пути"""
+    import tempfile
+    print("="*60)
+    print("🧪 Тест 3: Измененный макрос")
+    print("="*60)
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        macro = Path(tmp_dir) / 'job.atlas'
+        macro.write_text('log "v1"', encoding='utf-8')
+        worker = InstanceWorker(0, _FakeDriver(), queue.Queue(), runner_factory=_FileRunner)
+        
+        assert worker.run_job(str(macro))['success']
+        macro.write_text('log "v2"', encoding='utf-8')
+        assert worker.run_job(str(macro))['success']
+        
+        assert worker.runner.logged == ['log "v1"', 'log "v2"'], "Второй запуск - новые шаги"
+    print("✅ Тот же путь, новое содержимое")
+    print()
+
+
+def test_warm_and_missing_driver():
+    """Тест прогрева runner'а и задания с url без драйвера"""
+    print("="*60)
+    print("🧪 Тест 4: Прогрев и url без драйвера")
+    print("="*60)
+    
+    _FakeRunner.created = []
+    worker = InstanceWorker(0, None, queue.Queue(), runner_factory=_FakeRunner)
+    worker.start()
+    worker.stop()
+    worker.join(timeout=5)
+    assert len(_FakeRunner.created) == 1 and _FakeRunner.created[0].loaded == [None], \
+        "Runner создается при старте потока, до первого макроса"
+    print("✅ Runner готов до первого задания")
+    
+    result = worker.run_job('macros/like.atlas', url='https://example.com')
+    assert not result['success'] and 'нет драйвера' in result['error']
+    assert worker.runner.loaded == [None], "Макрос не запускается без перехода на url"
+    assert worker.run_job('macros/like.atlas')['success'], "Без url драйвер не нужен"
+    assert len(_FakeRunner.created) == 1
+    print("✅ Задание с url без драйвера - ошибка, а не AttributeError")
+    print()
+
+
+def run_all_tests():
+    """Запуск всех тестов"""
+    print("\n" + "="*60)
+    print("🧵 ТЕСТИРОВАНИЕ ВОРКЕРОВ ЭКЗЕМПЛЯРОВ".center(60))
+    print("="*60)
+    
+    tests = [
+        test_run_job,
+        test_worker_threads,
+        test_reload_edited_macro,
+        test_warm_and_missing_driver,
+    ]
+    
+    passed = 0
+    failed = 0
+    
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except AssertionError as e:
+            print(f"\n❌ FAILED: {e}\n")
+            failed += 1
+        except Exception as e:
+            print(f"\n❌ ERROR: {e}\n")
+            failed += 1
+    
+    print("="*60)
+    if failed == 0:
+        print("🎉 ВСЕ ТЕСТЫ ВОРКЕРОВ ПРОШЛИ!".center(60))
+    else:
+        print("⚠️  ЕСТЬ ПРОБЛЕМЫ С ВОРКЕРАМИ!".center(60))
+    print("="*60)
+    print(f"✅ Пройдено: {passed}/{len(tests)}")
+    if failed:
+        print(f"❌ Провалено: {failed}/{len(tests)}")
+    print("="*60)
+    
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+test_macro_worker_pool.py
+📥 Тестирование очереди макросов (src/engines/macro_worker_pool.py)
+
+Проверяет:
+- Приоритеты и порядок заданий в SQLite
+- Записи результатов, отмену, возврат заданий упавшего демона
+- Добавление новых файлов папки (--watch)
+- Пул воркеров: один runner на воркер, все задания выполнены
+"""
+
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Добавляем корень проекта в путь
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.engines.macro_worker_pool import (
+    STATUS_CANCELLED, STATUS_DONE, STATUS_FAILED, STATUS_QUEUED, STATUS_RUNNING,
+    BROWSER_NONE, JobQueue, MacroWorkerPool, lease_drivers,
+)
+
+
+class _FakeRunner:
+    """Runner без pyautogui: макросы с 'fail' в имени завершаются ошибкой"""
+    
+    created = []
+    
+    def __init__(self, config_path, driver):
+        self.config_path = config_path
+        self.execution_state = {}
+        _FakeRunner.created.append(self)
+    
+    def load_config(self, config_path):
+        self.config_path = config_path
+    
+    def run_sequence(self, sequence_name, delay=3):
+        success = 'fail' not in sequence_name
+        self.execution_state = {
+            'sequence_name': sequence_name,
+            'completed_steps': [{'action': 'wait'}],
+            'failed_step': None if success else {'action': 'click', 'error': 'не найден'},
+        }
+        return success
+
+
+def test_priorities():
+    """Тест порядка заданий"""
+    print("="*60)
+    print("🧪 Тест 1: Приоритеты")
+    print("="*60)
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        jobs = JobQueue(os.path.join(tmp_dir, 'jobs.db'))
+        low = jobs.submit('a.atlas')
+        high = jobs.submit('b.atlas', priority=10)
+        low2 = jobs.submit('c.atlas')
+        cancelled = jobs.submit('d.atlas', priority=20)
+        assert jobs.cancel(cancelled) and not jobs.cancel(cancelled)
+        
+        order = [jobs.claim('w')['id'] for _ in range(3)]
+        assert order == [high, low, low2], order
+        assert jobs.claim('w') is None, "Очередь пуста"
+        assert jobs.get(high)['status'] == STATUS_RUNNING and jobs.get(high)['pid'] == os.getpid()
+        print("✅ Приоритет, затем порядок добавления; отмененные пропускаются")
+        
+        jobs.finish(high, {'success': True, 'error': None, 'startup': 0.001, 'seconds': 0.5,
+                           'execution_state': {'sequence_name': 'b', 'completed_steps': [{}, {}]}})
+        jobs.finish(low, {'success': False, 'error': 'boom', 'startup': 0.0, 'seconds': 0.1})
+        record = jobs.get(high)
+        assert record['status'] == STATUS_DONE and record['success'] == 1 and record['seconds'] == 0.5
+        assert '"completed_steps": 2' in record['result']
+        assert jobs.get(low)['status'] == STATUS_FAILED and jobs.get(low)['error'] == 'boom'
+        assert jobs.counts() == {STATUS_DONE: 1, STATUS_FAILED: 1, STATUS_RUNNING: 1, STATUS_CANCELLED: 1}
+        print("✅ Записи результатов")
+        
+        # Задание "упавшего" демона: pid процесса, которого нет
+        jobs.conn.execute('UPDATE jobs SET pid = ? WHERE id = ?', (2 ** 22 + 12345, low2))
+        assert jobs.recover_stale() == 1 and jobs.get(low2)['status'] == STATUS_QUEUED
+        print("✅ Возврат незавершенных заданий")
+        jobs.close()
+    print()
+
+
+def test_watch_directory():
+    """Тест добавления файлов папки"""
+    print("="*60)
+    print("🧪 Тест 2: Папка macro-queues")
+    print("="*60)
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        queue_dir = Path(tmp_dir, 'macro-queues')
+        queue_dir.mkdir()
+        Path(queue_dir, 'one.atlas').write_text("wait 1s\n", encoding='utf-8')
+        Path(queue_dir, 'notes.txt').write_text("x", encoding='utf-8')
+        jobs = JobQueue(os.path.join(tmp_dir, 'jobs.db'))
+        
+        assert len(jobs.submit_new_files(str(queue_dir))) == 1
+        assert jobs.submit_new_files(str(queue_dir)) == [], "Уже добавленный файл не повторяется"
+        
+        Path(queue_dir, 'two.atlas').write_text("wait 1s\n", encoding='utf-8')
+        path = Path(queue_dir, 'one.atlas')
+        stat = path.stat()
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        added = jobs.submit_new_files(str(queue_dir), priority=3)
+        assert len(added) == 2, "Новый и измененный файлы"
+        assert {job['priority'] for job in jobs.jobs(STATUS_QUEUED) if job['id'] in added} == {3}
+        print("✅ Новые и измененные .atlas")
+        
+        Path(queue_dir, 'bad.atlas').write_text("frobnicate\n", encoding='utf-8')
+        checked = []
+        accept = lambda path: checked.append(path) or not path.endswith('bad.atlas')
+        assert jobs.submit_new_files(str(queue_dir), accept=accept) == []
+        assert jobs.submit_new_files(str(queue_dir), accept=accept) == []
+        assert len(checked) == 1, "Отклоненный файл не проверяется повторно"
+        print("✅ Проверка перед добавлением")
+        jobs.close()
+    print()
+
+
+def test_worker_pool():
+    """Тест пула воркеров"""
+    print("="*60)
+    print("🧪 Тест 3: Пул воркеров")
+    print("="*60)
+    
+    _FakeRunner.created = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        jobs = JobQueue(os.path.join(tmp_dir, 'jobs.db'))
+        for i in range(40):
+            jobs.submit(f'macros/job_{i}.atlas', priority=i % 3)
+        jobs.submit('macros/job_fail.atlas')
+        
+        pool = MacroWorkerPool(jobs, workers=3, runner_factory=_FakeRunner, poll_interval=0.01)
+        started = time.perf_counter()
+        pool.start(exit_when_empty=True)
+        pool.join(timeout=10)
+        elapsed = time.perf_counter() - started
+        
+        assert not pool.alive()
+        results = pool.drain_results()
+        assert len(results) == 41 and len({r['job_id'] for r in results}) == 41, "Каждое задание - один раз"
+        assert jobs.counts() == {STATUS_DONE: 40, STATUS_FAILED: 1}
+        assert len(_FakeRunner.created) <= 3, "Один runner на воркер"
+        assert lease_drivers(3, BROWSER_NONE) == [], "--browser none: воркеры без драйвера"
+        failed = jobs.jobs(STATUS_FAILED)[0]
+        assert failed['macro'] == 'macros/job_fail.atlas' and failed['error'] == 'не найден'
+        print(f"✅ 41 задание, {len(_FakeRunner.created)} runner'а, {elapsed * 1000:.0f} мс")
+        
+        try:
+            MacroWorkerPool(jobs, workers=0)
+            assert False, "workers=0 - ошибка"
+        except ValueError:
+            pass
+        jobs.close()
+    print()
+
+
+def run_all_tests():
+    """Запуск всех тестов"""
+    print("\n" + "="*60)
+    print("📥 ТЕСТИРОВАНИЕ ОЧЕРЕДИ МАКРОСОВ".center(60))
+    print("="*60)
+    
+    tests = [
+        test_priorities,
+        test_watch_directory,
+        test_worker_pool,
+    ]
+    
+    passed = 0
+    failed = 0
+    
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except AssertionError as e:
+            print(f"\n❌ FAILED: {e}\n")
+            failed += 1
+        except Exception as e:
+            print(f"\n❌ ERROR: {e}\n")
+            failed += 1
+    
+    print("="*60)
+    if failed == 0:
+        print("🎉 ВСЕ ТЕСТЫ ОЧЕРЕДИ ПРОШЛИ!".center(60))
+    else:
+        print("⚠️  ЕСТЬ ПРОБЛЕМЫ С ОЧЕРЕДЬЮ!".center(60))
+    print("="*60)
+    print(f"✅ Пройдено: {passed}/{len(tests)}")
+    if failed:
+        print(f"❌ Провалено: {failed}/{len(tests)}")
+    print("="*60)
+    
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
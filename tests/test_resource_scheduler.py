@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+test_resource_scheduler.py
+🔒 Тестирование блокировок ресурсов шагов (src/core/resource_scheduler.py)
+
+Проверяет:
+- Ресурсы шагов из реестра действий (в том числе resources(step))
+- Ввод выполняется строго по одному, шаги DOM разных драйверов - параллельно
+- Предел сетевых шагов
+"""
+
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Добавляем корень проекта в путь
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.core.actions import (
+    RESOURCE_DOM, RESOURCE_INPUT, RESOURCE_NETWORK, register_action, selenium_click_resources,
+    step_resources, unregister_action,
+)
+from src.core.resource_scheduler import ResourceScheduler, get_scheduler
+
+
+class _Overlap:
+    """Счетчик одновременно выполняющихся вызовов"""
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.current = 0
+        self.peak = 0
+    
+    def run(self, step):
+        with self.lock:
+            self.current += 1
+            self.peak = max(self.peak, self.current)
+        time.sleep(0.05)
+        with self.lock:
+            self.current -= 1
+        return True
+
+
+def _run_threads(scheduler, resources, drivers):
+    """Один шаг в каждом потоке, возвращает пик одновременности"""
+    overlap = _Overlap()
+    threads = [
+        threading.Thread(target=scheduler.wrap(overlap.run, resources, lambda d=driver: d), args=({},))
+        for driver in drivers
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return overlap.peak
+
+
+def test_step_resources():
+    """Тест ресурсов шагов"""
+    print("="*60)
+    print("🧪 Тест 1: Ресурсы шагов")
+    print("="*60)
+    
+    handler = lambda runner, step: True
+    try:
+        register_action('test_input', handler, resources={RESOURCE_INPUT})
+        register_action('test_click', handler, resources=selenium_click_resources)
+        register_action('test_free', handler)
+        
+        assert step_resources({'action': 'test_input'}) == {RESOURCE_INPUT}
+        assert step_resources({'action': 'test_click'}) == {RESOURCE_DOM}
+        assert step_resources({'action': 'test_click', 'humanlike': True}) == {RESOURCE_DOM, RESOURCE_INPUT}
+        assert step_resources({'action': 'test_free'}) == frozenset()
+        assert step_resources({'action': 'unknown'}) == frozenset()
+    finally:
+        for name in ('test_input', 'test_click', 'test_free'):
+            unregister_action(name)
+    
+    assert get_scheduler() is get_scheduler(), "Один планировщик на процесс"
+    print("✅ Статические ресурсы, resources(step), без ресурсов")
+    print()
+
+
+def test_input_and_dom():
+    """Тест блокировки ввода и DOM"""
+    print("="*60)
+    print("🧪 Тест 2: Ввод по одному, DOM параллельно")
+    print("="*60)
+    
+    scheduler = ResourceScheduler()
+    drivers = [object() for _ in range(4)]
+    
+    assert _run_threads(scheduler, frozenset({RESOURCE_INPUT}), drivers) == 1, "Ввод - строго по одному"
+    assert scheduler.stats['input_holds'] == 4 and scheduler.stats['input_wait'] > 0
+    print(f"✅ Ввод: ожидание {scheduler.stats['input_wait']:.2f}с")
+    
+    assert _run_threads(scheduler, frozenset({RESOURCE_DOM}), drivers) == 4, "Разные драйверы - параллельно"
+    assert _run_threads(scheduler, frozenset({RESOURCE_DOM}), [drivers[0]] * 3) == 1, "Один драйвер - по одному"
+    assert _run_threads(scheduler, frozenset(), drivers) == 4
+    print("✅ DOM по драйверам, шаги без ресурсов")
+    
+    # Ввод внутри шага, который уже держит ввод (RLock)
+    with scheduler.hold(frozenset({RESOURCE_DOM, RESOURCE_INPUT}), drivers[0]):
+        with scheduler.input():
+            pass
+    print("✅ Повторный захват в том же потоке")
+    print()
+
+
+def test_network_limit():
+    """Тест предела сетевых шагов"""
+    print("="*60)
+    print("🧪 Тест 3: Сетевые шаги")
+    print("="*60)
+    
+    drivers = [None] * 5
+    assert _run_threads(ResourceScheduler(), frozenset({RESOURCE_NETWORK}), drivers) == 5
+    assert _run_threads(ResourceScheduler(network_limit=2), frozenset({RESOURCE_NETWORK}), drivers) == 2
+    print("✅ Без предела и network_limit=2")
+    print()
+
+
+def run_all_tests():
+    """Запуск всех тестов"""
+    print("\n" + "="*60)
+    print("🔒 ТЕСТИРОВАНИЕ БЛОКИРОВОК РЕСУРСОВ".center(60))
+    print("="*60)
+    
+    tests = [
+        test_step_resources,
+        test_input_and_dom,
+        test_network_limit,
+    ]
+    
+    passed = 0
+    failed = 0
+    
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except AssertionError as e:
+            print(f"\n❌ FAILED: {e}\n")
+            failed += 1
+        except Exception as e:
+            print(f"\n❌ ERROR: {e}\n")
+            failed += 1
+    
+    print("="*60)
+    if failed == 0:
+        print("🎉 ВСЕ ТЕСТЫ БЛОКИРОВОК ПРОШЛИ!".center(60))
+    else:
+        print("⚠️  ЕСТЬ ПРОБЛЕМЫ С БЛОКИРОВКАМИ!".center(60))
+    print("="*60)
+    print(f"✅ Пройдено: {passed}/{len(tests)}")
+    if failed:
+        print(f"❌ Провалено: {failed}/{len(tests)}")
+    print("="*60)
+    
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
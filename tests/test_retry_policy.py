@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+test_retry_policy.py
+🔁 Тестирование политики повтора шагов (src/core/retry_policy.py)
+
+Проверяет:
+- Разбор поля retry (число, dict, settings.retry по умолчанию, ошибки)
+- Число попыток и backoff между ними
+- Общий таймаут шага (оставшееся время передается попытке)
+- retry=... в DSL командах click/open
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+# Добавляем корень проекта в путь
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.core.retry_policy import RetryPolicy
+from src.core.atlas_dsl_parser import AtlasDSLParser
+
+
+class _FakeClock:
+    """Часы и пауза без реального ожидания"""
+    
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+    
+    def clock(self):
+        return self.now
+    
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def test_from_value():
+    """Тест разбора политики"""
+    print("="*60)
+    print("🧪 Тест 1: Поле retry")
+    print("="*60)
+    
+    assert RetryPolicy.from_value(3) == RetryPolicy(attempts=3)
+    assert RetryPolicy.from_value('2').attempts == 2
+    policy = RetryPolicy.from_value({'attempts': 4, 'backoff': 0.5, 'timeout': 20})
+    assert (policy.attempts, policy.backoff, policy.timeout) == (4, 0.5, 20.0)
+    print("✅ Число и dict")
+    
+    settings = {'retry': {'backoff': 1.0, 'max_backoff': 5}}
+    policy = RetryPolicy.from_value(3, settings)
+    assert (policy.attempts, policy.backoff, policy.max_backoff) == (3, 1.0, 5.0), "settings.retry по умолчанию"
+    assert RetryPolicy.from_value({'backoff': 0.2}, settings).backoff == 0.2, "Значение шага важнее"
+    print("✅ settings.retry")
+    
+    for bad in (0, -1, 'abc', True, [3], {'attempts': 2, 'tries': 3}, {'backoff': -1}, {'timeout': 0}):
+        try:
+            RetryPolicy.from_value(bad)
+            assert False, f"Должно быть отклонено: {bad!r}"
+        except ValueError:
+            pass
+    print("✅ Неверные значения - ValueError")
+    print()
+
+
+def test_attempts_and_backoff():
+    """Тест попыток и пауз"""
+    print("="*60)
+    print("🧪 Тест 2: Попытки и backoff")
+    print("="*60)
+    
+    policy = RetryPolicy(attempts=5, backoff=0.5, backoff_factor=2.0, max_backoff=1.5)
+    assert list(policy.delays()) == [0.5, 1.0, 1.5, 1.5]
+    
+    fake = _FakeClock()
+    results = iter([False, False, True])
+    calls, retries = [], []
+    ok = policy.run(lambda remaining: calls.append(remaining) or next(results),
+                    on_retry=lambda number, delay: retries.append((number, delay)),
+                    clock=fake.clock, sleep=fake.sleep)
+    assert ok and len(calls) == 3, "Успех на третьей попытке"
+    assert calls == [None, None, None], "Без timeout - без ограничения попытки"
+    assert retries == [(2, 0.5), (3, 1.0)] and fake.sleeps == [0.5, 1.0]
+    print("✅ Успех после повторов")
+    
+    fake = _FakeClock()
+    calls = []
+    ok = RetryPolicy(attempts=3).run(lambda remaining: calls.append(1) or False,
+                                     clock=fake.clock, sleep=fake.sleep)
+    assert not ok and len(calls) == 3 and fake.sleeps == [], "Все попытки, без пауз"
+    print("✅ Все попытки неудачны")
+    print()
+
+
+def test_timeout():
+    """Тест общего таймаута шага"""
+    print("="*60)
+    print("🧪 Тест 3: Таймаут")
+    print("="*60)
+    
+    fake = _FakeClock()
+    remaining = []
+    
+    def attempt(left):
+        remaining.append(left)
+        fake.now += 4.0  # Попытка занимает 4 секунды
+        return False
+    
+    policy = RetryPolicy(attempts=10, backoff=1.0, backoff_factor=1.0, timeout=10.0)
+    assert not policy.run(attempt, clock=fake.clock, sleep=fake.sleep)
+    assert remaining == [10.0, 5.0], remaining
+    assert len(remaining) < policy.attempts, "Попытки после таймаута не начинаются"
+    print(f"✅ Попыток: {len(remaining)}, оставшееся время: {remaining}")
+    print()
+
+
+def test_dsl_retry_params():
+    """Тест retry в DSL"""
+    print("="*60)
+    print("🧪 Тест 4: retry в DSL")
+    print("="*60)
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        parser = AtlasDSLParser(templates_base_path=tmp_dir, dom_selectors_path=tmp_dir)
+        steps = parser.parse("click Like retry=3 backoff=0.5 retry_timeout=20\nopen App retry=2\nclick Other\n")['steps']
+    
+    assert steps[0]['retry'] == {'attempts': 3, 'backoff': 0.5, 'timeout': 20.0}
+    assert steps[1]['retry'] == {'attempts': 2}
+    assert 'retry' not in steps[2]
+    assert RetryPolicy.from_value(steps[0]['retry']).timeout == 20.0
+    print("✅ click/open retry=")
+    print()
+
+
+def run_all_tests():
+    """Запуск всех тестов"""
+    print("\n" + "="*60)
+    print("🔁 ТЕСТИРОВАНИЕ ПОВТОРА ШАГОВ".center(60))
+    print("="*60)
+    
+    tests = [
+        test_from_value,
+        test_attempts_and_backoff,
+        test_timeout,
+        test_dsl_retry_params,
+    ]
+    
+    passed = 0
+    failed = 0
+    
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except AssertionError as e:
+            print(f"\n❌ FAILED: {e}\n")
+            failed += 1
+        except Exception as e:
+            print(f"\n❌ ERROR: {e}\n")
+            failed += 1
+    
+    print("="*60)
+    if failed == 0:
+        print("🎉 ВСЕ ТЕСТЫ ПОВТОРА ПРОШЛИ!".center(60))
+    else:
+        print("⚠️  ЕСТЬ ПРОБЛЕМЫ С ПОВТОРОМ!".center(60))
+    print("="*60)
+    print(f"✅ Пройдено: {passed}/{len(tests)}")
+    if failed:
+        print(f"❌ Провалено: {failed}/{len(tests)}")
+    print("="*60)
+    
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+test_template_index.py
+🗂️ Тестирование индекса имен шаблонов (src/core/template_index.py)
+
+Проверяет:
+- Все формы имени (точное, без префиксов, дефисы → подчеркивания, регистр)
+- Инкрементальное обновление по mtime папок
+- Ленивую загрузку в AtlasDSLParser
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Добавляем корень проекта в путь
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.core.template_index import TemplateIndex, name_forms
+from src.core.atlas_dsl_parser import AtlasDSLParser
+
+
+def _touch_png(path: Path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b'png')
+    # Сдвигаем mtime папки (файловые системы с грубым mtime)
+    stat = os.stat(path.parent)
+    os.utime(path.parent, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_name_forms_and_resolve():
+    """Тест форм имени и поиска без учета регистра"""
+    print("="*60)
+    print("🧪 Тест 1: Формы имени")
+    print("="*60)
+    
+    assert name_forms('Chrome-TikTok-Like-btn') == ['Chrome-TikTok-Like-btn', 'Like', 'Like']
+    assert name_forms('Atlas-New-Tab') == ['Atlas-New-Tab', 'New-Tab', 'New_Tab']
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        root = Path(tmp_dir) / 'templates'
+        _touch_png(root / 'Chrome' / 'Chrome-TikTok-Like-btn.png')
+        _touch_png(root / 'Atlas' / 'Atlas-New-Tab.png')
+        
+        index = TemplateIndex(str(root), index_file=None)
+        like_path = str(root / 'Chrome' / 'Chrome-TikTok-Like-btn.png')
+        assert index.resolve('Chrome-TikTok-Like-btn') == like_path
+        assert index.resolve('Like') == like_path
+        assert index.resolve('LIKE') == like_path, "Без учета регистра"
+        assert index.resolve('new_tab') == str(root / 'Atlas' / 'Atlas-New-Tab.png')
+        assert index.resolve('Missing') is None
+        assert len(index) == 2
+    
+    print("✅ Точное имя, короткое имя, подчеркивания, регистр")
+    print()
+
+
+def test_incremental_refresh():
+    """Тест обновления: пересканируются только измененные папки"""
+    print("="*60)
+    print("🧪 Тест 2: Инкрементальное обновление")
+    print("="*60)
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        root = Path(tmp_dir) / 'templates'
+        index_file = Path(tmp_dir) / 'index.json'
+        _touch_png(root / 'Chrome' / 'Chrome-Back.png')
+        _touch_png(root / 'Safari' / 'Reload.png')
+        
+        first = TemplateIndex(str(root), index_file=index_file)
+        assert first.stats['scanned_dirs'] == 3
+        
+        warm = TemplateIndex(str(root), index_file=index_file)
+        assert warm.stats['scanned_dirs'] == 0, "Ничего не менялось - без сканирования"
+        assert warm.resolve('Back') == str(root / 'Chrome' / 'Chrome-Back.png')
+        print("✅ Повторный запуск без сканирования папок")
+        
+        _touch_png(root / 'Safari' / 'Close.png')
+        updated = TemplateIndex(str(root), index_file=index_file)
+        assert updated.stats['scanned_dirs'] == 1, f"Только измененная папка: {updated.stats}"
+        assert updated.resolve('Close') == str(root / 'Safari' / 'Close.png')
+        print("✅ Новый PNG - пересканирована одна папка")
+        
+        _touch_png(root / 'Safari' / 'Tabs' / 'Tab.png')
+        nested = TemplateIndex(str(root), index_file=index_file)
+        assert nested.resolve('Tab') == str(root / 'Safari' / 'Tabs' / 'Tab.png'), "Новая подпапка"
+        print("✅ Новая подпапка")
+    
+    print()
+
+
+def test_parser_is_lazy():
+    """Тест ленивой загрузки в AtlasDSLParser"""
+    print("="*60)
+    print("🧪 Тест 3: Ленивый парсер")
+    print("="*60)
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        root = Path(tmp_dir) / 'templates'
+        _touch_png(root / 'Chrome' / 'Chrome-NewTab.png')
+        
+        old_cwd = os.getcwd()
+        os.chdir(tmp_dir)
+        try:
+            parser = AtlasDSLParser()
+            assert parser._template_index is None and parser._variables is None, "Конструктор ничего не загружает"
+            
+            step = parser._parse_line('click newtab')
+            assert step['template'] == str(Path('templates') / 'Chrome' / 'Chrome-NewTab.png')
+            assert parser._template_index is not None
+        finally:
+            os.chdir(old_cwd)
+    
+    print("✅ Шаблоны загружаются при первом обращении")
+    print()
+
+
+def run_all_tests():
+    """Запуск всех тестов"""
+    print("\n" + "="*60)
+    print("🗂️ ТЕСТИРОВАНИЕ ИНДЕКСА ШАБЛОНОВ".center(60))
+    print("="*60)
+    
+    tests = [
+        test_name_forms_and_resolve,
+        test_incremental_refresh,
+        test_parser_is_lazy,
+    ]
+    
+    passed = 0
+    failed = 0
+    
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except AssertionError as e:
+            print(f"\n❌ FAILED: {e}\n")
+            failed += 1
+        except Exception as e:
+            print(f"\n❌ ERROR: {e}\n")
+            failed += 1
+    
+    print("="*60)
+    if failed == 0:
+        print("🎉 ВСЕ ТЕСТЫ ИНДЕКСА ПРОШЛИ!".center(60))
+    else:
+        print("⚠️  ЕСТЬ ПРОБЛЕМЫ С ИНДЕКСОМ!".center(60))
+    print("="*60)
+    print(f"✅ Пройдено: {passed}/{len(tests)}")
+    if failed:
+        print(f"❌ Провалено: {failed}/{len(tests)}")
+    print("="*60)
+    
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,620 @@
+#!/usr/bin/env python3
+"""
+test_vision_matching.py
+🔍 ВАЖНО: Тестирование движка поиска шаблонов (src/vision)
+
+Проверяет:
+- Общий кэш кадра экрана (FrameCache)
+- Поиск нескольких шаблонов за один проход
+- Поиск в области интереса (ROI)
+- Векторизованное подавление дубликатов (NMS)
+- Пирамидальный поиск (match_mode=pyramid)
+- Поиск в нескольких масштабах (multiscale)
+- Хранилище предобработанных шаблонов (TemplateStore)
+- Ожидание по изменению кадра (ChangeGate, wait_for_match)
+- Параллельный поиск в пуле потоков (MatchPool, полосы кадра)
+- Backend'ы захвата экрана (capture)
+"""
+
+import sys
+import time
+from pathlib import Path
+
+# Добавляем корень проекта в путь
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+
+from src.vision.frame_cache import FrameCache
+from src.vision.multi_template import parse_template_candidates, pick_best_hit, TemplateCandidate
+from src.vision.roi import RoiTracker, region_to_window, parse_region
+from src.vision.matching import extract_peaks, pyramid_match
+from src.vision.search_options import SearchOptions
+from src.vision.multiscale import candidate_scales, ScaleCache
+from src.vision.template_store import TemplateStore
+from src.vision.waiter import ChangeGate, WaitPolicy, wait_for_match
+from src.vision.parallel_match import MatchPool, resolve_workers, tiled_match_template
+from src.vision.capture import ReplayCapture, PyAutoGuiCapture, get_capture_backend, benchmark
+
+
+def _make_grabber(frames: list):
+    """Фейковый захват экрана: отдает кадры по очереди и считает вызовы"""
+    calls = {'count': 0}
+    
+    def grabber():
+        frame = frames[min(calls['count'], len(frames) - 1)]
+        calls['count'] += 1
+        return frame
+    
+    return grabber, calls
+
+
+def test_frame_cache_reuses_frame():
+    """Тест что кадр переиспользуется в пределах max_age"""
+    print("\n" + "="*60)
+    print("🧪 Тест 1: FrameCache переиспользует кадр")
+    print("="*60)
+    
+    frame = np.zeros((100, 200), dtype=np.uint8)
+    grabber, calls = _make_grabber([frame])
+    cache = FrameCache(grabber=grabber, max_age=10.0)
+    
+    first = cache.get_gray()
+    second = cache.get_gray()
+    
+    assert first is second, "Кадр должен быть тем же объектом"
+    assert calls['count'] == 1, f"Ожидался 1 захват, получено {calls['count']}"
+    assert cache.stats['hits'] == 1, "Второй вызов должен быть попаданием в кэш"
+    print("✅ Один захват на несколько поисков")
+    
+    print()
+
+
+def test_frame_cache_invalidate_and_max_age():
+    """Тест сброса кадра и max_age"""
+    print("="*60)
+    print("🧪 Тест 2: FrameCache invalidate и max_age")
+    print("="*60)
+    
+    frames = [np.full((10, 10), i, dtype=np.uint8) for i in range(3)]
+    grabber, calls = _make_grabber(frames)
+    
+    cache = FrameCache(grabber=grabber, max_age=10.0)
+    cache.get_gray()
+    cache.invalidate()
+    assert cache.age is None, "После invalidate кадра быть не должно"
+    assert cache.get_gray()[0, 0] == 1, "После invalidate нужен новый кадр"
+    print("✅ invalidate() сбрасывает кадр")
+    
+    grabber, calls = _make_grabber(frames)
+    cache = FrameCache(grabber=grabber, max_age=0.01)
+    cache.get_gray()
+    time.sleep(0.02)
+    cache.get_gray()
+    assert calls['count'] == 2, "Устаревший кадр должен захватываться заново"
+    print("✅ Кадр старше max_age захватывается заново")
+    
+    print()
+
+
+def test_parse_template_candidates():
+    """Тест разбора списка шаблонов с порогами"""
+    print("="*60)
+    print("🧪 Тест 3: Кандидаты из templates:")
+    print("="*60)
+    
+    step = {
+        'action': 'click',
+        'threshold': 0.7,
+        'templates': [
+            'templates/a.png',
+            {'template': 'templates/b.png', 'threshold': 0.9},
+        ],
+    }
+    candidates = parse_template_candidates(step, 0.75)
+    assert [c.path for c in candidates] == ['templates/a.png', 'templates/b.png']
+    assert [c.threshold for c in candidates] == [0.7, 0.9], "Порог кандидата должен перекрывать порог шага"
+    print("✅ Пороги для каждого шаблона")
+    
+    single = parse_template_candidates({'template': 'templates/c.png'}, 0.75)
+    assert single == [TemplateCandidate('templates/c.png', 0.75)]
+    assert parse_template_candidates({'action': 'click'}, 0.75) == []
+    print("✅ Одиночный template и пустой шаг")
+    
+    print()
+
+
+def test_pick_best_hit():
+    """Тест выбора лучшего совпадения по всему набору"""
+    print("="*60)
+    print("🧪 Тест 4: Лучшее совпадение среди кандидатов")
+    print("="*60)
+    
+    a = TemplateCandidate('a.png', 0.75)
+    b = TemplateCandidate('b.png', 0.75)
+    c = TemplateCandidate('c.png', 0.75)
+    hits = [
+        (a, []),
+        (b, [{'coords': (1, 1), 'score': 0.81, 'top_left': (0, 0)}]),
+        (c, [{'coords': (5, 5), 'score': 0.93, 'top_left': (4, 4)}]),
+    ]
+    best_candidate, matches = pick_best_hit(hits)
+    assert best_candidate is c, "Должен победить кандидат с лучшим score"
+    assert matches[0]['coords'] == (5, 5)
+    print("✅ Побеждает лучший score")
+    
+    assert pick_best_hit([(a, []), (b, [])]) is None
+    print("✅ Ничего не найдено → None")
+    
+    print()
+
+
+def test_roi_search_windows():
+    """Тест окон поиска ROI"""
+    print("="*60)
+    print("🧪 Тест 5: ROI по последней позиции")
+    print("="*60)
+    
+    tracker = RoiTracker(min_padding=10, padding_ratio=0.0)
+    frame_shape = (1000, 2000)
+    
+    windows = tracker.search_windows('like.png', 2.0, frame_shape, (40, 30))
+    assert windows == [(0, 0, 2000, 1000)], "Без истории ищем по всему кадру"
+    print("✅ Без истории - весь кадр")
+    
+    tracker.record_hit('like.png', 2.0, [(100, 200)], (40, 30))
+    windows = tracker.search_windows('like.png', 2.0, frame_shape, (40, 30))
+    assert windows == [(90, 190, 150, 240), (0, 0, 2000, 1000)], f"Неверные окна: {windows}"
+    print("✅ Сначала окно с отступом, потом весь кадр")
+    
+    windows = tracker.search_windows('like.png', 1.0, frame_shape, (40, 30))
+    assert len(windows) == 1, "Другой display scale - отдельный ключ"
+    print("✅ Ключ учитывает display scale")
+    
+    print()
+
+
+def test_region_override():
+    """Тест region= из шага"""
+    print("="*60)
+    print("🧪 Тест 6: region= шага")
+    print("="*60)
+    
+    assert parse_region('100,200,300,400') == [100, 200, 300, 400]
+    assert parse_region([1, 2, 3, 4]) == [1, 2, 3, 4]
+    assert parse_region('1,2,3') is None
+    print("✅ parse_region")
+    
+    # Логические координаты → физические (Retina 2x), обрезка по кадру
+    window = region_to_window([100, 200, 300, 400], 2.0, (1000, 1500))
+    assert window == (200, 400, 800, 1000), f"Неверное окно: {window}"
+    print("✅ region → окно кадра с учетом scale")
+    
+    print()
+
+
+def _old_duplicate_filter(res, threshold, distance):
+    """Старый O(n²) фильтр дубликатов из _find_all_templates (эталон)"""
+    locations = np.where(res >= threshold)
+    matches = [(int(x), int(y), float(res[y, x])) for x, y in zip(*locations[::-1])]
+    matches.sort(key=lambda m: m[2], reverse=True)
+    
+    filtered = []
+    for match in matches:
+        if not any(abs(match[0] - e[0]) < distance and abs(match[1] - e[1]) < distance for e in filtered):
+            filtered.append(match)
+    return filtered
+
+
+def test_extract_peaks_matches_old_filter():
+    """Тест что NumPy NMS дает тот же результат, что и старый фильтр"""
+    print("="*60)
+    print("🧪 Тест 7: extract_peaks == старый фильтр")
+    print("="*60)
+    
+    rng = np.random.default_rng(42)
+    for _ in range(5):
+        res = rng.random((120, 160)).astype(np.float32)
+        threshold = 0.9
+        expected = _old_duplicate_filter(res, threshold, 20)
+        assert extract_peaks(res, threshold, 20) == expected, "Результат NMS отличается от старого фильтра"
+    print("✅ Совпадает со старым фильтром")
+    
+    res = rng.random((120, 160)).astype(np.float32)
+    top = extract_peaks(res, 0.5, 20, top_k=3)
+    assert len(top) == 3, "top_k должен ограничивать число пиков"
+    assert top == extract_peaks(res, 0.5, 20)[:3], "top_k должен вернуть лучшие пики"
+    assert extract_peaks(res, 1.5, 20) == [], "Выше максимума пиков нет"
+    print("✅ top_k и пустой результат")
+    
+    print()
+
+
+def _make_ui_template():
+    """Синтетическая "кнопка" с четкими краями"""
+    import cv2
+    template = np.full((48, 96), 210, dtype=np.uint8)
+    cv2.circle(template, (24, 24), 16, 40, -1)
+    cv2.rectangle(template, (50, 14), (88, 34), 90, -1)
+    return template
+
+
+def _make_screen(template, positions, size=(900, 1400)):
+    """Шумный "экран" с шаблоном в заданных позициях"""
+    import cv2
+    rng = np.random.default_rng(7)
+    screen = cv2.GaussianBlur((rng.random(size) * 255).astype(np.uint8), (9, 9), 0)
+    th, tw = template.shape
+    for x, y in positions:
+        screen[y:y + th, x:x + tw] = template
+    return screen
+
+
+def test_pyramid_match():
+    """Тест пирамидального поиска против полного"""
+    import cv2
+    print("="*60)
+    print("🧪 Тест 8: Пирамидальный поиск")
+    print("="*60)
+    
+    template = _make_ui_template()
+    positions = [(101, 57), (700, 403), (1201, 811)]
+    screen = _make_screen(template, positions)
+    
+    peaks = pyramid_match(screen, template, 0.9, 20)
+    found = sorted((x, y) for x, y, _ in peaks)
+    assert found == sorted(positions), f"Пирамида нашла {found}, ожидалось {positions}"
+    assert all(score >= 0.9 for _, _, score in peaks), "Score должен быть на полном разрешении"
+    print("✅ Точные позиции и score на полном разрешении")
+    
+    res = cv2.matchTemplate(screen, template, cv2.TM_CCOEFF_NORMED)
+    full = sorted((x, y) for x, y, _ in extract_peaks(res, 0.9, 20))
+    assert found == full, "Пирамида должна совпадать с полным поиском"
+    print("✅ Совпадает с полным поиском")
+    
+    tiny = np.zeros((10, 10), dtype=np.uint8)
+    assert pyramid_match(screen, tiny, 0.9, 20) is None, "Маленький шаблон → обычный поиск"
+    print("✅ Маленький шаблон → fallback")
+    
+    assert SearchOptions.from_step({'match_mode': 'pyramid'}).match_mode == 'pyramid'
+    assert SearchOptions.from_step({'match_mode': 'magic'}).match_mode == 'full'
+    assert SearchOptions.from_step({'roi': 'off'}).use_roi is False
+    assert SearchOptions.from_step({}).max_matches is None, "По умолчанию - все совпадения"
+    assert SearchOptions.from_step({'max_matches': '3'}).max_matches == 3
+    assert SearchOptions.from_step({'max_matches': 0}, {'max_matches': 5}).max_matches is None
+    assert SearchOptions.from_step({}, {'max_matches': 5}).max_matches == 5
+    print("✅ SearchOptions из шага")
+    
+    print()
+
+
+def test_multiscale_candidates_and_cache():
+    """Тест набора масштабов и кэша победившего масштаба"""
+    import tempfile
+    print("="*60)
+    print("🧪 Тест 9: Multiscale")
+    print("="*60)
+    
+    scales = candidate_scales(1.0)
+    assert scales[0] == 1.0, "Сначала пробуем исходный масштаб"
+    assert 0.5 in scales, "Шаблон с Retina 2x на мониторе 1x → 0.5"
+    assert 2.0 in candidate_scales(2.0), "Шаблон 1x на Retina → 2.0"
+    assert len(scales) == len(set(scales)), "Масштабы не должны повторяться"
+    print(f"✅ Масштабы для 1x: {scales}")
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache_file = Path(tmp_dir) / 'scales.json'
+        cache = ScaleCache(cache_file)
+        assert cache.get('like.png', 1.0) is None
+        cache.remember('like.png', 1.0, 0.5)
+        assert cache.get('like.png', 2.0) is None, "Ключ учитывает display scale"
+        assert ScaleCache(cache_file).get('like.png', 1.0) == 0.5, "Масштаб должен сохраняться на диск"
+        print("✅ Победивший масштаб запоминается")
+    
+    assert SearchOptions.from_step({'multiscale': 'true'}).multiscale is True
+    assert SearchOptions.from_step({}, {'multiscale': True}).multiscale is True
+    print("✅ multiscale из шага и settings")
+    
+    print()
+
+
+def test_template_store():
+    """Тест хранилища шаблонов: компиляция один раз, memory map, инвалидация"""
+    import tempfile
+    import cv2
+    print("="*60)
+    print("🧪 Тест 10: TemplateStore")
+    print("="*60)
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        png_path = str(Path(tmp_dir) / 'button.png')
+        template = _make_ui_template()
+        cv2.imwrite(png_path, template)
+        
+        store = TemplateStore(Path(tmp_dir) / 'store')
+        gray = store.get(png_path)
+        assert np.array_equal(gray, cv2.imread(png_path, cv2.IMREAD_GRAYSCALE)), "Grayscale как у cv2.imread"
+        assert not gray.flags.writeable, "Массив из хранилища только для чтения"
+        color_file = Path(tmp_dir) / 'store' / store.content_hash(png_path) / 'color.npy'
+        assert not color_file.exists(), "Grayscale store не пишет color.npy"
+        assert store.get(png_path, color=True).shape == (48, 96, 3)
+        assert color_file.exists(), "color.npy дописывается по запросу"
+        assert set(store.levels(png_path)) == {0.25, 0.5}, "Уровни пирамиды предвычислены"
+        assert store.stats['compiled'] == 1
+        print("✅ Шаблон скомпилирован один раз")
+        
+        other = TemplateStore(Path(tmp_dir) / 'store')
+        assert np.array_equal(other.get(png_path), gray)
+        assert other.stats['compiled'] == 0, "Второй процесс читает готовую запись"
+        print("✅ Запись переиспользуется без декодирования PNG")
+        
+        writes = other.stats['manifest_writes']
+        assert other.get(png_path) is other.get(png_path)
+        assert other.levels(png_path) is other.levels(png_path)
+        assert other.stats['manifest_writes'] == writes, "Повторное обращение - без хэширования и записи манифеста"
+        print("✅ Неизменный PNG - готовый массив")
+        
+        old_hash = other.content_hash(png_path)
+        cv2.imwrite(png_path, np.ascontiguousarray(template[:, :48]))
+        assert other.get(png_path).shape == (48, 48), "Изменённый PNG должен перекомпилироваться"
+        assert other.levels(png_path)[0.5].shape == (24, 24), "Уровни тоже новые"
+        assert other.stats['compiled'] == 1
+        assert not (Path(tmp_dir) / 'store' / old_hash).exists(), "Старая запись удаляется"
+        print("✅ Изменение PNG инвалидирует запись (тот же процесс)")
+        
+        for i in range(5):
+            cv2.imwrite(str(Path(tmp_dir) / f'icon_{i}.png'), np.ascontiguousarray(template[:, i:i + 40]))
+        orphan = Path(tmp_dir) / 'store' / ('0' * 32)
+        orphan.mkdir()
+        warm = TemplateStore(Path(tmp_dir) / 'store')
+        assert warm.warm(tmp_dir) == 6
+        assert warm.stats['manifest_writes'] == 1, "warm() пишет манифест один раз"
+        assert orphan.exists(), "Свежие папки не трогаются (запись другого процесса)"
+        assert warm.prune(min_age=0) == 1 and not orphan.exists()
+        print("✅ warm: один манифест, prune удаляет лишние записи")
+        
+        assert store.get(str(Path(tmp_dir) / 'missing.png')) is None
+    
+    print()
+
+
+def test_wait_for_match_change_gate():
+    """Тест ожидания: поиск только при изменении кадра, адаптивный интервал"""
+    print("="*60)
+    print("🧪 Тест 11: Ожидание по изменению кадра")
+    print("="*60)
+    
+    static = np.full((400, 400), 120, dtype=np.uint8)
+    changed = static.copy()
+    changed[100:124, 200:248] = 255  # Появилась кнопка 48x24
+    
+    gate = ChangeGate()
+    assert gate.changed(static), "Первый кадр всегда ищем"
+    assert not gate.changed(static.copy()), "Статичный кадр не требует поиска"
+    assert gate.changed(changed), "Небольшая кнопка должна считаться изменением"
+    
+    region_gate = ChangeGate(window=(0, 0, 100, 100))
+    region_gate.changed(static)
+    assert not region_gate.changed(changed), "Изменение вне области игнорируется"
+    print("✅ ChangeGate замечает появление кнопки")
+    
+    # Фиктивные часы: кнопка появляется на 1.0с
+    now = [0.0]
+    sleeps = []
+    
+    def sleep(seconds):
+        sleeps.append(seconds)
+        now[0] += seconds
+    
+    def grab():
+        return changed if now[0] >= 1.0 else static
+    
+    def match(gray):
+        return (bool(gray[110, 210] == 255), now[0])
+    
+    policy = WaitPolicy(poll_min=0.02, poll_max=0.4, backoff=2.0)
+    (found, found_at), stats = wait_for_match(match, grab, 5.0, policy, clock=lambda: now[0], sleep=sleep)
+    
+    assert found, "Шаблон должен быть найден"
+    assert found_at - 1.0 <= 0.4, f"Задержка реакции не больше poll_max: {found_at - 1.0:.2f}с"
+    assert stats['matches'] == 2, f"Поиск только на первом и измененном кадре: {stats}"
+    assert max(sleeps) == 0.4 and sleeps[0] < sleeps[-1], "Интервал растет на статичном экране"
+    print(f"✅ Найдено через {found_at - 1.0:.2f}с после появления, поисков: {stats['matches']}/{stats['samples']}")
+    
+    now[0] = -100.0
+    (found, _), stats = wait_for_match(match, lambda: static, 1.5, policy, clock=lambda: now[0], sleep=sleep)
+    assert not found and stats['matches'] == 1, "Таймаут на статичном экране - один поиск"
+    (found, _), stats = wait_for_match(match, lambda: static, 4.5, policy, clock=lambda: now[0], sleep=sleep)
+    assert stats['matches'] == 3, f"Без изменений - поиск раз в rescan_interval: {stats}"
+    print("✅ Таймаут без лишних поисков")
+    
+    # Видео вне окна шаблона: каждый кадр другой
+    frames = [0]
+    
+    def grab_video():
+        frames[0] += 1
+        frame = static.copy()
+        frame[300:400, 0:100] = (frames[0] * 40) % 256
+        return frame
+    
+    now[0] = 0.0
+    policy = WaitPolicy(poll_min=0.03, match_min_interval=0.25, rescan_interval=0)
+    (found, _), stats = wait_for_match(match, grab_video, 2.0, policy, clock=lambda: now[0], sleep=sleep)
+    assert stats['matches'] <= 9, f"Поиск не чаще match_min_interval: {stats}"
+    (found, _), stats = wait_for_match(match, grab_video, 2.0, policy, window=(150, 50, 300, 200),
+                                       clock=lambda: now[0], sleep=sleep)
+    assert stats['matches'] == 1, f"Изменения вне окна не запускают поиск: {stats}"
+    print("✅ Видео: поиск не чаще match_min_interval, окно отсекает изменения")
+    
+    tracker = RoiTracker(min_padding=10, padding_ratio=0.0)
+    assert tracker.watch_window(['a.png'], 1.0, static.shape) is None, "Позиция неизвестна - весь кадр"
+    tracker.record_hit('a.png', 1.0, [(200, 100)], (48, 24))
+    tracker.record_hit('b.png', 1.0, [(20, 30)], (10, 10))
+    assert tracker.watch_window(['a.png'], 1.0, static.shape) == (190, 90, 258, 134)
+    assert tracker.watch_window(['a.png', 'b.png'], 1.0, static.shape) == (10, 20, 258, 134)
+    print("✅ Окно сравнения по последним позициям шаблонов")
+    
+    policy = WaitPolicy.from_step({'poll_min': '0.05'}, {'poll_max': 0.2, 'change_threshold': 'x'})
+    assert (policy.poll_min, policy.poll_max) == (0.05, 0.2)
+    assert WaitPolicy.from_step({'match_min_interval': 0.5}).match_min_interval == 0.5
+    assert policy.change_threshold == WaitPolicy().change_threshold, "Неверное значение → по умолчанию"
+    print("✅ WaitPolicy из шага и settings")
+    
+    print()
+
+
+def test_parallel_match():
+    """Тест пула потоков: порядок результатов и склейка полос кадра"""
+    import cv2
+    print("="*60)
+    print("🧪 Тест 12: Параллельный поиск")
+    print("="*60)
+    
+    pool = MatchPool(4)
+    assert pool.map(lambda x: x * x, range(10)) == [x * x for x in range(10)], "Порядок как у входа"
+    assert pool.map(lambda x: x, [3, 1, 2], workers=1) == [3, 1, 2]
+    print("✅ MatchPool сохраняет порядок")
+    
+    import threading
+    import time
+    lock = threading.Lock()
+    state = {'current': 0, 'peak': 0}
+    
+    def slow(x):
+        with lock:
+            state['current'] += 1
+            state['peak'] = max(state['peak'], state['current'])
+        time.sleep(0.03)
+        with lock:
+            state['current'] -= 1
+        return x
+    
+    for workers, expected in ((2, 2), (3, 3), (None, 4)):
+        state['peak'] = 0
+        assert pool.map(slow, range(7), workers=workers) == list(range(7))
+        assert state['peak'] == expected, f"match_workers={workers}: пик {state['peak']}, ожидали {expected}"
+    pool.shutdown()
+    print("✅ match_workers ограничивает одновременные потоки")
+    
+    template = _make_ui_template()
+    screen = _make_screen(template, [(120, 80), (700, 500)])
+    full = cv2.matchTemplate(screen, template, cv2.TM_CCOEFF_NORMED)
+    
+    for workers in (1, 3, 8):
+        tiled = tiled_match_template(screen, template, MatchPool(workers))
+        assert tiled.shape == full.shape, "Склеенная карта того же размера"
+        assert np.allclose(tiled, full, atol=1e-4), f"Карта полосами совпадает с полной ({workers} потоков)"
+        assert extract_peaks(tiled, 0.8, 20) == extract_peaks(full, 0.8, 20)
+    print("✅ Полосы с перекрытием дают ту же карту и те же пики")
+    
+    assert resolve_workers(3) == 3
+    assert resolve_workers('0') == 1
+    assert 1 <= resolve_workers('auto') <= 8
+    assert SearchOptions.from_step({'match_workers': 2}).workers == 2
+    assert SearchOptions.from_step({}).workers is None, "По умолчанию - весь пул runner"
+    print("✅ match_workers из шага")
+    
+    print()
+
+
+def test_capture_backends():
+    """Тест backend'ов захвата: replay, region, выбор backend'а"""
+    import os
+    import tempfile
+    import cv2
+    print("="*60)
+    print("🧪 Тест 13: Захват экрана")
+    print("="*60)
+    
+    first = np.zeros((200, 300, 3), dtype=np.uint8)
+    first[:, :, 2] = 255  # Красный (BGR)
+    second = np.full((200, 300, 3), 90, dtype=np.uint8)
+    
+    capture = ReplayCapture([first, second], display_scale=2.0)
+    gray = capture.grab_gray()
+    assert gray.shape == (200, 300), "Grayscale без каналов"
+    assert gray[0, 0] == cv2.cvtColor(first, cv2.COLOR_BGR2GRAY)[0, 0]
+    assert tuple(capture.grab_rgb()[0, 0]) == (90, 90, 90), "Кадры идут по порядку"
+    assert tuple(capture.grab_rgb()[0, 0]) == (255, 0, 0), "RGB из BGR, по кругу"
+    assert capture.grab_gray(region=(10, 20, 50, 30)).shape == (60, 100), "region в логических координатах"
+    print("✅ ReplayCapture: grayscale, RGB, region")
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        png_path = os.path.join(tmp_dir, 'frame.png')
+        cv2.imwrite(png_path, first)
+        assert get_capture_backend(f'replay:{png_path}').grab_gray().shape == (200, 300)
+        
+        cache = FrameCache(capture=ReplayCapture(png_path), max_age=10.0)
+        assert cache.get_gray().shape == (200, 300), "FrameCache захватывает через backend"
+    print("✅ replay:<путь> и FrameCache(capture=...)")
+    
+    assert isinstance(get_capture_backend('pyautogui'), PyAutoGuiCapture)
+    assert isinstance(get_capture_backend('unknown'), PyAutoGuiCapture), "Неизвестный → pyautogui"
+    assert get_capture_backend('auto').name in ('mss', 'pyautogui')
+    saved = os.environ.pop('MACRO_CAPTURE', None)
+    try:
+        assert isinstance(get_capture_backend(), PyAutoGuiCapture), "По умолчанию pyautogui, mss - только явно"
+    finally:
+        if saved is not None:
+            os.environ['MACRO_CAPTURE'] = saved
+    
+    results = benchmark([ReplayCapture([first])], iterations=3)
+    assert set(results) == {'replay'} and results['replay'] >= 0
+    print("✅ Выбор backend'а и бенчмарк")
+    
+    print()
+
+
+def run_all_tests():
+    """Запуск всех тестов"""
+    print("\n" + "="*60)
+    print("🔍 ТЕСТИРОВАНИЕ ПОИСКА ШАБЛОНОВ".center(60))
+    print("="*60)
+    
+    tests = [
+        test_frame_cache_reuses_frame,
+        test_frame_cache_invalidate_and_max_age,
+        test_parse_template_candidates,
+        test_pick_best_hit,
+        test_roi_search_windows,
+        test_region_override,
+        test_extract_peaks_matches_old_filter,
+        test_pyramid_match,
+        test_multiscale_candidates_and_cache,
+        test_template_store,
+        test_wait_for_match_change_gate,
+        test_parallel_match,
+        test_capture_backends,
+    ]
+    
+    passed = 0
+    failed = 0
+    
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except AssertionError as e:
+            print(f"\n❌ FAILED: {e}\n")
+            failed += 1
+        except Exception as e:
+            print(f"\n❌ ERROR: {e}\n")
+            failed += 1
+    
+    print("="*60)
+    if failed == 0:
+        print("🎉 ВСЕ ТЕСТЫ ПОИСКА ПРОШЛИ!".center(60))
+    else:
+        print("⚠️  ЕСТЬ ПРОБЛЕМЫ С ПОИСКОМ!".center(60))
+    print("="*60)
+    print(f"✅ Пройдено: {passed}/{len(tests)}")
+    if failed:
+        print(f"❌ Провалено: {failed}/{len(tests)}")
+    print("="*60)
+    
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)